@@ -12,6 +12,10 @@ import sys
 import json
 import logging
 from pathlib import Path
+from src.exchange_clock import clock
+from src.execution_journal import ExecutionJournal
+from src.config_store import ConfigStore
+from types import MappingProxyType
 
 class AutoTraderScheduler:
     """自动交易调度器"""
@@ -21,9 +25,10 @@ class AutoTraderScheduler:
         self.config_file = self.script_dir / config_file
         self.log_file = self.script_dir / "scheduler.log"
         self.stats_file = self.script_dir / "scheduler_stats.json"
+        self.journal_file = self.script_dir / "scheduler_journal.jsonl"
         
         # 默认配置
-        self.config = {
+        self.default_config = {
             "interval_minutes": 5,
             "max_trades": 1,
             "scan_minutes": 5,
@@ -33,7 +38,9 @@ class AutoTraderScheduler:
             "test_mode": False,
             "log_level": "INFO",
             "max_retries": 3,
-            "retry_delay": 30
+            "retry_delay": 30,
+            "in_process": False,     # 在调度器进程内交易，连接和缓存跨窗口保持
+            "warmup_seconds": 45     # 入场前多少秒开始预热（仅in_process模式），0表示不预热
         }
         
         # 统计信息
@@ -44,13 +51,28 @@ class AutoTraderScheduler:
             "failure_count": 0,
             "last_execution": None,
             "last_success": None,
-            "last_failure": None
+            "last_failure": None,
+            "last_warmup_ms": None,
+            "last_entry_ms": None
         }
         
+        self.auto_trader = None  # in_process模式下长期存活的自动交易器
+        self.journal = None
+        self.last_attempts = 0
+        
+        # 配置快照不可变，修改配置文件后在下一轮循环生效，无需重启
+        self.config_store = ConfigStore(self.config_file, self.parse_config, MappingProxyType(dict(self.default_config)))
+        self.config_store.subscribe(lambda config: self.logger.info(f"🔄 配置已重新加载: {self.config_file}"))
+        
         self.setup_logging()
         self.load_config()
         self.load_stats()
     
+    @property
+    def config(self):
+        """当前配置快照（只读）"""
+        return self.config_store.snapshot
+    
     def setup_logging(self):
         """设置日志"""
         logging.basicConfig(
@@ -87,54 +109,55 @@ class AutoTraderScheduler:
         
         return config
 
+    def parse_config(self, loaded_config):
+        """校验配置文件内容并生成新的配置快照，不合法时抛出ValueError"""
+        if not isinstance(loaded_config, dict):
+            raise ValueError("配置文件必须是JSON对象")
+        config = dict(self.default_config)
+        config.update(loaded_config)
+        for key, default in self.default_config.items():
+            if isinstance(default, bool) and not isinstance(config[key], bool):
+                raise ValueError(f"{key} 必须是true或false")
+            if isinstance(default, (int, float)) and not isinstance(default, bool):
+                if isinstance(config[key], bool) or not isinstance(config[key], (int, float)) or config[key] < 0:
+                    raise ValueError(f"{key} 必须是非负数")
+        if config["log_level"] not in ("DEBUG", "INFO", "WARNING", "ERROR"):
+            raise ValueError(f"log_level 不合法: {config['log_level']}")
+        if config["scan_start_minutes"] >= config["scan_end_minutes"]:
+            raise ValueError("scan_start_minutes 必须小于 scan_end_minutes")
+        # 验证时间配置
+        return MappingProxyType(self.validate_time_config(config))
+    
     def load_config(self):
         """加载配置"""
         if self.config_file.exists():
-            try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    loaded_config = json.load(f)
-                    self.config.update(loaded_config)
-                # 验证时间配置
-                self.config = self.validate_time_config(self.config)
+            if self.config_store.reload(force=True):
                 self.logger.info(f"配置已加载: {self.config_file}")
-            except Exception as e:
-                self.logger.warning(f"配置加载失败: {e}")
+            else:
+                self.logger.warning(f"配置加载失败: {self.config_store.last_error}")
         else:
             self.save_config()
     
     def save_config(self):
-        """保存配置"""
+        """保存配置（写入临时文件后原子替换）"""
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
+            tmp_file = self.config_file.with_name(self.config_file.name + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(dict(self.config), f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, self.config_file)
             self.logger.info(f"配置已保存: {self.config_file}")
         except Exception as e:
             self.logger.error(f"配置保存失败: {e}")
     
     def load_stats(self):
-        """加载统计信息"""
-        if self.stats_file.exists():
-            try:
-                with open(self.stats_file, 'r', encoding='utf-8') as f:
-                    self.stats.update(json.load(f))
-            except Exception as e:
-                self.logger.warning(f"统计信息加载失败: {e}")
+        """加载统计信息（汇总文件 + 重放执行日志中尚未压缩的事件）"""
+        self.journal = ExecutionJournal(self.journal_file, self.stats_file, defaults=self.stats)
+        self.stats = self.journal.stats
     
     def save_stats(self):
-        """保存统计信息"""
+        """保存统计信息（原子替换汇总文件，并清空已压缩的执行日志）"""
         try:
-            # 创建可序列化的统计信息副本
-            serializable_stats = {}
-            for key, value in self.stats.items():
-                if isinstance(value, datetime.datetime):
-                    serializable_stats[key] = value.isoformat()
-                elif isinstance(value, datetime.timedelta):
-                    serializable_stats[key] = str(value)
-                else:
-                    serializable_stats[key] = value
-            
-            with open(self.stats_file, 'w', encoding='utf-8') as f:
-                json.dump(serializable_stats, f, indent=2, ensure_ascii=False)
+            self.journal.compact()
         except Exception as e:
             self.logger.error(f"统计信息保存失败: {e}")
     
@@ -185,22 +208,89 @@ class AutoTraderScheduler:
             self.logger.error(f"执行失败: {e}")
             return False
     
+    def get_auto_trader(self):
+        """获取（或创建）in_process模式下的自动交易器"""
+        if self.auto_trader is None:
+            os.environ['MIN_TIME_REMAINING_MINUTES'] = str(self.config['min_time_remaining'])
+            from src.auto_trader import AutoTrader
+            
+            self.auto_trader = AutoTrader()
+            self.auto_trader.auto_trade_enabled = True
+        return self.auto_trader
+    
+    def apply_trader_config(self, auto_trader):
+        """把当前调度配置（可能已热更新）中的测试模式和最少剩余时间应用到自动交易器"""
+        config = self.config
+        auto_trader.test_only = config["test_mode"]
+        trading_config = auto_trader.config_store.snapshot
+        if trading_config.min_time_remaining != config['min_time_remaining']:
+            auto_trader.config_store.replace_snapshot(
+                trading_config.with_values({'min_time_remaining': config['min_time_remaining']}))
+    
+    def run_in_process(self):
+        """在调度器进程内执行一次交易"""
+        try:
+            auto_trader = self.get_auto_trader()
+            self.apply_trader_config(auto_trader)
+            start = time.perf_counter()
+            auto_trader.auto_trade_loop(
+                max_hours=None,
+                max_trades=self.config["max_trades"],
+                start_minutes=self.config["scan_start_minutes"],
+                end_minutes=self.config["scan_end_minutes"]
+            )
+            self.stats['last_entry_ms'] = (time.perf_counter() - start) * 1000
+            self.logger.info(f"⚡ 入场耗时: {self.stats['last_entry_ms']:.0f}ms")
+            return True
+        except Exception as e:
+            self.logger.error(f"执行失败: {e}")
+            return False
+        finally:
+            if self.auto_trader is not None:
+                self.auto_trader.scanner.clear_catalog()
+    
+    def run_warmup(self, lead_seconds):
+        """入场前预热连接、余额缓存和候选市场"""
+        try:
+            from src.warmup import warm_up
+            
+            report = warm_up(
+                self.get_auto_trader(),
+                self.config["scan_start_minutes"],
+                self.config["scan_end_minutes"],
+                lead_seconds
+            )
+            self.stats['last_warmup_ms'] = report.total_ms
+            self.logger.info(f"🔥 {report.summary()}")
+            return report.total_ms
+        except Exception as e:
+            self.logger.warning(f"预热失败: {e}")
+            return None
+    
     def run_with_retry(self):
         """带重试的执行"""
         for attempt in range(self.config["max_retries"]):
+            self.last_attempts = attempt + 1
             if attempt > 0:
                 self.logger.info(f"第 {attempt + 1} 次尝试...")
                 time.sleep(self.config["retry_delay"])
             
-            success = self.run_trading_command()
+            if self.config["in_process"]:
+                success = self.run_in_process()
+            else:
+                success = self.run_trading_command()
             if success:
                 return True
         
         return False
     
+    def exchange_now(self):
+        """交易所时间（UTC），窗口按交易所时间对齐，不受本地时钟偏差和时区影响"""
+        return clock.now_datetime()
+    
     def should_execute_now(self):
         """检查是否应该在当前时间执行"""
-        now = datetime.datetime.now()
+        now = self.exchange_now()
         minute = now.minute
         
         # 在15、30、45、0分钟的前5分钟执行
@@ -209,8 +299,8 @@ class AutoTraderScheduler:
         return minute in target_minutes
     
     def get_next_execution_time(self):
-        """获取下次执行时间"""
-        now = datetime.datetime.now()
+        """获取下次执行时间（交易所时间，UTC）"""
+        now = self.exchange_now()
         minute = now.minute
         
         # 目标执行分钟
@@ -223,7 +313,7 @@ class AutoTraderScheduler:
                 return next_time
         
         # 如果当前时间已过所有目标，则等到下一个小时的10分钟
-        next_hour = now.replace(hour=now.hour + 1, minute=10, second=0, microsecond=0)
+        next_hour = now.replace(minute=10, second=0, microsecond=0) + datetime.timedelta(hours=1)
         return next_hour
 
     def print_status(self):
@@ -241,6 +331,16 @@ class AutoTraderScheduler:
             print(f"✅ 上次成功: {self.stats['last_success']}")
         if self.stats['last_failure']:
             print(f"❌ 上次失败: {self.stats['last_failure']}")
+        if self.stats['last_warmup_ms'] is not None:
+            print(f"🔥 上次预热耗时: {self.stats['last_warmup_ms']:.0f}ms")
+        if self.stats['last_entry_ms'] is not None:
+            print(f"⚡ 上次入场耗时: {self.stats['last_entry_ms']:.0f}ms")
+        for hour, executions, success_rate in self.journal.success_rate_by_hour(6):
+            print(f"📈 {hour}时(UTC): 执行{executions}次, 成功率{success_rate*100:.0f}%")
+        for stage in ('warmup', 'entry', 'total'):
+            latency = self.journal.stage_latency(stage)
+            if latency:
+                print(f"⏱️  {stage}: 平均{latency['avg_ms']:.0f}ms, P50 {latency['p50_ms']:.0f}ms, P95 {latency['p95_ms']:.0f}ms ({latency['count']}次)")
         print("="*50)
     
     def run(self):
@@ -249,47 +349,63 @@ class AutoTraderScheduler:
         self.save_stats()
         
         self.logger.info("🚀 自动交易调度器启动")
+        if clock.sync():
+            self.logger.info(f"🕐 本地时钟与交易所偏差: {clock.offset * 1000:+.0f}ms")
         self.logger.info("📅 执行时间: 每小时10、25、40、55分钟（15、30、45、0分钟前5分钟）")
         self.logger.info("🛑 按 Ctrl+C 停止")
         
+        warmup_ms = None  # 本窗口的预热耗时
         try:
             while True:
+                self.config_store.poll()
+                
                 # 检查是否应该执行
                 if self.should_execute_now():
-                    self.stats['execution_count'] += 1
-                    self.stats['last_execution'] = datetime.datetime.now().isoformat()
-                    
-                    self.logger.info(f"🔄 第 {self.stats['execution_count']} 次执行")
+                    self.logger.info(f"🔄 第 {self.stats['execution_count'] + 1} 次执行")
                     
                     # 执行交易命令
+                    start = time.perf_counter()
+                    self.stats['last_entry_ms'] = None
                     success = self.run_with_retry()
                     
+                    # 只向执行日志追加一行，汇总按需压缩写入统计文件
+                    self.journal.record_execution(success, self.last_attempts, {
+                        'warmup': warmup_ms,
+                        'entry': self.stats['last_entry_ms'],
+                        'total': (time.perf_counter() - start) * 1000
+                    })
+                    warmup_ms = None
+                    
                     if success:
-                        self.stats['success_count'] += 1
-                        self.stats['last_success'] = datetime.datetime.now().isoformat()
                         self.logger.info("✅ 交易执行成功")
                     else:
-                        self.stats['failure_count'] += 1
-                        self.stats['last_failure'] = datetime.datetime.now().isoformat()
                         self.logger.error("❌ 交易执行失败")
                     
-                    self.save_stats()
-                    
                     # 执行后等待1分钟，避免重复执行
                     time.sleep(60)
                 else:
                     # 等待到下次执行时间
                     next_time = self.get_next_execution_time()
-                    wait_seconds = (next_time - datetime.datetime.now()).total_seconds()
+                    wait_seconds = (next_time - self.exchange_now()).total_seconds()
+                    warmup_seconds = self.config["warmup_seconds"] if self.config["in_process"] else 0
                     
-                    if wait_seconds > 0:
-                        self.logger.info(f"⏰ 下次执行时间: {next_time.strftime('%Y-%m-%d %H:%M:%S')}")
+                    if 0 < warmup_seconds < wait_seconds:
+                        # 先等到预热时间，预热后再等到入场时间
+                        self.logger.info(f"⏰ 下次执行时间: {next_time.astimezone().strftime('%Y-%m-%d %H:%M:%S')}，提前{warmup_seconds}秒预热")
+                        time.sleep(wait_seconds - warmup_seconds)
+                        warmup_ms = self.run_warmup((next_time - self.exchange_now()).total_seconds())
+                        remaining = (next_time - self.exchange_now()).total_seconds()
+                        if remaining > 0:
+                            time.sleep(remaining)
+                    elif wait_seconds > 0:
+                        self.logger.info(f"⏰ 下次执行时间: {next_time.astimezone().strftime('%Y-%m-%d %H:%M:%S')}")
                         self.logger.info(f"😴 等待 {wait_seconds/60:.1f} 分钟...")
                         time.sleep(wait_seconds)
                 
         except KeyboardInterrupt:
             self.logger.info("🛑 调度器已停止")
             self.print_status()
+            self.journal.close()
             self.logger.info("👋 再见！")
 
 def main():
@@ -1,8 +1,16 @@
 import argparse
 import os
+
+from dotenv import load_dotenv
+
+# 先加载.env，再导入src（模块级的限流器、对冲请求和时钟从环境变量读取设置）
+load_dotenv()
+
 from src.polymarket_scanner import PolymarketScanner
 from src.auto_trader import AutoTrader
 from src.manual_trader import ManualTrader
+from src.multi_account import MultiAccountTrader, load_account_configs
+from src.shard_coordinator import ShardCoordinator
 
 
 def main():
@@ -20,8 +28,19 @@ def main():
     parser.add_argument('--strategy', choices=['conservative', 'moderate', 'aggressive'], 
                        default='moderate', help='交易策略 (默认: moderate)')
     parser.add_argument('--test-only', action='store_true', help='仅测试模式，不执行实际交易')
+    parser.add_argument('--accounts', default=os.getenv('ACCOUNTS_FILE'), help='多账户配置文件 (JSON)，自动交易时所有账户共享行情')
+    parser.add_argument('--burst', action='store_true',
+                       help='最后数秒突击模式：预签名订单，在结束前BURST_WINDOW_SECONDS秒内高频轮询并下单（--end-minutes为选取市场的范围）')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SHARD_WORKERS', '0')),
+                       help='自动交易时按市场分片的工作进程数，0或1表示单进程 (默认: SHARD_WORKERS)')
     
     args = parser.parse_args()
+    if args.auto_trade and args.accounts:
+        # 多账户模式共享一份行情、按账户并行下单，尚不支持突击模式和分片工作进程
+        if args.burst:
+            parser.error('--accounts (ACCOUNTS_FILE) 不能与 --burst 同时使用')
+        if args.workers > 1:
+            parser.error('--accounts (ACCOUNTS_FILE) 不能与 --workers > 1 (SHARD_WORKERS) 同时使用')
     
     # 确定扫描范围
     if args.all_markets:
@@ -46,12 +65,49 @@ def main():
         else:
             print("=== 自动交易模式 ===")
 
+        if args.accounts:
+            # 多账户模式：行情只获取一次，按账户并行下单
+            multi_trader = None
+            try:
+                multi_trader = MultiAccountTrader(load_account_configs(args.accounts))
+                multi_trader.auto_trader.current_strategy = args.strategy
+                multi_trader.auto_trader.auto_trade_enabled = True
+                multi_trader.test_only = args.test_only
+                
+                if args.start_minutes and args.end_minutes:
+                    multi_trader.auto_trade_loop(max_hours=None, max_trades=args.max_trades, start_minutes=args.start_minutes, end_minutes=args.end_minutes)
+                else:
+                    multi_trader.auto_trade_loop(max_hours=max_hours, max_trades=args.max_trades)
+            except Exception as e:
+                print(f"❌ 多账户自动交易失败: {e}")
+                print("请检查账户配置文件和网络连接")
+            finally:
+                # 失败时也要关闭签名进程池
+                if multi_trader is not None:
+                    multi_trader.close()
+            return
+
         # 检查是否配置了私钥
         if not os.getenv('PRIVATE_KEY'):
             print("❌ 自动交易需要配置PRIVATE_KEY环境变量")
             print("请复制 config.example.env 为 .env 并配置您的私钥")
             return
 
+        if args.workers > 1 and not args.burst:
+            # 分片模式：协调进程持有市场目录，工作进程按市场ID分片获取报价和下单
+            coordinator = ShardCoordinator(args.workers, strategy=args.strategy, test_only=args.test_only)
+            try:
+                if args.start_minutes and args.end_minutes:
+                    coordinator.auto_trade_loop(max_hours=None, max_trades=args.max_trades, start_minutes=args.start_minutes, end_minutes=args.end_minutes)
+                else:
+                    coordinator.auto_trade_loop(max_hours=max_hours, max_trades=args.max_trades)
+            except Exception as e:
+                print(f"❌ 分片自动交易失败: {e}")
+                print("请检查您的配置和网络连接")
+            finally:
+                coordinator.stop()
+            return
+
         try:
             auto_trader = AutoTrader()
             auto_trader.current_strategy = args.strategy
@@ -59,7 +115,9 @@ def main():
             auto_trader.test_only = args.test_only  # 设置测试模式
 
             # 运行自动交易循环
-            if args.start_minutes and args.end_minutes:
+            if args.burst:
+                auto_trader.burst_trade_loop(max_trades=args.max_trades, lookahead_minutes=args.end_minutes)
+            elif args.start_minutes and args.end_minutes:
                 auto_trader.auto_trade_loop(max_hours=None, max_trades=args.max_trades, start_minutes=args.start_minutes, end_minutes=args.end_minutes)
             else:
                 auto_trader.auto_trade_loop(max_hours=max_hours, max_trades=args.max_trades)
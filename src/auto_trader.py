@@ -1,11 +1,22 @@
 import os
-import json
+import math
 import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
 from datetime import timedelta, datetime, timezone
 from .polymarket_scanner import PolymarketScanner
 from .polymarket_trader import PolymarketTrader
-from .balance_checker import BalanceChecker
+from .market_record import MarketRecord
+from .order_signer import OrderSigningService
+from .resting_orders import RestingOrderManager, RestingOrder
+from .order_sizing import size_order
+from .hedged_request import hedger
+from .position_ledger import PositionLedger
+from .risk_engine import RiskEngine
+from .config_store import TradingConfig, trading_config_store
+from .strategy_engine import StrategyEngine, build_preset
+from .burst_mode import BurstExecutor
+from .rate_limiter import PRIORITY_HIGH
+from .exchange_clock import clock
 
 
 class AutoTrader:
@@ -19,95 +30,194 @@ class AutoTrader:
             trader: 交易器实例，如果为None则自动创建
         """
         self.trader = trader or PolymarketTrader()
-        self.scanner = PolymarketScanner(trader=self.trader)  # 传递trader给scanner
-        self.balance_checker = BalanceChecker()  # 初始化余额查询器
+        # SIGNING_PROCESSES > 0 时使用进程池签名
+        if self.trader.signing_service is None and int(os.getenv('SIGNING_PROCESSES', '0')) > 0:
+            self.trader.set_signing_service(OrderSigningService())
+        self.quote_cache = self.trader.quote_cache  # 扫描器与交易器共享报价缓存
+        self.scanner = PolymarketScanner(trader=self.trader, quote_cache=self.quote_cache)  # 传递trader给scanner
+        self.balance_checker = self.trader.balance_checker  # 与交易器共享余额查询器（及其缓存）
         
         # 从环境变量读取交易配置
         self.auto_trade_enabled = os.getenv('AUTO_TRADE_ENABLED', 'false').lower() == 'true'
-        self.default_trade_size = float(os.getenv('TRADE_AMOUNT', '1.0'))  # 从环境变量读取交易金额
-        self.max_trade_size = float(os.getenv('TRADE_AMOUNT', '1.0'))      # 最大交易大小
         self.trade_slippage = 0.01  # 固定1%滑点
-        self.min_time_remaining = int(os.getenv('MIN_TIME_REMAINING_MINUTES', '1'))  # 最少剩余1分钟
+        self.quote_max_age = float(os.getenv('TRADE_QUOTE_MAX_AGE', '1.0'))  # 交易决策可接受的最大报价时间（秒）
         
-        # 价格范围配置
-        self.min_price_range = float(os.getenv('MIN_PRICE_RANGE', '0.90'))  # 最小价格范围
-        self.max_price_range = float(os.getenv('MAX_PRICE_RANGE', '0.98'))  # 最大价格范围
+        # 价格范围、交易金额和最少剩余时间可热更新：环境变量为默认值，TRADING_CONFIG_FILE 中的值覆盖默认值
+        self.config_store = trading_config_store()
+        self.config_store.subscribe(lambda config: print(
+            f"🔄 交易配置已更新: 价格范围 {config.min_price_range}-{config.max_price_range}, "
+            f"交易金额 {config.trade_amount} USD, 最少剩余 {config.min_time_remaining} 分钟"))
+        self.config_store.start()
         
-        # 交易配置 - 固定1USD和1%滑点
+        # 交易配置 - 固定1USD和1%滑点；策略预设决定策略引擎中注册的策略
         self.current_strategy = os.getenv('TRADE_STRATEGY', 'moderate')
         self.test_only = False  # 测试模式标志
+        
+        # 下单模式: market (FOK市价单) 或 limit (到endDate过期的GTD限价单)
+        self.order_mode = os.getenv('ORDER_MODE', 'market').lower()
+        self.limit_cancel_before = int(os.getenv('LIMIT_CANCEL_BEFORE_SECONDS', '30'))  # 结束前多少秒撤销所有挂单
+        self.limit_poll_interval = float(os.getenv('LIMIT_POLL_INTERVAL', '2.0'))  # 挂单状态轮询间隔（秒）
+        
+        # 持仓账本：记录成交并在市场结算后更新已实现盈亏
+        self.ledger = PositionLedger() if os.getenv('POSITION_LEDGER_ENABLED', 'true').lower() == 'true' else None
+        self.resting_orders = RestingOrderManager(on_fill=self._record_resting_fill,
+                                                  on_close=lambda order: self.risk.release(order.reservation_id))
+        self._resting_fill_costs: Dict[str, float] = {}  # 订单ID -> 已记录的累计成交金额
+        self._resting_trades: Set[str] = set()  # 已计入成交笔数的挂单交易（origin_id，改价后的订单不重复计数）
+        
+        # 交易前风控：状态全部在内存中，下单前的检查不发起网络请求
+        self.risk = RiskEngine(self.trader.min_order_size, self.trader.max_order_size)
+        if self.ledger is not None:
+            day_start = int(clock.now()) // 86400 * 86400
+            self.risk.load_positions(self.ledger.open_positions(), self.ledger.realized_pnl_since(day_start))
+    
+    @property
+    def config(self) -> TradingConfig:
+        """当前交易配置快照，一次决策内应只读取一次"""
+        return self.config_store.snapshot
+    
+    @property
+    def min_price_range(self) -> float:
+        return self.config.min_price_range
+    
+    @property
+    def max_price_range(self) -> float:
+        return self.config.max_price_range
+    
+    @property
+    def default_trade_size(self) -> float:
+        return self.config.trade_amount
+    
+    @property
+    def max_trade_size(self) -> float:
+        return self.config.trade_amount
     
-    def analyze_market_opportunity(self, market: Dict[str, Any], time_diff: timedelta) -> Dict[str, Any]:
+    @property
+    def min_time_remaining(self) -> float:
+        return self.config.min_time_remaining
+    
+    @property
+    def current_strategy(self) -> str:
+        return self._current_strategy
+    
+    @current_strategy.setter
+    def current_strategy(self, name: str):
+        """切换 --strategy 预设时重建策略引擎"""
+        self._current_strategy = name
+        self.strategy_engine = StrategyEngine(build_preset(name))
+    
+    def analyze_markets(self, target_markets: List[tuple]) -> List[Dict[str, Any]]:
         """
-        分析市场机会
+        分析一批市场：先一次性获取所有候选市场的报价快照，再由策略引擎在一次遍历中评估所有策略
         
         Args:
-            market: 市场数据
-            time_diff: 剩余时间
+            target_markets: [(市场, 剩余时间), ...]
             
         Returns:
-            分析结果
+            分析结果列表（与输入顺序一致）
         """
-        analysis = {
-            'market': market,
-            'time_remaining': time_diff,
-            'opportunity_score': 0,
-            'recommendation': 'HOLD',
-            'trade_size': 0,
-            'reason': ''
+        config = self.config  # 整轮决策使用同一个配置快照
+        
+        # 交易决策只使用实时报价，上游故障时不回退到过期缓存
+        snapshot = {
+            item['market'].id: item['data']
+            for item in self.scanner.get_multiple_markets_data(
+                [market for market, _ in target_markets], max_age=self.quote_max_age,
+                allow_stale=False, priority=PRIORITY_HIGH)
         }
+        signals = self.strategy_engine.evaluate(
+            [(market, time_diff.total_seconds()) for market, time_diff in target_markets], snapshot, config)
         
-        try:
-            # 计算剩余时间（分钟）
-            minutes_remaining = time_diff.total_seconds() / 60
+        analyses = []
+        for market, time_diff in target_markets:
+            analysis = {
+                'market': market,
+                'time_remaining': time_diff,
+                'opportunity_score': 0,  # 不再使用复杂的机会分数
+                'recommendation': 'HOLD',
+                'trade_size': 0,
+                'reason': ''
+            }
+            analyses.append(analysis)
             
-            # 获取市场数据
-            market_data = self.scanner.get_market_data(market)
+            market_data = snapshot.get(market.id)
             if not market_data:
-                analysis['reason'] = '无法获取市场数据'
-                return analysis
-            
-            yes_mid = float(market_data['yes']['mid'])
-            no_mid = float(market_data['no']['mid'])
-            
-            # 简化的交易策略：只检查价格是否在配置的范围内
-            analysis['opportunity_score'] = 0  # 不再使用复杂的机会分数
-            
-            # 检查是否有价格在配置的范围内
-            yes_in_range = self.min_price_range <= yes_mid <= self.max_price_range
-            no_in_range = self.min_price_range <= no_mid <= self.max_price_range
+                analysis['reason'] = '无法获取实时市场数据'
+                continue
             
-            # 生成建议 - 只购买价格在配置范围内的一方
-            if minutes_remaining >= self.min_time_remaining:
-                if yes_in_range and not no_in_range:
-                    # 只有YES价格在范围内，买入YES (Up)
-                    analysis['recommendation'] = 'BUY_YES'
-                    analysis['trade_size'] = self.default_trade_size
-                    analysis['reason'] = f'YES价格{yes_mid:.3f}在{self.min_price_range}-{self.max_price_range}范围内，买入Up，剩余时间{minutes_remaining:.1f}分钟'
-                elif no_in_range and not yes_in_range:
-                    # 只有NO价格在范围内，买入NO (Down)
-                    analysis['recommendation'] = 'BUY_NO'
-                    analysis['trade_size'] = self.default_trade_size
-                    analysis['reason'] = f'NO价格{no_mid:.3f}在{self.min_price_range}-{self.max_price_range}范围内，买入Down，剩余时间{minutes_remaining:.1f}分钟'
-                elif yes_in_range and no_in_range:
-                    # 两个价格都在范围内，选择价格更高的
-                    if yes_mid >= no_mid:
-                        analysis['recommendation'] = 'BUY_YES'
-                        analysis['trade_size'] = self.default_trade_size
-                        analysis['reason'] = f'YES价格{yes_mid:.3f}和NO价格{no_mid:.3f}都在{self.min_price_range}-{self.max_price_range}范围内，YES价格更高，买入Up，剩余时间{minutes_remaining:.1f}分钟'
+            try:
+                yes_mid = float(market_data['yes']['mid'])
+                no_mid = float(market_data['no']['mid'])
+                analysis['yes_mid'] = yes_mid
+                analysis['no_mid'] = no_mid
+                
+                signal = signals.get(market.id)
+                if signal is None:
+                    minutes_remaining = time_diff.total_seconds() / 60
+                    if minutes_remaining < config.min_time_remaining:
+                        analysis['reason'] = f'剩余时间不足({minutes_remaining:.1f}分钟 < {config.min_time_remaining}分钟)'
                     else:
-                        analysis['recommendation'] = 'BUY_NO'
-                        analysis['trade_size'] = self.default_trade_size
-                        analysis['reason'] = f'YES价格{yes_mid:.3f}和NO价格{no_mid:.3f}都在{self.min_price_range}-{self.max_price_range}范围内，NO价格更高，买入Down，剩余时间{minutes_remaining:.1f}分钟'
-                else:
-                    # 没有价格在范围内
-                    analysis['reason'] = f'YES价格{yes_mid:.3f}和NO价格{no_mid:.3f}都不在{self.min_price_range}-{self.max_price_range}范围内'
-            else:
-                analysis['reason'] = f'剩余时间不足({minutes_remaining:.1f}分钟 < {self.min_time_remaining}分钟)'
+                        analysis['reason'] = f'YES价格{yes_mid:.3f}和NO价格{no_mid:.3f}都不满足策略 {self.current_strategy} 的价格范围'
+                    continue
+                
+                analysis['recommendation'] = signal.recommendation
+                analysis['trade_size'] = signal.trade_size
+                analysis['reason'] = signal.reason
+                analysis['strategy'] = signal.strategy
+                
+                # 按订单簿卖单深度确定下单规模，避免发出会被取消的FOK订单
+                side_key = 'yes' if signal.recommendation == 'BUY_YES' else 'no'
+                analysis['asks'] = market_data[side_key]['asks']
+                self.apply_depth_sizing(analysis, signal.trade_size, config.max_price_range)
+            except Exception as e:
+                analysis['recommendation'] = 'HOLD'
+                analysis['trade_size'] = 0
+                analysis['reason'] = f'分析失败: {e}'
+        
+        return analyses
+    
+    def analyze_market_opportunity(self, market: MarketRecord, time_diff: timedelta) -> Dict[str, Any]:
+        """
+        分析单个市场机会
+        
+        Args:
+            market: 市场数据
+            time_diff: 剩余时间
             
-        except Exception as e:
-            analysis['reason'] = f'分析失败: {e}'
+        Returns:
+            分析结果
+        """
+        return self.analyze_markets([(market, time_diff)])[0]
+    
+    def apply_depth_sizing(self, analysis: Dict[str, Any], target_size: float, max_price: Optional[float] = None) -> Dict[str, Any]:
+        """
+        按卖单深度计算VWAP并限制下单金额，深度不足最小订单时改为HOLD
+        
+        Args:
+            analysis: 包含 asks 的分析结果（会被直接修改）
+            target_size: 目标下单金额（USD）
+            max_price: 可接受的最高价格，如果为None则使用当前配置的最大价格范围
+            
+        Returns:
+            修改后的分析结果
+        """
+        max_price = self.max_price_range if max_price is None else max_price
+        sizing = size_order(analysis['asks'], target_size, max_price, self.trade_slippage)
+        trade_size = math.floor(sizing.notional * 100) / 100
+        analysis['sizing'] = sizing
+        
+        if trade_size < self.trader.min_order_size:
+            analysis['recommendation'] = 'HOLD'
+            analysis['trade_size'] = 0
+            analysis['price_limit'] = None
+            analysis['reason'] += f'，但{sizing.reason or "可成交金额不足"}，低于最小订单{self.trader.min_order_size} USD，不下单'
+            return analysis
         
+        analysis['trade_size'] = trade_size
+        analysis['price_limit'] = sizing.worst_price  # FOK市价单的最差成交价
+        if sizing.capped:
+            analysis['reason'] += f'，{sizing.reason}，下单金额调整为{trade_size} USD'
+        analysis['reason'] += f'，VWAP {sizing.vwap:.3f}'
         return analysis
     
     def scan_and_analyze(self, max_hours: float = 1.0, start_minutes: Optional[int] = None, end_minutes: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -122,44 +232,27 @@ class AutoTrader:
         Returns:
             分析结果列表
         """
-        if start_minutes is not None and end_minutes is not None:
-            print(f"扫描 {start_minutes}-{end_minutes} 分钟内结束的市场机会...")
-            # 使用新的时间范围扫描
-            target_markets = self.scanner.scan_near_end_markets(start_minutes, end_minutes)
-        elif max_hours is None:
-            print("扫描所有未结束的市场机会...")
-            # 获取所有市场
-            markets = self.scanner.fetch_markets()
-            markets_with_time = self.scanner.get_markets_with_time(markets)
-            target_markets = markets_with_time
-        else:
-            print(f"扫描 {max_hours} 小时内的市场机会...")
-            # 获取短期市场
-            markets = self.scanner.fetch_markets()
-            markets_with_time = self.scanner.get_markets_with_time(markets)
-            target_markets = self.scanner.get_short_term_markets(markets_with_time, max_hours)
-        
-        opportunities = []
-        
-        for market, time_diff in target_markets:
-            try:
-                analysis = self.analyze_market_opportunity(market, time_diff)
-                opportunities.append(analysis)
-            except Exception as e:
-                print(f"⚠️ 分析市场失败 {market.get('ticker', 'Unknown')}: {e}")
-                # 添加一个失败的分析结果
-                opportunities.append({
-                    'market': market,
-                    'time_remaining': time_diff,
-                    'opportunity_score': 0,
-                    'recommendation': 'HOLD',
-                    'trade_size': 0,
-                    'reason': f'分析失败: {e}'
-                })
+        target_markets = self.scanner.find_target_markets(max_hours, start_minutes, end_minutes)
+        try:
+            opportunities = self.analyze_markets(target_markets)
+        except Exception as e:
+            print(f"⚠️ 分析市场失败: {e}")
+            # 为每个市场添加一个失败的分析结果
+            opportunities = [{
+                'market': market,
+                'time_remaining': time_diff,
+                'opportunity_score': 0,
+                'recommendation': 'HOLD',
+                'trade_size': 0,
+                'reason': f'分析失败: {e}'
+            } for market, time_diff in target_markets]
         
         # 按机会分数排序
         opportunities.sort(key=lambda x: x['opportunity_score'], reverse=True)
         
+        # 批量读取链上余额并同步给风控引擎（同时刷新余额缓存，下面的显示不再查询）
+        self.sync_balances([self.trader])
+        
         # 显示账户余额信息
         print(f"\n=== 账户余额信息 ===")
         self.balance_checker.print_balance_info(self.trader.funder, self.default_trade_size)
@@ -167,13 +260,47 @@ class AutoTrader:
         
         return opportunities
     
-    def execute_trade(self, analysis: Dict[str, Any], max_retries: int = 2) -> Dict[str, Any]:
+    def sync_balances(self, traders: List[PolymarketTrader]) -> Dict[str, float]:
+        """
+        一次链上往返读取所有下单账户的USDC余额和授权额度，同步给风控引擎（在关键路径之外调用）；
+        批量读取失败的账户逐个查询余额
+        
+        Args:
+            traders: 下单账户的交易器
+            
+        Returns:
+            资金地址 -> 余额（USD），查询失败的账户不在结果中且不更新风控
+        """
+        try:
+            states = self.balance_checker.get_portfolio([trader.funder for trader in traders])
+        except Exception as e:
+            print(f"⚠️ 批量读取链上持仓失败，逐个查询余额: {e}")
+            states = {}
+        
+        balances = {}
+        for trader in traders:
+            state = states.get(trader.funder)
+            if state is not None and state.usdc_balance is not None:
+                balance = state.usdc_balance
+                if state.usdc_allowance is not None and state.usdc_allowance < self.default_trade_size:
+                    print(f"⚠️ {trader.funder} 对CTF交易所的USDC授权额度不足: {state.usdc_allowance:.2f} USD")
+            else:
+                result = trader.balance_checker.get_usdc_balance(trader.funder)
+                if result["status"] != "success":
+                    continue
+                balance = result["balance_usdc"]
+            self.risk.update_balance(trader.funder, balance)
+            balances[trader.funder] = balance
+        return balances
+    
+    def execute_trade(self, analysis: Dict[str, Any], max_retries: int = 2, trader: Optional[PolymarketTrader] = None) -> Dict[str, Any]:
         """
         执行交易（带重试机制）
         
         Args:
             analysis: 市场分析结果
             max_retries: 最大重试次数
+            trader: 下单使用的交易器，如果为None则使用默认交易器（多账户时按账户传入）
             
         Returns:
             交易结果
@@ -188,42 +315,64 @@ class AutoTrader:
         if recommendation == 'HOLD':
             return {'success': False, 'error': '不建议交易'}
         
+        trader = trader or self.trader
+        
+        # token ID 已在市场记录入口处解析
+        if not market.has_tokens:
+            return {'success': False, 'error': '无法获取token ID'}
+        
+        # 检查通过即预留额度：成交时转为敞口，下单失败或抛出异常时释放
+        decision = self.risk.check(trader.funder, market, trade_size)
+        if not decision.approved:
+            return {'success': False, 'error': f'风控拒绝: {decision.reason}', 'attempts': 0}
+        
+        result = None
+        try:
+            if self.order_mode == 'limit':
+                result = self._execute_limit_trade(analysis, trader, decision.reservation_id)
+            else:
+                result = self._execute_market_trade(analysis, trader, max_retries, decision.reservation_id)
+            return result
+        finally:
+            if result is None or not result['success']:
+                self.risk.release(decision.reservation_id)
+    
+    def _execute_market_trade(self, analysis: Dict[str, Any], trader: PolymarketTrader, max_retries: int,
+                              reservation_id: int) -> Dict[str, Any]:
+        """下FOK市价单（带重试机制）"""
+        recommendation = analysis['recommendation']
+        trade_size = analysis['trade_size']
+        yes_token_id = analysis['market'].yes_token_id  # Up token
+        no_token_id = analysis['market'].no_token_id    # Down token
+        
         for attempt in range(max_retries + 1):
             try:
-                # 获取token ID
-                if 'markets' not in market or not market['markets']:
-                    return {'success': False, 'error': '无法获取token ID'}
-                
-                tokenids = json.loads(market['markets'][0]['clobTokenIds'])
-                # 注意：Polymarket的token ID映射可能与预期相反
-                # tokenids[0] 通常是 NO token (Down)
-                # tokenids[1] 通常是 YES token (Up)
-                no_token_id = tokenids[0]   # Down token
-                yes_token_id = tokenids[1]  # Up token
-                
                 # 执行交易
                 result = None
                 if recommendation == 'BUY_YES':
-                    result = self.trader.place_market_order(
+                    result = trader.place_market_order(
                         yes_token_id, 
                         "BUY", 
                         trade_size, 
                         self.trade_slippage,
-                        "YES"
+                        "YES",
+                        price=analysis.get('price_limit')
                     )
                 elif recommendation == 'BUY_NO':
-                    result = self.trader.place_market_order(
+                    result = trader.place_market_order(
                         no_token_id, 
                         "BUY", 
                         trade_size, 
                         self.trade_slippage,
-                        "NO"
+                        "NO",
+                        price=analysis.get('price_limit')
                     )
                 else:
                     return {'success': False, 'error': f'未知交易建议: {recommendation}'}
                 
                 # 如果交易成功，返回结果
                 if result is not None:
+                    self._record_market_fill(trader, analysis, result, reservation_id)
                     return {
                         'success': True,
                         'order': result,
@@ -257,6 +406,117 @@ class AutoTrader:
         
         return {'success': False, 'error': '交易失败，已达到最大重试次数'}
     
+    def _record_market_fill(self, trader: PolymarketTrader, analysis: Dict[str, Any], result: Dict[str, Any],
+                            reservation_id: int = 0):
+        """把FOK市价单的成交记录到风控引擎（预留转为敞口）和持仓账本"""
+        market = analysis['market']
+        order_id = result.get('orderID') or result.get('id')
+        if analysis['recommendation'] == 'BUY_YES':
+            token_id, outcome = market.yes_token_id, "YES"
+        else:
+            token_id, outcome = market.no_token_id, "NO"
+        
+        # 买单的 makingAmount 为支付的USD，takingAmount 为得到的股数；缺失时按VWAP估算
+        cost = float(result.get('makingAmount') or 0) or analysis['trade_size']
+        shares = float(result.get('takingAmount') or 0)
+        if not shares:
+            sizing = analysis.get('sizing')
+            price = (sizing.vwap if sizing is not None else 0) or analysis.get('price_limit') or 1.0
+            shares = cost / price
+        
+        self.risk.on_fill(trader.funder, market, cost, reservation_id=reservation_id)
+        if self.ledger is None or not order_id:
+            return
+        try:
+            self.ledger.record_fill(order_id, trader.funder, market, token_id, outcome, shares, cost)
+        except Exception as e:
+            print(f"⚠️ 记录成交失败 {order_id}: {e}")
+    
+    def _record_resting_fill(self, order: RestingOrder):
+        """把限价单的累计成交记录到风控引擎和持仓账本"""
+        cost = order.size_matched * order.price
+        previous_cost = self._resting_fill_costs.get(order.order_id, 0.0)
+        self._resting_fill_costs[order.order_id] = cost
+        if cost > previous_cost:
+            new_trade = order.origin_id not in self._resting_trades
+            self._resting_trades.add(order.origin_id)
+            self.risk.on_fill(order.trader.funder, order.market, cost - previous_cost, new_trade=new_trade,
+                              reservation_id=order.reservation_id, final=False)
+        if self.ledger is None:
+            return
+        try:
+            self.ledger.record_fill(order.order_id, order.trader.funder, order.market, order.token_id,
+                                    order.token_type, order.size_matched, cost)
+        except Exception as e:
+            print(f"⚠️ 记录成交失败 {order.order_id}: {e}")
+    
+    def settle_positions(self) -> int:
+        """
+        结算已到endDate的持仓，并增量更新已实现盈亏
+        
+        Returns:
+            本次结算的市场数
+        """
+        if self.ledger is None:
+            return 0
+        settled = 0
+        for pending in self.ledger.pending_markets(clock.now()):
+            try:
+                winning_token_id = self.scanner.fetch_winning_token(pending['market_id'], pending['ticker'])
+            except Exception as e:
+                print(f"⚠️ 查询结算结果失败 {pending['ticker']}: {e}")
+                continue
+            if winning_token_id is None:
+                continue  # 尚未结算，下次再查
+            pnl = self.ledger.settle_market(pending['market_id'], winning_token_id)
+            self.risk.on_settle(pending['market_id'], pnl)
+            settled += 1
+            print(f"📒 已结算 {pending['ticker']}: 盈亏 {pnl:+.4f} USD")
+        return settled
+    
+    def _limit_price(self, mid: float) -> float:
+        """限价 = 中间价 + 滑点，不超过配置的最高价格"""
+        return min(self.max_price_range, mid + self.trade_slippage)
+    
+    def _execute_limit_trade(self, analysis: Dict[str, Any], trader: PolymarketTrader, reservation_id: int = 0) -> Dict[str, Any]:
+        """挂出在市场结束时过期的GTD限价单，后续由挂单管理器跟踪"""
+        market = analysis['market']
+        if analysis['recommendation'] == 'BUY_YES':
+            token_id, token_type, mid = market.yes_token_id, "YES", analysis['yes_mid']
+        elif analysis['recommendation'] == 'BUY_NO':
+            token_id, token_type, mid = market.no_token_id, "NO", analysis['no_mid']
+        else:
+            return {'success': False, 'error': f"未知交易建议: {analysis['recommendation']}"}
+        
+        order = self.resting_orders.place(trader, market, token_id, token_type, analysis['trade_size'], self._limit_price(mid),
+                                          reservation_id)
+        if order is None:
+            return {'success': False, 'error': '限价单下单失败', 'attempts': 1}
+        return {'success': True, 'order': order, 'analysis': analysis, 'attempts': 1}
+    
+    def _resting_target_price(self, order: RestingOrder) -> Optional[float]:
+        """根据最新中间价计算挂单的目标价格，价格离开范围时不改价"""
+        market_data = self.scanner.get_market_data(order.market, max_age=self.quote_max_age, allow_stale=False)
+        if not market_data:
+            return None
+        mid = float(market_data['yes' if order.token_type == "YES" else 'no']['mid'])
+        if not self.min_price_range <= mid <= self.max_price_range:
+            return None
+        return self._limit_price(mid)
+    
+    def manage_resting_orders(self):
+        """跟踪挂单直到成交或到达撤单截止时间（各自市场结束前 limit_cancel_before 秒）"""
+        live_orders = self.resting_orders.live_orders()
+        if not live_orders:
+            return
+        
+        deadline_ts = max(order.market.end_ts for order in live_orders) - self.limit_cancel_before
+        print(f"\n=== 挂单管理: {len(live_orders)} 笔挂单，最晚截止 {datetime.fromtimestamp(deadline_ts).strftime('%H:%M:%S')} ===")
+        self.resting_orders.manage_until(self.limit_cancel_before, self.limit_poll_interval, self._resting_target_price)
+        
+        summary = self.resting_orders.get_summary()
+        print(f"挂单结果: 成交{summary['matched']}笔, 撤销/过期{summary['canceled']}笔, 改价{summary['repriced']}笔")
+    
     def auto_trade_loop(self, max_hours: float = 1.0, max_trades: int = 5, start_minutes: Optional[int] = None, end_minutes: Optional[int] = None):
         """
         自动交易循环
@@ -270,6 +530,7 @@ class AutoTrader:
         print("=== 自动交易循环开始 ===")
         print(f"策略: 简化策略 - 只购买价格在{self.min_price_range}-{self.max_price_range}范围内的一方")
         print(f"交易金额: {self.default_trade_size} USD")
+        print(f"下单模式: {'GTD限价单' if self.order_mode == 'limit' else 'FOK市价单'}")
         print(f"自动交易: {'启用' if self.auto_trade_enabled else '禁用'}")
         print(f"测试模式: {'启用' if self.test_only else '禁用'}")
         
@@ -290,7 +551,7 @@ class AutoTrader:
             recommendation = analysis['recommendation']
             reason = analysis['reason']
             
-            print(f"\n{i+1}. {market['ticker']} - {market['title']}")
+            print(f"\n{i+1}. {market.ticker} - {market.title}")
             print(f"   建议: {recommendation}")
             print(f"   原因: {reason}")
             
@@ -317,9 +578,74 @@ class AutoTrader:
                         attempts = trade_result.get('attempts', 1)
                         print(f"   ❌ 交易失败: {trade_result['error']} (尝试{attempts}次)")
         
+        if self.order_mode == 'limit' and not self.test_only:
+            self.manage_resting_orders()
+        
         print(f"\n=== 交易总结 ===")
         print(f"执行交易: {trades_executed}/{max_trades}")
         print(f"分析机会: {len(opportunities)}")
+        
+        if self.trader.signing_service is not None:
+            self.trader.signing_service.print_stats()
+        
+        cache_stats = self.quote_cache.get_stats()
+        print(f"报价缓存: 命中{cache_stats['hits']}次, 未命中{cache_stats['misses']}次, 命中率{cache_stats['hit_rate']*100:.1f}%")
+        
+        hedge_stats = hedger.get_stats()
+        print(f"对冲请求: {hedge_stats['hedges']}/{hedge_stats['requests']}次 ({hedge_stats['hedge_ratio']*100:.1f}%), 对冲先返回{hedge_stats['hedge_wins']}次")
+        
+        for name, stats in self.strategy_engine.get_stats().items():
+            print(f"策略 {name}: 评估{stats['calls']}次, 平均{stats['avg_us']:.1f}µs, 最大{stats['max_us']:.1f}µs, 信号{stats['signals']}个")
+        
+        risk_stats = self.risk.get_stats()
+        print(f"风控: 总敞口 {risk_stats['total_exposure']:.2f} USD, 当日盈亏 {risk_stats['daily_pnl']:+.2f} USD, "
+              f"当日成交{risk_stats['daily_trades']}笔, 拒绝{risk_stats['rejections']}次")
+        
+        # 交易结束后再结算到期持仓，不占用入场时的关键路径
+        if self.ledger is not None:
+            self.settle_positions()
+            ledger_summary = self.ledger.get_summary()
+            print(f"持仓账本: 已实现盈亏 {ledger_summary['realized_pnl']:+.4f} USD, 已结算{ledger_summary['settled']}笔, "
+                  f"胜率{ledger_summary['win_rate']*100:.1f}%, 未结算成本 {ledger_summary['open_cost']:.4f} USD")
+    
+    def burst_trade_loop(self, max_trades: int = 1, lookahead_minutes: Optional[float] = None):
+        """
+        最后数秒突击模式：对即将结束的市场预签名订单，在结束前 BURST_WINDOW_SECONDS 秒内高频轮询订单簿并下单
+        
+        Args:
+            max_trades: 最大交易次数
+            lookahead_minutes: 选取多少分钟内结束的市场，如果为None则为突击窗口加预签名时间后再加1分钟
+        """
+        burst = BurstExecutor(self)
+        if lookahead_minutes is None:
+            lookahead_minutes = (burst.window + burst.arm_lead) / 60 + 1
+        
+        print("=== 最后数秒突击模式 ===")
+        print(f"突击窗口: 结束前{burst.window}秒, 轮询间隔 {burst.poll_interval * 1000:.0f}ms, "
+              f"延迟预算 {burst.latency_budget * 1000:.0f}ms, 截止: 结束前{burst.cutoff}秒")
+        print(f"价格范围: {self.min_price_range}-{self.max_price_range}, 交易金额: {self.default_trade_size} USD")
+        
+        markets = self.scanner.fetch_markets_ending_within((burst.cutoff + burst.latency_budget) / 60, lookahead_minutes)
+        targets = [market for market, _ in self.scanner.get_markets_with_time(markets) if market.has_tokens]
+        print(f"找到 {len(targets)} 个{lookahead_minutes:.1f}分钟内结束的市场")
+        for market in targets:
+            print(f"  {market.ticker} - {market.title} (结束于 {market.end_date})")
+        
+        if not self.auto_trade_enabled or self.test_only:
+            print("🧪 测试模式或自动交易未启用，不预签名也不下单")
+            return
+        
+        results = burst.run(targets, max_trades)
+        
+        print(f"\n=== 突击总结 ===")
+        for result in results:
+            status = '✅ 成交' if result['success'] else f"❌ {result['error']}"
+            print(f"{result['market'].ticker}: {status}")
+        stats = burst.get_stats()
+        print(f"轮询{stats['polls']}次, 下单{stats['fired']}笔, 超出延迟预算{stats['over_budget']}次")
+        if 'tick_to_post_p50_ms' in stats:
+            print(f"收到行情到提交: P50 {stats['tick_to_post_p50_ms']:.1f}ms, 最大 {stats['tick_to_post_max_ms']:.1f}ms; "
+                  f"提交耗时: P50 {stats['post_p50_ms']:.1f}ms, 最大 {stats['post_max_ms']:.1f}ms")
 
 
 def main():
@@ -3,9 +3,15 @@
 余额查询器 - 专门用于查询Polygon网络上的USDC余额
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+import os
+import threading
+import time
 import requests
 
+from .endpoints import polygon_rpc_urls
+from .onchain_reader import OnchainReader, PortfolioState
+
 # 尝试导入web3，如果没有安装则跳过
 try:
     from web3 import Web3
@@ -20,11 +26,7 @@ class BalanceChecker:
     def __init__(self):
         """初始化余额查询器"""
         self.usdc_contract = "0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174"  # Polygon USDC合约地址
-        self.rpc_endpoints = [
-            "https://polygon-rpc.com",
-            "https://rpc-mainnet.maticvigil.com",
-            "https://polygon-mainnet.chainstacklabs.com"
-        ]
+        self.rpc_endpoints = polygon_rpc_urls()
         
         # USDC合约ABI（只需要balanceOf方法）
         self.usdc_abi = [
@@ -36,17 +38,84 @@ class BalanceChecker:
                 "type": "function"
             }
         ]
+        
+        # 每个RPC端点复用一个Web3实例（保持HTTP连接），成功的查询结果短时间缓存
+        self._web3: Dict[str, Any] = {}
+        self.cache_ttl = float(os.getenv('BALANCE_CACHE_TTL', '15'))
+        self._cache: Dict[str, tuple] = {}  # 地址 -> (查询时间, 结果)
+        self._lock = threading.Lock()
+        self._reader: Optional[OnchainReader] = None
     
-    def get_usdc_balance(self, address: str) -> Dict[str, Any]:
+    def _get_web3(self, rpc_url: str):
+        w3 = self._web3.get(rpc_url)
+        if w3 is None:
+            w3 = self._web3[rpc_url] = Web3(Web3.HTTPProvider(rpc_url))
+        return w3
+    
+    def get_usdc_balance(self, address: str, max_age: Optional[float] = None) -> Dict[str, Any]:
         """
         获取指定地址的USDC余额
         
         Args:
             address: 要查询的地址
+            max_age: 可接受的缓存时间（秒），如果为None则使用BALANCE_CACHE_TTL，0表示强制查询
             
         Returns:
             包含余额信息的字典
         """
+        max_age = self.cache_ttl if max_age is None else max_age
+        with self._lock:
+            cached = self._cache.get(address.lower())
+        if cached is not None and time.monotonic() - cached[0] <= max_age:
+            return cached[1]
+        
+        result = self._query_usdc_balance(address)
+        if result["status"] == "success":
+            with self._lock:
+                self._cache[address.lower()] = (time.monotonic(), result)
+        return result
+    
+    def refresh(self, address: str) -> Dict[str, Any]:
+        """强制查询并刷新余额缓存"""
+        return self.get_usdc_balance(address, max_age=0)
+    
+    def invalidate(self, address: str):
+        """使余额缓存失效（如下单后余额已变化）"""
+        with self._lock:
+            self._cache.pop(address.lower(), None)
+    
+    def get_portfolio(self, addresses: List[str], token_ids: List[str] = ()) -> Dict[str, PortfolioState]:
+        """
+        一次RPC往返读取多个地址的USDC余额、授权和条件代币持仓，并刷新余额缓存
+        
+        Args:
+            addresses: 要查询的地址列表
+            token_ids: 需要查询持仓的条件代币ID
+            
+        Returns:
+            地址 -> 持仓状态
+        """
+        if self._reader is None:
+            self._reader = OnchainReader(self.rpc_endpoints)
+        states = self._reader.get_portfolio(addresses, token_ids)
+        
+        now = time.monotonic()
+        with self._lock:
+            for address, state in states.items():
+                if state.usdc_balance is None:
+                    continue
+                self._cache[address.lower()] = (now, {
+                    "address": address,
+                    "balance_usdc": state.usdc_balance,
+                    "balance_wei": round(state.usdc_balance * 1e6),
+                    "status": "success",
+                    "method": f"批量读取 ({self._reader.mode})",
+                    "contract": self.usdc_contract
+                })
+        return states
+    
+    def _query_usdc_balance(self, address: str) -> Dict[str, Any]:
+        """通过RPC查询USDC余额"""
         if not WEB3_AVAILABLE:
             return {
                 "address": address,
@@ -58,7 +127,7 @@ class BalanceChecker:
         
         for rpc_url in self.rpc_endpoints:
             try:
-                w3 = Web3(Web3.HTTPProvider(rpc_url))
+                w3 = self._get_web3(rpc_url)
                 
                 if not w3.is_connected():
                     continue
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+最后数秒突击模式 - 在市场endDate前的最后N秒内高频轮询订单簿，两边的FOK订单提前签名，
+价格区间条件一满足就直接提交预签名订单；记录从收到行情到提交订单的耗时，
+超过延迟预算的行情不再下单，距离结束不足截止时间后停止下单
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Dict, List, Optional
+
+from .exchange_clock import clock
+from .market_record import MarketRecord
+from .order_sizing import size_order
+
+
+@dataclass
+class ArmedOrder:
+    """预签名的FOK买单"""
+    token_id: str
+    outcome: str          # YES 或 NO
+    signed_order: Any
+    size: float           # 下单金额（USD）
+    price_limit: float    # 最差成交价（签名时确定，即配置的最大价格）
+    armed_at: float       # 签名完成时间（monotonic）
+
+
+def _exchange_now() -> float:
+    """交易所时间的直接读取（不检查同步状态，突击循环中不能等待网络请求）"""
+    return clock.local_time() + clock.offset
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+
+class BurstExecutor:
+    """最后数秒突击执行器（每个市场一个线程）"""
+
+    def __init__(self, auto_trader):
+        """
+        初始化突击执行器
+
+        Args:
+            auto_trader: AutoTrader实例（使用其交易器、扫描器、策略引擎、风控和持仓账本）
+        """
+        self.auto_trader = auto_trader
+        self.window = float(os.getenv('BURST_WINDOW_SECONDS', '20'))             # 结束前多少秒开始突击
+        self.arm_lead = float(os.getenv('BURST_ARM_LEAD_SECONDS', '10'))         # 进入突击窗口前多少秒预签名
+        self.poll_interval = float(os.getenv('BURST_POLL_INTERVAL', '0.1'))      # 订单簿轮询间隔（秒）
+        self.latency_budget = float(os.getenv('BURST_LATENCY_BUDGET_MS', '250')) / 1000  # 发出行情请求到提交订单的最长耗时
+        self.cutoff = float(os.getenv('BURST_CUTOFF_SECONDS', '2'))              # 距离结束不足多少秒后不再下单
+
+        self._tick_to_post: Deque[float] = deque(maxlen=1000)   # 发出行情请求到开始提交（毫秒）
+        self._post_latency: Deque[float] = deque(maxlen=1000)   # 提交订单往返（毫秒）
+        self._lock = threading.Lock()
+        self._trades_left = 0
+        self.polls = 0
+        self.fired = 0
+        self.over_budget = 0
+
+    def arm(self, market: MarketRecord, size: float, price_limit: float) -> Dict[str, ArmedOrder]:
+        """为YES和NO两边各签名一个FOK买单"""
+        trader = self.auto_trader.trader
+        armed = {}
+        for outcome, token_id in (('YES', market.yes_token_id), ('NO', market.no_token_id)):
+            signed_order = trader.prepare_market_order(token_id, "BUY", size, price_limit)
+            armed[outcome] = ArmedOrder(token_id, outcome, signed_order, size, price_limit, time.monotonic())
+        return armed
+
+    def _take_trade(self) -> bool:
+        with self._lock:
+            if self._trades_left <= 0:
+                return False
+            self._trades_left -= 1
+            return True
+
+    def _release_trade(self):
+        with self._lock:
+            self._trades_left += 1
+
+    def run_market(self, market: MarketRecord) -> Dict[str, Any]:
+        """
+        对一个市场执行突击：提前签名，进入窗口后轮询订单簿，条件满足时提交预签名订单
+
+        Returns:
+            {'success', 'market', 'error', 'order'}
+        """
+        auto_trader = self.auto_trader
+        trader = auto_trader.trader
+        config = auto_trader.config
+        armed_config = config  # 预签名订单对应的配置快照，配置变化时重新签名
+
+        # 等到预签名时间
+        delay = market.end_ts - _exchange_now() - self.window - self.arm_lead
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            armed = self.arm(market, config.trade_amount, config.max_price_range)
+        except Exception as e:
+            return {'success': False, 'market': market, 'error': f'预签名失败: {e}'}
+        print(f"🎯 {market.ticker}: 已预签名YES/NO订单 {config.trade_amount} USD，限价 {config.max_price_range}")
+
+        delay = market.end_ts - _exchange_now() - self.window
+        if delay > 0:
+            time.sleep(delay)
+
+        while True:
+            poll_start = time.perf_counter()
+            remaining = market.end_ts - _exchange_now()
+            if remaining - self.latency_budget < self.cutoff:
+                return {'success': False, 'market': market, 'error': f'到达截止时间（结束前{self.cutoff}秒）'}
+
+            config = auto_trader.config
+            if config is not armed_config:
+                try:
+                    armed = self.arm(market, config.trade_amount, config.max_price_range)
+                except Exception as e:
+                    return {'success': False, 'market': market, 'error': f'重新签名失败: {e}'}
+                armed_config = config
+
+            # 延迟预算从发出行情请求时开始算；YES/NO订单簿合并为一次 /books 请求
+            tick = time.perf_counter()
+            rows = auto_trader.scanner.get_books_data([market])
+            market_data = rows[0]['data'] if rows else None
+            with self._lock:
+                self.polls += 1
+            if market_data is not None:
+                # 突击窗口本身就在最后数秒，不再要求最少剩余时间
+                signals = auto_trader.strategy_engine.evaluate(
+                    [(market, remaining)], {market.id: market_data}, replace(config, min_time_remaining=0))
+                signal = signals.get(market.id)
+                if signal is not None:
+                    result = self._fire(market, market_data, signal, armed, tick)
+                    if result is not None:
+                        if result['success'] or result.get('final'):
+                            return result
+                        # FOK未成交：重新签名该方向的订单，继续轮询
+                        order = armed[result['outcome']]
+                        try:
+                            signed_order = trader.prepare_market_order(order.token_id, "BUY", order.size, order.price_limit)
+                        except Exception as e:
+                            return {'success': False, 'market': market, 'error': f'重新签名失败: {e}'}
+                        armed[result['outcome']] = ArmedOrder(order.token_id, order.outcome, signed_order,
+                                                              order.size, order.price_limit, time.monotonic())
+
+            sleep = self.poll_interval - (time.perf_counter() - poll_start)
+            if sleep > 0:
+                time.sleep(sleep)
+
+    def _fire(self, market: MarketRecord, market_data: Dict[str, Any], signal, armed: Dict[str, ArmedOrder],
+              tick: float) -> Optional[Dict[str, Any]]:
+        """条件满足时提交预签名订单；不满足深度、风控或延迟预算时返回None继续轮询"""
+        auto_trader = self.auto_trader
+        trader = auto_trader.trader
+        outcome = 'YES' if signal.recommendation == 'BUY_YES' else 'NO'
+        order = armed[outcome]
+
+        # 预签名订单的金额固定，卖单深度必须能在限价内吃下整单
+        asks = market_data['yes' if outcome == 'YES' else 'no']['asks']
+        sizing = size_order(asks, order.size, order.price_limit, auto_trader.trade_slippage)
+        if sizing.notional < order.size - 1e-9:
+            return None
+
+        elapsed = time.perf_counter() - tick
+        if elapsed > self.latency_budget:
+            with self._lock:
+                self.over_budget += 1
+            return None
+        if market.end_ts - _exchange_now() < self.cutoff:
+            return {'success': False, 'final': True, 'market': market, 'error': '到达截止时间'}
+        if not self._take_trade():
+            return {'success': False, 'final': True, 'market': market, 'error': '已达到最大交易次数'}
+        # 风控检查通过即预留额度，提交前不再有其他会放弃下单的分支
+        decision = auto_trader.risk.check(trader.funder, market, order.size)
+        if not decision.approved:
+            self._release_trade()
+            return {'success': False, 'final': True, 'market': market, 'error': f'风控拒绝: {decision.reason}'}
+
+        post_start = time.perf_counter()
+        try:
+            result = trader.post_prepared_order(order.signed_order, order.token_id)
+        except Exception as e:
+            result = None
+            error = str(e)
+        post_end = time.perf_counter()
+        with self._lock:
+            self._tick_to_post.append((post_start - tick) * 1000)
+            self._post_latency.append((post_end - post_start) * 1000)
+
+        if not result or not result.get('success', True):
+            self._release_trade()
+            auto_trader.risk.release(decision.reservation_id)
+            if result:
+                error = result.get('errorMsg') or '订单未成交'
+            print(f"⚠️ {market.ticker}: {outcome} 订单未成交: {error}")
+            return {'success': False, 'market': market, 'outcome': outcome, 'error': error}
+
+        with self._lock:
+            self.fired += 1
+        analysis = {
+            'market': market,
+            'recommendation': signal.recommendation,
+            'trade_size': order.size,
+            'sizing': sizing,
+            'price_limit': order.price_limit
+        }
+        auto_trader._record_market_fill(trader, analysis, result, decision.reservation_id)
+        print(f"⚡ {market.ticker}: 买入{outcome} {order.size} USD，行情请求到提交 {(post_start - tick) * 1000:.1f}ms，"
+              f"提交耗时 {(post_end - post_start) * 1000:.1f}ms，剩余 {market.end_ts - _exchange_now():.1f} 秒")
+        return {'success': True, 'market': market, 'outcome': outcome, 'order': result}
+
+    def run(self, markets: List[MarketRecord], max_trades: int) -> List[Dict[str, Any]]:
+        """
+        并行对多个市场执行突击
+
+        Args:
+            markets: 待突击的市场（应在预签名时间之前传入）
+            max_trades: 所有市场合计的最大交易次数
+
+        Returns:
+            各市场的结果
+        """
+        if not markets:
+            return []
+        clock.now()  # 启用同步时确保后台同步线程已运行，突击循环只读取已估计的时钟偏差
+        with self._lock:
+            self._trades_left = max_trades
+        with ThreadPoolExecutor(max_workers=len(markets), thread_name_prefix='burst') as executor:
+            return list(executor.map(self.run_market, markets))
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取轮询次数、下单次数和延迟统计（毫秒）"""
+        with self._lock:
+            tick_to_post = list(self._tick_to_post)
+            post_latency = list(self._post_latency)
+            stats = {'polls': self.polls, 'fired': self.fired, 'over_budget': self.over_budget}
+        if tick_to_post:
+            stats.update({
+                'tick_to_post_p50_ms': _percentile(tick_to_post, 0.5),
+                'tick_to_post_max_ms': max(tick_to_post),
+                'post_p50_ms': _percentile(post_latency, 0.5),
+                'post_max_ms': max(post_latency)
+            })
+        return stats
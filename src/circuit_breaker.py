@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+熔断器 - 上游接口连续失败时暂停请求，避免每个市场都在故障接口上浪费数秒
+"""
+
+import os
+import threading
+import time
+from typing import Dict
+
+# 上游名称
+UPSTREAM_GAMMA = 'gamma'
+UPSTREAM_CLOB = 'clob'
+
+# 熔断器状态
+CLOSED = 'closed'        # 正常
+OPEN = 'open'            # 熔断中，直接拒绝请求
+HALF_OPEN = 'half_open'  # 试探中，只放行一个请求
+
+
+class CircuitBreaker:
+    """单个上游的熔断器（线程安全）"""
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        """
+        Args:
+            name: 上游名称
+            failure_threshold: 连续失败多少次后熔断，如果为None则从环境变量读取
+            reset_timeout: 熔断多少秒后进入试探状态，如果为None则从环境变量读取
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+        self.reset_timeout = reset_timeout or float(os.getenv('CIRCUIT_RESET_TIMEOUT', '15'))
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+        self.rejected_count = 0
+        self.open_count = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """是否允许发出请求"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self.rejected_count += 1
+            return False
+
+    def record_success(self):
+        """记录一次成功请求"""
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"✅ {self.name} 接口已恢复，关闭熔断")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """记录一次失败请求"""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.open_count += 1
+                    print(f"⚡ {self.name} 接口连续失败{self._failures}次，熔断{self.reset_timeout:.0f}秒")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """获取进程内共享的上游熔断器"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
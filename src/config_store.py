@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+热更新配置 - 以廉价的mtime轮询监视配置文件，校验通过后原子替换不可变的配置快照；
+运行中的交易流程每次只读取一次快照引用，无需加锁，也无需重启即可应用新的价格区间等参数
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+@dataclass(slots=True, frozen=True)
+class TradingConfig:
+    """交易参数快照（不可变）"""
+    min_price_range: float      # 最小价格范围
+    max_price_range: float      # 最大价格范围
+    trade_amount: float         # 每笔交易金额（USD）
+    min_time_remaining: float   # 最少剩余时间（分钟）
+
+    @classmethod
+    def from_env(cls) -> 'TradingConfig':
+        """从环境变量读取默认值"""
+        return cls(
+            min_price_range=float(os.getenv('MIN_PRICE_RANGE', '0.90')),
+            max_price_range=float(os.getenv('MAX_PRICE_RANGE', '0.98')),
+            trade_amount=float(os.getenv('TRADE_AMOUNT', '1.0')),
+            min_time_remaining=float(os.getenv('MIN_TIME_REMAINING_MINUTES', '1')),
+        )
+
+    def with_values(self, values: Dict[str, Any]) -> 'TradingConfig':
+        """返回用 values 覆盖后的新快照（忽略未知字段）并校验"""
+        names = {field.name for field in fields(self)}
+        unknown = set(values) - names
+        if unknown:
+            print(f"⚠️ 忽略未知的交易配置项: {', '.join(sorted(unknown))}")
+        config = replace(self, **{name: float(value) for name, value in values.items() if name in names})
+        config.validate()
+        return config
+
+    def validate(self):
+        """校验参数，不合法时抛出ValueError"""
+        if not 0 < self.min_price_range <= self.max_price_range < 1:
+            raise ValueError(f"价格范围不合法: {self.min_price_range}-{self.max_price_range}")
+        if self.trade_amount <= 0:
+            raise ValueError(f"交易金额必须大于0: {self.trade_amount}")
+        if self.min_time_remaining < 0:
+            raise ValueError(f"最少剩余时间不能为负: {self.min_time_remaining}")
+
+
+class ConfigStore(Generic[T]):
+    """监视配置文件并原子替换配置快照（读取无锁）"""
+
+    def __init__(self, path: Path, parse: Callable[[Dict[str, Any]], T], initial: T,
+                 poll_interval: Optional[float] = None):
+        """
+        初始化配置存储
+
+        Args:
+            path: JSON配置文件路径，文件不存在时使用initial
+            parse: 把文件内容转换为不可变快照的函数，校验失败时抛出ValueError
+            initial: 初始快照
+            poll_interval: 检查文件修改的间隔（秒），如果为None则从环境变量 CONFIG_POLL_INTERVAL 读取
+        """
+        self.path = Path(path)
+        self.parse = parse
+        self.poll_interval = poll_interval or float(os.getenv('CONFIG_POLL_INTERVAL', '1.0'))
+        self._snapshot = initial
+        self._signature: Optional[tuple] = None
+        self._last_poll = 0.0
+        self._listeners: List[Callable[[T], None]] = []
+        self._reload_lock = threading.Lock()  # 只串行化重新加载，读取快照不加锁
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.version = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def snapshot(self) -> T:
+        """当前配置快照（替换是单次引用赋值，读取方不会看到一半更新的配置）"""
+        return self._snapshot
+
+    def subscribe(self, listener: Callable[[T], None]):
+        """注册配置变化的回调"""
+        self._listeners.append(listener)
+
+    def _file_signature(self) -> Optional[tuple]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        文件有变化时重新加载
+
+        Returns:
+            是否替换了快照
+        """
+        with self._reload_lock:
+            signature = self._file_signature()
+            if signature is None or (signature == self._signature and not force):
+                return False
+            self._signature = signature
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    snapshot = self.parse(json.load(f))
+            except (OSError, ValueError, TypeError) as e:
+                # 校验失败时保留旧配置，文件修正后会再次加载
+                self.last_error = str(e)
+                print(f"⚠️ 配置文件 {self.path.name} 无效，继续使用当前配置: {e}")
+                return False
+            self._snapshot = snapshot
+            self.version += 1
+            self.last_error = None
+        for listener in self._listeners:
+            listener(snapshot)
+        return True
+
+    def replace_snapshot(self, snapshot: T):
+        """直接替换快照（如调度器下发的参数），与文件加载一样通知订阅者；配置文件再次修改时会被文件内容覆盖"""
+        with self._reload_lock:
+            self._snapshot = snapshot
+            self.version += 1
+        for listener in self._listeners:
+            listener(snapshot)
+
+    def poll(self) -> bool:
+        """距上次检查超过 poll_interval 时检查文件是否修改（一次stat调用）"""
+        now = time.monotonic()
+        if now - self._last_poll < self.poll_interval:
+            return False
+        self._last_poll = now
+        return self.reload()
+
+    def start(self):
+        """启动后台监视线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name=f'config-{self.path.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"⚠️ 配置监视失败: {e}")
+
+
+def trading_config_store(path: Optional[str] = None) -> ConfigStore[TradingConfig]:
+    """
+    创建交易参数的配置存储：环境变量为默认值，配置文件中的字段覆盖默认值
+
+    Args:
+        path: 配置文件路径，如果为None则从环境变量 TRADING_CONFIG_FILE 读取（默认 trading_config.json）
+    """
+    defaults = TradingConfig.from_env()
+    defaults.validate()
+    store = ConfigStore(Path(path or os.getenv('TRADING_CONFIG_FILE', 'trading_config.json')),
+                        defaults.with_values, defaults)
+    store.reload()
+    return store
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+接口地址 - Gamma、CLOB和Polygon RPC的基础地址，可通过环境变量指向本地模拟服务
+"""
+
+import os
+from typing import List
+
+DEFAULT_GAMMA_API_URL = "https://gamma-api.polymarket.com"
+DEFAULT_CLOB_API_URL = "https://clob.polymarket.com"
+DEFAULT_POLYGON_RPC_URLS = [
+    "https://polygon-rpc.com",
+    "https://rpc-mainnet.maticvigil.com",
+    "https://polygon-mainnet.chainstacklabs.com"
+]
+
+
+def gamma_api_url() -> str:
+    """Gamma接口地址（GAMMA_API_URL）"""
+    return os.getenv('GAMMA_API_URL', DEFAULT_GAMMA_API_URL).rstrip('/')
+
+
+def clob_api_url() -> str:
+    """CLOB接口地址（CLOB_API_URL）"""
+    return os.getenv('CLOB_API_URL', DEFAULT_CLOB_API_URL).rstrip('/')
+
+
+def polygon_rpc_urls() -> List[str]:
+    """Polygon RPC地址列表（POLYGON_RPC_URLS，逗号分隔，按顺序尝试）"""
+    value = os.getenv('POLYGON_RPC_URLS', '')
+    urls = [url.strip() for url in value.split(',') if url.strip()]
+    return urls or list(DEFAULT_POLYGON_RPC_URLS)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+交易所时钟 - 根据CLOB服务器时间（/time 接口或响应头 Date）估计本地时钟偏差，
+经RTT校正和指数平滑后，提供基于单调时钟的"交易所时间"，供临近结束窗口的时间计算使用；
+同步在后台线程中定期进行，读取交易所时间从不等待网络请求
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+from .endpoints import clob_api_url
+
+
+class ExchangeClock:
+    """交易所时钟（线程安全）"""
+
+    def __init__(self, base_url: Optional[str] = None, configure: bool = True):
+        """
+        初始化交易所时钟
+
+        Args:
+            base_url: 提供 /time 接口的CLOB地址，如果为None则在同步时读取 CLOB_API_URL
+            configure: 是否立即从环境变量读取设置；为False时在首次使用时读取（模块级单例在导入时创建，此时.env可能尚未加载）
+        """
+        self.base_url = base_url
+        self._configured = False
+
+        # 以单调时钟为基准，本地系统时间之后的跳变不会影响交易所时间
+        self._wall_anchor = time.time()
+        self._mono_anchor = time.monotonic()
+
+        self._offset: Optional[float] = None  # 交易所时间 - 本地时间（秒）
+        self._min_rtt: Optional[float] = None
+        self._last_sync: Optional[float] = None
+        self.samples = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        if configure:
+            self.configure()
+
+    def configure(self):
+        """从环境变量读取同步设置（只读取一次）"""
+        with self._lock:
+            if self._configured:
+                return
+            self.sync_interval = float(os.getenv('CLOCK_SYNC_INTERVAL', '60'))  # 自动同步间隔（秒）
+            self.smoothing = float(os.getenv('CLOCK_SMOOTHING', '0.2'))  # 偏差的指数平滑系数
+            self.enabled = os.getenv('CLOCK_SYNC_ENABLED', 'true').lower() == 'true'
+            self._configured = True
+
+    def local_time(self) -> float:
+        """基于单调时钟的本地时间（UTC epoch秒）"""
+        return self._wall_anchor + (time.monotonic() - self._mono_anchor)
+
+    @property
+    def offset(self) -> float:
+        """当前估计的时钟偏差（秒），尚未同步时为0"""
+        return self._offset or 0.0
+
+    def now(self) -> float:
+        """交易所时间（UTC epoch秒），首次调用时启动后台同步线程，本身不发起网络请求"""
+        if not self._configured:
+            self.configure()
+        if self.enabled and self._sync_thread is None:
+            self.start()
+        return self.local_time() + self.offset
+
+    def start(self):
+        """启动后台同步线程（立即同步一次，之后每 sync_interval 秒同步一次）"""
+        with self._lock:
+            if self._sync_thread is not None:
+                return
+            self._stop_event.clear()
+            self._sync_thread = threading.Thread(target=self._sync_loop, name='clock-sync', daemon=True)
+            self._sync_thread.start()
+
+    def stop(self):
+        """停止后台同步线程"""
+        with self._lock:
+            thread, self._sync_thread = self._sync_thread, None
+        if thread is not None:
+            self._stop_event.set()
+            thread.join(timeout=5)
+
+    def _sync_loop(self):
+        while not self._stop_event.is_set():
+            if self._last_sync is None or time.monotonic() - self._last_sync >= self.sync_interval:
+                self.sync()
+            self._stop_event.wait(max(0.0, self.sync_interval - (time.monotonic() - self._last_sync)))
+
+    def now_datetime(self) -> datetime:
+        """交易所时间（带UTC时区的datetime）"""
+        return datetime.fromtimestamp(self.now(), timezone.utc)
+
+    def observe(self, server_ts: float, sent_at: float, received_at: float, resolution: float = 1.0) -> bool:
+        """
+        记录一次服务器时间样本
+
+        Args:
+            server_ts: 服务器返回的时间（UTC epoch秒，按resolution向下取整）
+            sent_at: 发送请求时的本地时间（local_time）
+            received_at: 收到响应时的本地时间（local_time）
+            resolution: 服务器时间的精度（秒）
+
+        Returns:
+            样本是否被采用（RTT过大的样本会被丢弃）
+        """
+        if not self._configured:
+            self.configure()
+        rtt = received_at - sent_at
+        # 服务器时间按精度取整，真实值在 [server_ts, server_ts + resolution) 内，取中点；
+        # 假设请求和响应耗时相同，服务器时间对应本地的 sent_at + rtt / 2
+        sample = (server_ts + resolution / 2) - (sent_at + rtt / 2)
+
+        with self._lock:
+            if self._min_rtt is None or rtt < self._min_rtt:
+                self._min_rtt = rtt
+            if rtt > max(2 * self._min_rtt, 0.05) and self._offset is not None:
+                self.rejected += 1
+                return False
+            if self._offset is None:
+                self._offset = sample
+            else:
+                self._offset += self.smoothing * (sample - self._offset)
+            self.samples += 1
+            return True
+
+    def observe_headers(self, headers: Optional[Mapping[str, Any]], sent_at: float, received_at: float) -> bool:
+        """从响应头 Date 记录服务器时间样本（精度1秒）"""
+        value = (headers or {}).get('Date')
+        if not value:
+            return False
+        try:
+            server_ts = parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return self.observe(server_ts, sent_at, received_at)
+
+    def sync(self) -> bool:
+        """
+        请求 /time 接口同步一次时钟
+
+        Returns:
+            是否采用了新的样本
+        """
+        self._last_sync = time.monotonic()
+        try:
+            import requests
+
+            sent_at = self.local_time()
+            response = requests.get(f"{self.base_url or clob_api_url()}/time", timeout=5)
+            received_at = self.local_time()
+            response.raise_for_status()
+            return self.observe(float(response.text.strip()), sent_at, received_at)
+        except Exception as e:
+            print(f"⚠️ 交易所时间同步失败: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取时钟同步统计"""
+        with self._lock:
+            return {
+                'offset_ms': self.offset * 1000,
+                'min_rtt_ms': (self._min_rtt or 0.0) * 1000,
+                'samples': self.samples,
+                'rejected': self.rejected
+            }
+
+
+# 进程内共享的交易所时钟（首次使用时读取设置）
+clock = ExchangeClock(configure=False)
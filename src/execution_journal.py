@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+执行日志 - 每次执行只向JSONL日志追加一行（批量fsync），内存中增量维护汇总，
+定期把汇总原子写入统计文件并清空日志；崩溃后按序号重放日志，不会重复或丢失已落盘的事件
+"""
+
+import datetime
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+
+class ExecutionJournal:
+    """追加写入的执行日志"""
+
+    def __init__(self, journal_path: Path, summary_path: Path, defaults: Optional[Dict[str, Any]] = None):
+        """
+        初始化执行日志并重放未压缩的事件
+
+        Args:
+            journal_path: JSONL日志文件
+            summary_path: 汇总文件（压缩时原子替换）
+            defaults: 汇总中需要保留的其他字段及其默认值
+        """
+        self.journal_path = Path(journal_path)
+        self.summary_path = Path(summary_path)
+        self.compact_every = int(os.getenv('JOURNAL_COMPACT_EVENTS', '500'))      # 累计多少条事件后压缩
+        self.fsync_interval = float(os.getenv('JOURNAL_FSYNC_INTERVAL', '1.0'))   # 批量fsync间隔（秒）
+        self.hourly_retention = int(os.getenv('JOURNAL_HOURLY_RETENTION', '168')) # 保留多少小时的按小时统计
+        self.latency_samples = int(os.getenv('JOURNAL_LATENCY_SAMPLES', '512'))   # 每个阶段保留的最近耗时样本数
+
+        self.summary: Dict[str, Any] = dict(defaults or {})
+        self.summary.update({
+            'execution_count': 0,
+            'success_count': 0,
+            'failure_count': 0,
+            'last_execution': None,
+            'last_success': None,
+            'last_failure': None,
+            'last_seq': 0,
+            'hourly': {},   # 'YYYY-MM-DDTHH'(UTC) -> [执行次数, 成功次数]
+            'stages': {},   # 阶段 -> {'count', 'total_ms', 'max_ms'}
+        })
+        self._recent: Dict[str, Deque[float]] = {}
+        self._seq = 0
+        self._pending = 0          # 未压缩的事件数
+        self._unsynced = False
+        self._last_fsync = time.monotonic()
+
+        self._load()
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """汇总统计（调度器直接读写其中的字段）"""
+        return self.summary
+
+    def _load(self):
+        """读取汇总文件，并重放日志中序号大于 last_seq 的事件；末尾不完整的行会被截掉"""
+        if self.summary_path.exists():
+            try:
+                with open(self.summary_path, 'r', encoding='utf-8') as f:
+                    self.summary.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 汇总文件读取失败: {e}")
+        for stage, stats in self.summary['stages'].items():
+            self._recent[stage] = deque(stats.pop('recent', []), maxlen=self.latency_samples)
+        self._seq = self.summary['last_seq']
+
+        if not self.journal_path.exists():
+            return
+        valid_bytes = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # 写入时崩溃留下的半行
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+                if event.get('seq', 0) > self.summary['last_seq']:
+                    self._apply(event)
+                    self._seq = event['seq']
+                    self._pending += 1
+        if valid_bytes < self.journal_path.stat().st_size:
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+    def _apply(self, event: Dict[str, Any]):
+        """把一条事件计入汇总（O(1)）"""
+        if event.get('type') != 'execution':
+            return
+        timestamp = event['ts']
+        success = event['success']
+        summary = self.summary
+        summary['execution_count'] += 1
+        summary['last_execution'] = timestamp
+        if success:
+            summary['success_count'] += 1
+            summary['last_success'] = timestamp
+        else:
+            summary['failure_count'] += 1
+            summary['last_failure'] = timestamp
+
+        hour = datetime.datetime.fromisoformat(timestamp).astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H')
+        bucket = summary['hourly'].setdefault(hour, [0, 0])
+        bucket[0] += 1
+        bucket[1] += int(success)
+
+        for stage, ms in (event.get('stages') or {}).items():
+            if ms is None:
+                continue
+            stats = summary['stages'].setdefault(stage, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['count'] += 1
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+            self._recent.setdefault(stage, deque(maxlen=self.latency_samples)).append(ms)
+
+    def append(self, event_type: str, **fields) -> Dict[str, Any]:
+        """追加一条事件并计入汇总"""
+        self._seq += 1
+        event = {'seq': self._seq, 'type': event_type, 'ts': datetime.datetime.now().astimezone().isoformat()}
+        event.update(fields)
+        self._file.write(json.dumps(event, ensure_ascii=False, default=_json_default) + '\n')
+        self._file.flush()
+        self._unsynced = True
+        self._apply(event)
+        self._pending += 1
+
+        if self._pending >= self.compact_every:
+            self.compact()
+        elif time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self.sync()
+        return event
+
+    def record_execution(self, success: bool, attempts: int = 1, stages: Optional[Dict[str, Optional[float]]] = None) -> Dict[str, Any]:
+        """
+        记录一次执行
+
+        Args:
+            success: 是否成功
+            attempts: 尝试次数
+            stages: 各阶段耗时（毫秒），如 {'warmup': 120, 'entry': 850}
+        """
+        return self.append('execution', success=success, attempts=attempts, stages=stages or {})
+
+    def sync(self):
+        """把已写入的事件fsync到磁盘"""
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = False
+        self._last_fsync = time.monotonic()
+
+    def compact(self):
+        """把汇总原子写入汇总文件，然后清空日志"""
+        self.sync()
+        self._prune_hourly()
+
+        summary = dict(self.summary, last_seq=self._seq)
+        summary['stages'] = {
+            stage: dict(stats, recent=list(self._recent.get(stage, ())))
+            for stage, stats in self.summary['stages'].items()
+        }
+        tmp_path = self.summary_path.with_name(self.summary_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False, default=_json_default)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.summary_path)
+        self._fsync_dir()
+        self.summary['last_seq'] = self._seq
+
+        # 汇总已落盘，即使在清空日志前崩溃，重放时也会按序号跳过这些事件
+        self._file.close()
+        self._file = open(self.journal_path, 'w', encoding='utf-8')
+        self._pending = 0
+
+    def _fsync_dir(self):
+        try:
+            fd = os.open(self.summary_path.parent, os.O_RDONLY)
+        except OSError:
+            return  # 部分平台不支持对目录fsync
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _prune_hourly(self):
+        cutoff = (datetime.datetime.now(datetime.timezone.utc) -
+                  datetime.timedelta(hours=self.hourly_retention)).strftime('%Y-%m-%dT%H')
+        hourly = self.summary['hourly']
+        for hour in [hour for hour in hourly if hour < cutoff]:
+            del hourly[hour]
+
+    def close(self):
+        """压缩并关闭日志"""
+        if not self._file.closed:
+            self.compact()
+            self._file.close()
+
+    def success_rate_by_hour(self, hours: int = 24) -> List[Tuple[str, int, float]]:
+        """
+        最近若干小时的成功率
+
+        Returns:
+            [(小时(UTC), 执行次数, 成功率), ...]，按时间排序，只包含有执行的小时
+        """
+        cutoff = (datetime.datetime.now(datetime.timezone.utc) -
+                  datetime.timedelta(hours=hours)).strftime('%Y-%m-%dT%H')
+        return [
+            (hour, executions, successes / executions)
+            for hour, (executions, successes) in sorted(self.summary['hourly'].items())
+            if hour > cutoff and executions
+        ]
+
+    def stage_latency(self, stage: str) -> Optional[Dict[str, float]]:
+        """某个阶段的耗时统计（毫秒），百分位数基于最近的样本"""
+        stats = self.summary['stages'].get(stage)
+        if not stats or not stats['count']:
+            return None
+        recent = list(self._recent.get(stage, ()))
+        return {
+            'count': stats['count'],
+            'avg_ms': stats['total_ms'] / stats['count'],
+            'max_ms': stats['max_ms'],
+            'p50_ms': _percentile(recent, 0.5) if recent else 0.0,
+            'p95_ms': _percentile(recent, 0.95) if recent else 0.0,
+        }
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Gamma事件流式解析 - 边下载边解析 /events 返回的JSON数组
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator
+
+# 字符串外需要关注的结构字符
+_STRUCTURAL_CHARS = re.compile(r'[\[\]{}"]')
+# 字符串内需要关注的字符（结束引号和转义符）
+_STRING_CHARS = re.compile(r'["\\]')
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    增量解析顶层JSON数组，每个元素一完整到达就立即产出
+
+    只扫描结构字符来定位元素边界，元素完整后才交给json.loads，
+    已产出的数据会立即从缓冲区丢弃，内存占用只与单个元素大小相关。
+
+    Args:
+        chunks: 响应体字节块（如 response.iter_content()）
+
+    Yields:
+        数组中的每个元素（通常是事件字典）
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0           # 已扫描到的位置
+    depth = 0         # 当前嵌套深度，顶层数组为1
+    in_string = False
+    start = 0         # 当前元素在缓冲区中的起点
+
+    for chunk in chunks:
+        buffer += decoder.decode(chunk)
+
+        while True:
+            if in_string:
+                match = _STRING_CHARS.search(buffer, pos)
+                if not match:
+                    pos = len(buffer)
+                    break
+                if match.group() == '\\':
+                    if match.end() >= len(buffer):
+                        # 转义符在块末尾，等待下一块数据
+                        pos = match.start()
+                        break
+                    pos = match.end() + 1
+                    continue
+                in_string = False
+                pos = match.end()
+                continue
+
+            match = _STRUCTURAL_CHARS.search(buffer, pos)
+            if not match:
+                pos = len(buffer)
+                break
+
+            char = match.group()
+            pos = match.end()
+            if char == '"':
+                in_string = True
+            elif char in '[{':
+                if depth == 0 and char == '{':
+                    raise ValueError("Gamma返回的不是JSON数组")
+                depth += 1
+                if depth == 2:
+                    start = match.start()
+            else:
+                depth -= 1
+                if depth == 1:
+                    yield json.loads(buffer[start:pos])
+                elif depth == 0:
+                    return
+
+        # 丢弃已处理的数据，只保留未完成的元素
+        if depth >= 2:
+            buffer = buffer[start:]
+            pos -= start
+            start = 0
+        else:
+            buffer = buffer[pos:]
+            pos = 0
+
+    if depth != 0:
+        raise ValueError("Gamma响应体不完整")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+对冲请求 - 幂等读取请求超过历史P95延迟仍未返回时，再发一个相同请求，取先返回的结果，
+以降低尾延迟。对冲请求数量受比例上限约束，只用于CLOB读取和Gamma查询，不能用于下单。
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from .rate_limiter import governor, PRIORITY_HIGH, PRIORITY_LOW
+
+
+class LatencyTracker:
+    """按请求类型记录最近的延迟样本"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key: str, pct: float, min_samples: int = 20) -> Optional[float]:
+        """样本数不足时返回None"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+class HedgedRequester:
+    """对冲请求执行器（线程安全）"""
+
+    def __init__(self, configure: bool = True):
+        """
+        初始化对冲请求执行器
+
+        Args:
+            configure: 是否立即从环境变量读取设置；为False时在首次使用时读取（模块级单例在导入时创建，此时.env可能尚未加载）
+        """
+        self.latency = LatencyTracker()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._configured = False
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        if configure:
+            self.configure()
+
+    def configure(self):
+        """从环境变量读取对冲设置并创建线程池（只读取一次）"""
+        with self._lock:
+            if self._configured:
+                return
+            self.enabled = os.getenv('HEDGE_ENABLED', 'true').lower() == 'true'
+            # 对冲请求数不超过总请求数的比例
+            self.max_ratio = float(os.getenv('HEDGE_MAX_RATIO', '0.1'))
+            # 对冲延迟：取P95，并限制在 [min_delay, max_delay] 内；样本不足时使用max_delay
+            self.percentile = float(os.getenv('HEDGE_PERCENTILE', '0.95'))
+            self.min_delay = float(os.getenv('HEDGE_MIN_DELAY', '0.05'))
+            self.max_delay = float(os.getenv('HEDGE_MAX_DELAY', '1.0'))
+            self._executor = ThreadPoolExecutor(max_workers=int(os.getenv('HEDGE_MAX_WORKERS', '16')), thread_name_prefix='hedge')
+            self._configured = True
+
+    def hedge_delay(self, key: str) -> float:
+        """发出对冲请求前等待的秒数"""
+        if not self._configured:
+            self.configure()
+        p95 = self.latency.percentile(key, self.percentile)
+        if p95 is None:
+            return self.max_delay
+        return max(self.min_delay, min(self.max_delay, p95))
+
+    def _reserve_hedge(self, family: str) -> bool:
+        """检查对冲比例上限，并以不等待的方式从限流器取令牌"""
+        with self._lock:
+            if self.hedges + 1 > self.requests * self.max_ratio:
+                return False
+        if not governor.acquire(family, PRIORITY_LOW, timeout=0):
+            return False
+        with self._lock:
+            self.hedges += 1
+        return True
+
+    def _timed(self, key: str, func: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        result = func()
+        self.latency.record(key, time.perf_counter() - start)
+        return result
+
+    def call(self, family: str, func: Callable[[], Any], priority: int = PRIORITY_HIGH,
+             key: Optional[str] = None, discard: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        限流后执行读取请求，超过对冲延迟仍未返回时发出一个重复请求
+
+        Args:
+            family: 限流接口类别
+            func: 无参数的请求函数，必须是幂等的
+            priority: 限流优先级
+            key: 延迟统计的请求类型，默认使用family
+            discard: 未被采用的请求结果的清理函数（如关闭流式响应）
+
+        Returns:
+            先成功返回的结果；两个请求都失败时抛出首个请求的异常
+        """
+        key = key or family
+        if not self._configured:
+            self.configure()
+        governor.acquire(family, priority)
+        with self._lock:
+            self.requests += 1
+        if not self.enabled:
+            return self._timed(key, func)
+
+        primary = self._executor.submit(self._timed, key, func)
+        done, _ = wait([primary], timeout=self.hedge_delay(key))
+        if done or not self._reserve_hedge(family):
+            return primary.result()
+
+        hedge = self._executor.submit(self._timed, key, func)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                for other in pending:
+                    self._discard_later(other, discard)
+                return future.result()
+        raise error
+
+    @staticmethod
+    def _discard_later(future: Future, discard: Optional[Callable[[Any], None]]):
+        if discard is None:
+            return
+
+        def _done(done_future: Future):
+            if done_future.exception() is None:
+                discard(done_future.result())
+
+        future.add_done_callback(_done)
+
+    async def call_async(self, family: str, func: Callable[[], Awaitable[Any]], priority: int = PRIORITY_HIGH, key: Optional[str] = None) -> Any:
+        """call 的异步版本，func 为返回协程的无参数函数"""
+        key = key or family
+        if not self._configured:
+            self.configure()
+        await governor.acquire_async(family, priority)
+        with self._lock:
+            self.requests += 1
+
+        async def _timed():
+            start = time.perf_counter()
+            result = await func()
+            self.latency.record(key, time.perf_counter() - start)
+            return result
+
+        if not self.enabled:
+            return await _timed()
+
+        primary = asyncio.ensure_future(_timed())
+        done, _ = await asyncio.wait([primary], timeout=self.hedge_delay(key))
+        if done or not self._reserve_hedge(family):
+            return await primary
+
+        hedge = asyncio.ensure_future(_timed())
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                if task is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                for other in pending:
+                    other.cancel()
+                return task.result()
+        raise error
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取对冲统计"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'hedge_ratio': self.hedges / self.requests if self.requests else 0.0
+            }
+
+
+# 进程内共享的对冲请求执行器（首次使用时读取设置）
+hedger = HedgedRequester(configure=False)
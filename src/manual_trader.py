@@ -4,12 +4,15 @@
 """
 
 import os
-import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import timedelta
 from src.polymarket_scanner import PolymarketScanner
 from src.polymarket_trader import PolymarketTrader
-from src.balance_checker import BalanceChecker
+from src.exchange_clock import clock
+from src.market_record import MarketRecord
+from src.market_refresher import BackgroundMarketRefresher
+from src.quote_result import QuoteStatus
+from src.config_store import trading_config_store
 
 
 class ManualTrader:
@@ -18,20 +21,30 @@ class ManualTrader:
     def __init__(self):
         """初始化手动交易器"""
         self.trader = PolymarketTrader()
-        self.scanner = PolymarketScanner(trader=self.trader)  # 传递trader给scanner
-        self.balance_checker = BalanceChecker()  # 初始化余额查询器
+        self.scanner = PolymarketScanner(trader=self.trader, quote_cache=self.trader.quote_cache)  # 共享报价缓存
+        self.balance_checker = self.trader.balance_checker  # 与交易器共享余额查询器（及其缓存）
         
-        # 从环境变量读取配置
-        self.trade_size = float(os.getenv('TRADE_AMOUNT', '1.0'))  # 从环境变量读取交易金额
         self.slippage = 0.01   # 固定1%滑点
         self.test_only = False  # 测试模式标志
         
-        # 价格范围配置
-        self.min_price_range = float(os.getenv('MIN_PRICE_RANGE', '0.90'))  # 最小价格范围
-        self.max_price_range = float(os.getenv('MAX_PRICE_RANGE', '0.98'))  # 最大价格范围
+        # 交易金额和价格范围可热更新（与自动交易使用同一个配置文件）
+        self.config_store = trading_config_store()
+        self.config_store.start()
+    
+    @property
+    def trade_size(self) -> float:
+        return self.config_store.snapshot.trade_amount
+    
+    @property
+    def min_price_range(self) -> float:
+        return self.config_store.snapshot.min_price_range
+    
+    @property
+    def max_price_range(self) -> float:
+        return self.config_store.snapshot.max_price_range
     
     def interactive_trading(self, max_hours: float = 1.0):
-        """交互式交易界面"""
+        """交互式交易界面（市场列表和报价在后台刷新，界面直接读取最新快照）"""
         if self.test_only:
             print("=== 手动交易模式 (测试模式) ===")
             print("🧪 测试模式: 将检查余额和授权，但不执行实际交易")
@@ -39,68 +52,87 @@ class ManualTrader:
             print("=== 手动交易模式 ===")
         print(f"每笔交易固定: {self.trade_size}USD, 滑点: {self.slippage*100:.1f}%")
         print(f"策略: 只购买价格在{self.min_price_range}-{self.max_price_range}范围内的一方")
-        print("输入 'q' 退出, 'r' 刷新市场列表")
+        print("输入 'q' 退出, 'r' 刷新市场列表, 直接回车重新显示最新报价")
         print("-" * 50)
         
-        while True:
-            try:
-                # 扫描市场
-                if max_hours is None:
-                    print("扫描所有未结束的市场...")
-                    markets = self.scanner.scan_all_markets(show_top_n=20)
-                else:
-                    print(f"扫描 {max_hours} 小时内的市场...")
-                    markets = self.scanner.scan_short_term_markets(max_hours=max_hours, show_top_n=10)
-                
-                if not markets:
-                    print("没有找到合适的市场")
-                    continue
-                
-                # 显示账户余额信息
-                print(f"\n=== 账户余额信息 ===")
-                self.balance_checker.print_balance_info(self.trader.funder, self.trade_size)
-                print("==================")
-                
-                # 显示市场列表
-                self.display_markets(markets)
-                
-                # 获取用户输入
-                choice = input("\n请选择市场编号 (1-{}), 或输入 'q' 退出, 'r' 刷新: ".format(len(markets)))
-                
-                if choice.lower() == 'q':
-                    print("退出手动交易模式")
-                    break
-                elif choice.lower() == 'r':
-                    continue
-                
+        refresher = BackgroundMarketRefresher(
+            self.scanner,
+            max_hours=max_hours,
+            max_markets=20 if max_hours is None else 10,
+            balance_address=self.trader.funder
+        )
+        refresher.start()
+        if max_hours is None:
+            print("加载所有未结束的市场...")
+        else:
+            print(f"加载 {max_hours} 小时内的市场...")
+        refresher.wait_ready(timeout=30)
+        
+        try:
+            while True:
                 try:
-                    market_index = int(choice) - 1
-                    if 0 <= market_index < len(markets):
-                        market, time_diff = markets[market_index]
-                        self.trade_market(market, time_diff)
-                    else:
-                        print("无效的市场编号")
-                except ValueError:
-                    print("请输入有效的数字")
+                    rows = refresher.snapshot()
+                    
+                    if not rows:
+                        print("没有找到合适的市场" + (f" ({refresher.last_error})" if refresher.last_error else ""))
+                        choice = input("输入 'r' 刷新, 'q' 退出: ")
+                        if choice.lower() == 'q':
+                            print("退出手动交易模式")
+                            break
+                        refresher.request_list_refresh()
+                        continue
                     
-            except KeyboardInterrupt:
-                print("\n退出手动交易模式")
-                break
-            except Exception as e:
-                print(f"❌ 发生错误: {e}")
+                    # 显示账户余额信息（余额缓存由后台刷新）
+                    print(f"\n=== 账户余额信息 ===")
+                    self.balance_checker.print_balance_info(self.trader.funder, self.trade_size)
+                    print("==================")
+                    
+                    # 显示市场列表
+                    self.display_markets(rows)
+                    
+                    # 获取用户输入
+                    choice = input("\n请选择市场编号 (1-{}), 或输入 'q' 退出, 'r' 刷新: ".format(len(rows)))
+                    
+                    if choice.lower() == 'q':
+                        print("退出手动交易模式")
+                        break
+                    elif choice.lower() == 'r':
+                        refresher.request_list_refresh()
+                        continue
+                    elif not choice.strip():
+                        continue
+                    
+                    try:
+                        market_index = int(choice) - 1
+                        if 0 <= market_index < len(rows):
+                            market, remaining, market_data, quote_age = rows[market_index]
+                            self.trade_market(market, timedelta(seconds=market.end_ts - clock.now()), market_data, quote_age)
+                        else:
+                            print("无效的市场编号")
+                    except ValueError:
+                        print("请输入有效的数字")
+                        
+                except KeyboardInterrupt:
+                    print("\n退出手动交易模式")
+                    break
+                except Exception as e:
+                    print(f"❌ 发生错误: {e}")
+        finally:
+            refresher.stop()
     
-    def display_markets(self, markets: List[tuple]):
-        """显示市场列表"""
+    def display_markets(self, rows: List[tuple]):
+        """
+        显示市场列表
+        
+        Args:
+            rows: BackgroundMarketRefresher.snapshot() 返回的 (市场, 剩余秒数, 市场数据, 报价时间) 列表
+        """
         print("\n=== 可交易市场列表 ===")
         print(f"每笔交易: {self.trade_size}USD, 滑点: {self.slippage*100:.1f}%")
         print("-" * 80)
         
-        for i, (market, time_diff) in enumerate(markets, 1):
-            # 获取市场数据
-            market_data = self.scanner.get_market_data(market)
-            
+        for i, (market, total_seconds, market_data, quote_age) in enumerate(rows, 1):
             # 格式化时间
-            total_seconds = time_diff.total_seconds()
             hours = int(total_seconds // 3600)
             minutes = int((total_seconds % 3600) // 60)
             seconds = int(total_seconds % 60)
@@ -110,56 +142,63 @@ class ManualTrader:
             else:
                 time_str = f"{minutes}分钟{seconds}秒"
             
-            print(f"{i:2d}. {market['ticker']}")
-            print(f"    标题: {market['title']}")
+            print(f"{i:2d}. {market.ticker}")
+            print(f"    标题: {market.title}")
             print(f"    剩余时间: {time_str}")
             
             if market_data:
                 yes_mid = float(market_data['yes']['mid'])
                 no_mid = float(market_data['no']['mid'])
                 
-                print(f"    YES价格: {yes_mid:.3f} | NO价格: {no_mid:.3f}")
+                print(f"    YES价格: {yes_mid:.3f} | NO价格: {no_mid:.3f} ({quote_age:.1f}秒前刷新)")
+                if market_data['status'] is QuoteStatus.STALE:
+                    print(f"    ⚠️ 行情接口异常，显示的是 {market_data['quote_age']:.0f} 秒前的缓存报价")
                 
-            # 简化的交易策略：检查价格是否在配置的范围内
-            yes_in_range = self.min_price_range <= yes_mid <= self.max_price_range
-            no_in_range = self.min_price_range <= no_mid <= self.max_price_range
-            
-            if yes_in_range and not no_in_range:
-                print(f"    🎯 建议: 买入Up (YES价格在{self.min_price_range}-{self.max_price_range}范围内)")
-            elif no_in_range and not yes_in_range:
-                print(f"    🎯 建议: 买入Down (NO价格在{self.min_price_range}-{self.max_price_range}范围内)")
-            elif yes_in_range and no_in_range:
-                if yes_mid >= no_mid:
-                    print(f"    🎯 建议: 买入Up (YES和NO都在范围内，YES价格更高)")
+                # 简化的交易策略：检查价格是否在配置的范围内
+                yes_in_range = self.min_price_range <= yes_mid <= self.max_price_range
+                no_in_range = self.min_price_range <= no_mid <= self.max_price_range
+                
+                if yes_in_range and not no_in_range:
+                    print(f"    🎯 建议: 买入Up (YES价格在{self.min_price_range}-{self.max_price_range}范围内)")
+                elif no_in_range and not yes_in_range:
+                    print(f"    🎯 建议: 买入Down (NO价格在{self.min_price_range}-{self.max_price_range}范围内)")
+                elif yes_in_range and no_in_range:
+                    if yes_mid >= no_mid:
+                        print(f"    🎯 建议: 买入Up (YES和NO都在范围内，YES价格更高)")
+                    else:
+                        print(f"    🎯 建议: 买入Down (YES和NO都在范围内，NO价格更高)")
                 else:
-                    print(f"    🎯 建议: 买入Down (YES和NO都在范围内，NO价格更高)")
+                    print(f"    ⏸️  建议: 不交易 (价格不在{self.min_price_range}-{self.max_price_range}范围内)")
             else:
-                print(f"    ⏸️  建议: 不交易 (价格不在{self.min_price_range}-{self.max_price_range}范围内)")
-        else:
-            print(f"    市场数据: 无法获取")
+                print(f"    市场数据: 加载中或无法获取")
         
         print()
     
     
-    def trade_market(self, market: Dict[str, Any], time_diff: timedelta) -> Dict[str, Any]:
+    def trade_market(self, market: MarketRecord, time_diff: timedelta, market_data: Optional[Dict[str, Any]] = None, quote_age: Optional[float] = None) -> Dict[str, Any]:
         """
         交易指定市场
         
         Args:
             market: 市场信息
             time_diff: 剩余时间
+            market_data: 后台刷新的市场数据（下单时价格从共享报价缓存读取，无需重新请求）
+            quote_age: 市场数据的刷新时间（秒）
             
         Returns:
             交易结果
         """
         try:
             # 获取token ID
-            if 'markets' not in market or not market['markets']:
+            if not market.has_tokens:
                 return {'success': False, 'error': '无法获取token ID'}
             
-            tokenids = json.loads(market['markets'][0]['clobTokenIds'])
-            yes_token_id = tokenids[1]
-            no_token_id = tokenids[0]
+            yes_token_id = market.yes_token_id
+            no_token_id = market.no_token_id
+            
+            if market_data:
+                print(f"当前报价: YES {float(market_data['yes']['mid']):.3f} | NO {float(market_data['no']['mid']):.3f} "
+                      f"({quote_age or 0:.1f}秒前刷新, 剩余 {int(time_diff.total_seconds())} 秒)")
             
             # 获取用户选择
             side = input("选择交易方向 (YES/NO): ").strip().upper()
@@ -187,7 +226,7 @@ class ManualTrader:
             
             if self.test_only:
                 print(f"\n🧪 测试模式: 模拟交易:")
-                print(f"  市场: {market['ticker']}")
+                print(f"  市场: {market.ticker}")
                 print(f"  方向: {side} (买入{direction_display})")
                 print(f"  金额: {self.trade_size}USD")
                 print(f"  滑点: {self.slippage*100:.1f}%")
@@ -197,7 +236,7 @@ class ManualTrader:
                 result = {'test_mode': True, 'success': True, 'message': '测试通过'}
             else:
                 print(f"\n执行交易:")
-                print(f"  市场: {market['ticker']}")
+                print(f"  市场: {market.ticker}")
                 print(f"  方向: {side} (买入{direction_display})")
                 print(f"  金额: {self.trade_size}USD")
                 print(f"  滑点: {self.slippage*100:.1f}%")
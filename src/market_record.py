@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+市场记录 - 在数据进入系统时一次性解析Gamma事件，之后全流程只传递精简记录
+"""
+
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+@dataclass(slots=True, frozen=True)
+class MarketRecord:
+    """精简的市场记录（结束时间和token ID已预先解析）"""
+    id: str
+    ticker: str
+    title: str
+    end_date: str                 # 原始endDate字符串，用于显示
+    end_ts: int                   # 结束时间（UTC epoch秒）
+    yes_token_id: Optional[str]   # Up token
+    no_token_id: Optional[str]    # Down token
+
+    @property
+    def has_tokens(self) -> bool:
+        """是否有可交易的token ID"""
+        return bool(self.yes_token_id and self.no_token_id)
+
+    @classmethod
+    def from_event(cls, event: Dict[str, Any]) -> Optional['MarketRecord']:
+        """
+        从Gamma事件创建市场记录
+
+        Args:
+            event: Gamma /events 返回的单个事件
+
+        Returns:
+            市场记录，缺少或无法解析endDate时返回None
+        """
+        end_date = event.get('endDate')
+        if not end_date:
+            return None
+        try:
+            end_ts = int(datetime.fromisoformat(end_date.replace('Z', '+00:00')).timestamp())
+        except ValueError:
+            return None
+
+        yes_token_id = no_token_id = None
+        markets = event.get('markets') or []
+        if markets and markets[0].get('clobTokenIds'):
+            try:
+                # 注意：tokenids[0] 通常是 NO token (Down)，tokenids[1] 通常是 YES token (Up)
+                tokenids = json.loads(markets[0]['clobTokenIds'])
+                no_token_id = tokenids[0]
+                yes_token_id = tokenids[1]
+            except (ValueError, IndexError, TypeError):
+                pass
+
+        return cls(
+            id=str(event.get('id')),
+            ticker=event.get('ticker') or '',
+            title=event.get('title') or '',
+            end_date=end_date,
+            end_ts=end_ts,
+            yes_token_id=yes_token_id,
+            no_token_id=no_token_id,
+        )
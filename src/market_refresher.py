@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+后台市场刷新 - 在后台线程中定期刷新市场列表和报价，界面直接读取最新快照而不阻塞
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .exchange_clock import clock
+from .market_record import MarketRecord
+
+
+class BackgroundMarketRefresher:
+    """后台刷新市场列表和报价（线程安全）"""
+
+    def __init__(self, scanner, max_hours: Optional[float] = 1.0, max_markets: int = 20,
+                 list_interval: Optional[float] = None, quote_interval: Optional[float] = None,
+                 balance_address: Optional[str] = None):
+        """
+        初始化后台刷新器
+
+        Args:
+            scanner: PolymarketScanner实例（其报价缓存会被同步刷新）
+            max_hours: 列出多少小时内结束的市场，None表示所有未结束的市场
+            max_markets: 最多列出的市场数
+            list_interval: 市场列表刷新间隔（秒），如果为None则从环境变量读取
+            quote_interval: 报价刷新间隔（秒），如果为None则从环境变量读取
+            balance_address: 随市场列表一起刷新余额缓存的地址
+        """
+        self.scanner = scanner
+        self.max_hours = max_hours
+        self.max_markets = max_markets
+        self.balance_address = balance_address
+        self.list_interval = list_interval or float(os.getenv('MANUAL_LIST_REFRESH_INTERVAL', '30'))
+        self.quote_interval = quote_interval or float(os.getenv('MANUAL_QUOTE_REFRESH_INTERVAL', '1.0'))
+
+        self._markets: List[MarketRecord] = []
+        self._market_data: Dict[str, Dict[str, Any]] = {}  # 市场ID -> 市场数据
+        self._quote_updated: Dict[str, float] = {}         # 市场ID -> 报价刷新时间（monotonic）
+        self._list_updated: Optional[float] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        """启动后台刷新线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='market-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台刷新线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待首次市场列表加载完成"""
+        return self._ready.wait(timeout)
+
+    def request_list_refresh(self):
+        """下一轮立即刷新市场列表"""
+        with self._lock:
+            self._list_updated = None
+
+    def snapshot(self) -> List[Tuple[MarketRecord, float, Optional[Dict[str, Any]], Optional[float]]]:
+        """
+        获取当前快照（不发起网络请求）
+
+        Returns:
+            [(市场, 剩余秒数, 市场数据或None, 报价时间秒或None), ...]，已结束的市场不返回
+        """
+        now_ts = clock.now()
+        now = time.monotonic()
+        with self._lock:
+            rows = []
+            for market in self._markets:
+                remaining = market.end_ts - now_ts
+                if remaining <= 0:
+                    continue
+                updated = self._quote_updated.get(market.id)
+                rows.append((market, remaining, self._market_data.get(market.id), None if updated is None else now - updated))
+            return rows
+
+    def _refresh_list(self):
+        if self.max_hours is None:
+            markets = self.scanner.fetch_markets()
+        else:
+            markets = self.scanner.fetch_markets_ending_within(0, self.max_hours * 60)
+        markets_with_time = self.scanner.get_markets_with_time(markets)
+        with self._lock:
+            self._markets = [market for market, time_diff in markets_with_time[:self.max_markets]]
+            self._list_updated = time.monotonic()
+        self._ready.set()
+        if self.balance_address:
+            self.scanner.balance_checker.refresh(self.balance_address)
+
+    def _refresh_quotes(self):
+        with self._lock:
+            markets = list(self._markets)
+        if not markets:
+            return
+        results = self.scanner.get_multiple_markets_data(markets, max_age=self.quote_interval)
+        now = time.monotonic()
+        with self._lock:
+            for result in results:
+                market_id = result['market'].id
+                self._market_data[market_id] = result['data']
+                self._quote_updated[market_id] = now
+            # 丢弃已不在列表中的市场
+            market_ids = {market.id for market in self._markets}
+            for market_id in [market_id for market_id in self._market_data if market_id not in market_ids]:
+                self._market_data.pop(market_id, None)
+                self._quote_updated.pop(market_id, None)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                with self._lock:
+                    list_updated = self._list_updated
+                if list_updated is None or started - list_updated >= self.list_interval:
+                    self._refresh_list()
+                self._refresh_quotes()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                self._ready.set()  # 首次加载失败也不要让界面一直等待
+            self._stop.wait(max(0.0, self.quote_interval - (time.monotonic() - started)))
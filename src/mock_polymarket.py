@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+本地模拟Polymarket服务 - 在一个端口上模拟Gamma事件接口、CLOB行情/下单接口和Polygon JSON-RPC，
+用于离线压测。支持延迟、错误率和吞吐量限制。
+
+启动后按提示设置环境变量即可让机器人连接到模拟服务:
+    python -m src.mock_polymarket --port 8999 --assets 200 --latency-ms 20 --error-rate 0.01
+
+路径前缀: /gamma -> Gamma, /clob -> CLOB, /rpc -> Polygon RPC
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Multicall3需要eth_abi（web3的依赖），没有安装时只支持单个和批量eth_call
+try:
+    from eth_abi import decode as abi_decode, encode as abi_encode
+    ETH_ABI_AVAILABLE = True
+except ImportError:
+    ETH_ABI_AVAILABLE = False
+
+SERIES_INTERVAL = 900          # 模拟 <资产>-updown-15m 周期市场
+TICK_SIZE = 0.01
+BOOK_LEVELS = 5
+MULTICALL3_ADDRESS = '0xca11bde05977b3631167028862be2a173976ca11'
+BALANCE_OF = '70a08231'            # balanceOf(address)
+ALLOWANCE = 'dd62ed3e'             # allowance(address,address)
+BALANCE_OF_1155 = '00fdd58e'       # balanceOf(address,uint256)
+IS_APPROVED_FOR_ALL = 'e985e9c5'   # isApprovedForAll(address,address)
+AGGREGATE3 = '82ad56cb'            # aggregate3((address,bool,bytes)[])
+
+
+def _token_id(slug: str, side: str) -> str:
+    return str(int(hashlib.sha256(f"{slug}:{side}".encode()).hexdigest()[:30], 16))
+
+
+def _unit_random(seed: str) -> float:
+    """由种子确定的 [-1, 1] 随机数"""
+    return int(hashlib.sha256(seed.encode()).hexdigest()[:8], 16) / 0xffffffff * 2 - 1
+
+
+class MockMarketState:
+    """模拟的市场、订单簿和订单（线程安全）"""
+
+    def __init__(self, assets: int, horizon_minutes: float, depth: float, usdc_balance: float, replenish_seconds: float):
+        self.assets = assets
+        self.horizon = horizon_minutes * 60
+        self.depth = depth
+        self.usdc_balance = usdc_balance
+        self.replenish_seconds = replenish_seconds
+
+        self.tokens: Dict[str, Tuple[str, int, str]] = {}  # token_id -> (slug, 开始时间, YES/NO)
+        self.consumed: Dict[Tuple[str, float], float] = {}  # (token_id, 价格) -> 已成交数量
+        self.consumed_at = time.monotonic()
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    # ----- Gamma -----
+
+    def _event(self, asset: int, start_ts: int) -> Dict[str, Any]:
+        slug = f"mock{asset}-updown-15m-{start_ts}"
+        no_token, yes_token = _token_id(slug, 'NO'), _token_id(slug, 'YES')
+        with self._lock:
+            self.tokens[yes_token] = (slug, start_ts, 'YES')
+            self.tokens[no_token] = (slug, start_ts, 'NO')
+        end_date = datetime.fromtimestamp(start_ts + SERIES_INTERVAL, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        event_id = str(asset * 10_000_000 + start_ts // SERIES_INTERVAL % 10_000_000)
+        market = {
+            'id': event_id,
+            'question': f"Mock asset {asset} Up or Down",
+            'clobTokenIds': json.dumps([no_token, yes_token]),
+            'endDate': end_date,
+            'closed': False,
+        }
+        closed = time.time() >= start_ts + SERIES_INTERVAL
+        if closed:
+            # 结算结果与收敛方向一致，outcomePrices 与 clobTokenIds 顺序相同
+            yes_won = _unit_random(slug) >= 0
+            market.update(closed=True, outcomePrices=json.dumps(['0', '1'] if yes_won else ['1', '0']))
+        return {
+            'id': event_id,
+            'ticker': slug,
+            'slug': slug,
+            'title': f"Mock asset {asset} Up or Down",
+            'endDate': end_date,
+            'closed': closed,
+            'active': not closed,
+            'markets': [market]
+        }
+
+    def events(self, query: Dict[str, str]) -> List[Dict[str, Any]]:
+        now = time.time()
+        if query.get('slug'):
+            parts = query['slug'].split('-')
+            if len(parts) != 4 or not parts[0].startswith('mock') or parts[1:3] != ['updown', '15m']:
+                return []
+            try:
+                asset, start_ts = int(parts[0][4:]), int(parts[3])
+            except ValueError:
+                return []
+            if asset >= self.assets or start_ts % SERIES_INTERVAL or start_ts > now + self.horizon:
+                return []
+            return [self._event(asset, start_ts)]
+
+        end_min = _parse_date(query.get('end_date_min'), now - SERIES_INTERVAL)
+        end_max = _parse_date(query.get('end_date_max'), now + self.horizon)
+        first_start = math.ceil((max(end_min, now) - SERIES_INTERVAL) / SERIES_INTERVAL) * SERIES_INTERVAL
+        starts = range(first_start, int(min(end_max, now + self.horizon)) - SERIES_INTERVAL + 1, SERIES_INTERVAL)
+
+        ordered = [(start_ts, asset) for start_ts in starts for asset in range(self.assets)]
+        if query.get('order') == 'id' and query.get('ascending') == 'false':
+            ordered.reverse()
+        offset = int(query.get('offset', 0))
+        limit = int(query.get('limit', 100))
+        return [self._event(asset, start_ts) for start_ts, asset in ordered[offset:offset + limit]]
+
+    # ----- CLOB 行情 -----
+
+    def mid(self, token_id: str) -> Optional[float]:
+        """YES价格随市场临近结束向一侧收敛，使临近结束的价格区间策略能被触发"""
+        info = self.tokens.get(token_id)
+        if info is None:
+            return None
+        slug, start_ts, side = info
+        progress = min(1.0, max(0.0, (time.time() - start_ts) / SERIES_INTERVAL))
+        wobble = 0.02 * math.sin(time.time() / 7 + start_ts)
+        yes_mid = 0.5 + 0.48 * _unit_random(slug) * progress + wobble * (1 - progress)
+        yes_mid = min(0.99, max(0.01, round(yes_mid / TICK_SIZE) * TICK_SIZE))
+        return round(yes_mid if side == 'YES' else 1 - yes_mid, 2)
+
+    def _replenish(self):
+        if time.monotonic() - self.consumed_at >= self.replenish_seconds:
+            self.consumed.clear()
+            self.consumed_at = time.monotonic()
+
+    def book(self, token_id: str) -> Optional[Dict[str, Any]]:
+        mid = self.mid(token_id)
+        if mid is None:
+            return None
+        with self._lock:
+            self._replenish()
+            asks, bids = [], []
+            for level in range(BOOK_LEVELS):
+                size = self.depth * (level + 1)
+                ask_price = round(mid + TICK_SIZE * (level + 1), 2)
+                bid_price = round(mid - TICK_SIZE * (level + 1), 2)
+                if ask_price < 1:
+                    remaining = size - self.consumed.get((token_id, ask_price), 0.0)
+                    if remaining > 0:
+                        asks.append({'price': f"{ask_price:.2f}", 'size': f"{remaining:.2f}"})
+                if bid_price > 0:
+                    bids.append({'price': f"{bid_price:.2f}", 'size': f"{size:.2f}"})
+        slug = self.tokens[token_id][0]
+        return {
+            'market': hashlib.sha256(slug.encode()).hexdigest()[:40],
+            'asset_id': token_id,
+            'timestamp': str(int(time.time() * 1000)),
+            'hash': uuid.uuid4().hex,
+            'bids': list(reversed(bids)),   # 与线上一致：买单价格从低到高
+            'asks': list(reversed(asks)),   # 与线上一致：卖单价格从高到低
+            'min_order_size': '5',
+            'tick_size': str(TICK_SIZE),
+            'neg_risk': False,
+            'last_trade_price': f"{mid:.2f}",
+        }
+
+    # ----- CLOB 下单 -----
+
+    def post_order(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        order = body.get('order') or {}
+        order_type = body.get('orderType', 'GTC')
+        token_id = str(order.get('tokenId', ''))
+        if self.mid(token_id) is None:
+            return 400, {'error': 'invalid token id'}
+
+        maker_amount = int(order.get('makerAmount', 0)) / 1e6
+        taker_amount = int(order.get('takerAmount', 0)) / 1e6
+        side = 'BUY' if str(order.get('side')) in ('BUY', '0') else 'SELL'
+        if side != 'BUY' or taker_amount <= 0:
+            return 400, {'error': 'mock server only supports BUY orders'}
+        limit_price = maker_amount / taker_amount
+
+        self.book(token_id)  # 确保深度已按时间补充
+        with self._lock:
+            mid = self.mid(token_id)
+            fillable = 0.0
+            fills = []
+            for level in range(BOOK_LEVELS):
+                price = round(mid + TICK_SIZE * (level + 1), 2)
+                if price > limit_price + 1e-9 or price >= 1:
+                    break
+                available = self.depth * (level + 1) - self.consumed.get((token_id, price), 0.0)
+                take = min(available, taker_amount - fillable)
+                if take > 0:
+                    fills.append((price, take))
+                    fillable += take
+                if fillable >= taker_amount - 1e-9:
+                    break
+
+            fully_filled = fillable >= taker_amount - 1e-9
+            if order_type == 'FOK' and not fully_filled:
+                return 400, {'error': "order couldn't be fully filled. FOK orders are fully filled or killed."}
+
+            for price, take in fills:
+                self.consumed[(token_id, price)] = self.consumed.get((token_id, price), 0.0) + take
+
+            order_id = '0x' + uuid.uuid4().hex + uuid.uuid4().hex
+            status = 'MATCHED' if fully_filled else 'LIVE'
+            self.orders[order_id] = {
+                'id': order_id,
+                'status': status,
+                'asset_id': token_id,
+                'side': side,
+                'original_size': f"{taker_amount:.2f}",
+                'size_matched': f"{fillable:.2f}",
+                'price': f"{limit_price:.2f}",
+                'order_type': order_type,
+                'expiration': str(order.get('expiration', '0')),
+                'created_at': int(time.time()),
+            }
+        return 200, {
+            'success': True,
+            'errorMsg': '',
+            'orderID': order_id,
+            'status': status.lower(),
+            'makingAmount': f"{sum(price * take for price, take in fills):.6f}",
+            'takingAmount': f"{fillable:.6f}",
+        }
+
+    def open_orders(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            for order in self.orders.values():
+                expiration = int(order['expiration'] or 0)
+                if order['status'] == 'LIVE' and expiration and expiration - 60 <= now:
+                    order['status'] = 'CANCELED'
+            return [dict(order) for order in self.orders.values() if order['status'] == 'LIVE']
+
+    def cancel(self, order_ids: List[str]) -> Dict[str, Any]:
+        canceled, not_canceled = [], {}
+        with self._lock:
+            for order_id in order_ids:
+                order = self.orders.get(order_id)
+                if order is None or order['status'] != 'LIVE':
+                    not_canceled[order_id] = 'order not found or not live'
+                else:
+                    order['status'] = 'CANCELED'
+                    canceled.append(order_id)
+        return {'canceled': canceled, 'not_canceled': not_canceled}
+
+    # ----- Polygon RPC -----
+
+    def rpc(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        method = request.get('method')
+        params = request.get('params') or []
+        result: Any
+        if method == 'eth_chainId':
+            result = hex(137)
+        elif method == 'net_version':
+            result = '137'
+        elif method == 'web3_clientVersion':
+            result = 'mock-polymarket/1.0'
+        elif method == 'eth_blockNumber':
+            result = hex(int(time.time() // 2))
+        elif method == 'eth_getBalance':
+            result = hex(0)
+        elif method == 'eth_call':
+            call = params[0] or {}
+            data = bytes.fromhex(str(call.get('data', '0x'))[2:])
+            if str(call.get('to', '')).lower() == MULTICALL3_ADDRESS and data[:4].hex() == AGGREGATE3 and ETH_ABI_AVAILABLE:
+                (calls,) = abi_decode(['(address,bool,bytes)[]'], data[4:])
+                results = [self._contract_call(bytes(call_data)) for _, _, call_data in calls]
+                encoded = abi_encode(['(bool,bytes)[]'], [[(value is not None, value or b'') for value in results]])
+                result = '0x' + encoded.hex()
+            else:
+                value = self._contract_call(data)
+                if value is None:
+                    return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': {'code': 3, 'message': 'execution reverted'}}
+                result = '0x' + value.hex()
+        else:
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': {'code': -32601, 'message': f'method not supported: {method}'}}
+        return {'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}
+
+
+    def _contract_call(self, data: bytes) -> Optional[bytes]:
+        """模拟USDC和条件代币合约的只读调用，不支持的调用返回None（相当于revert）"""
+        selector = data[:4].hex()
+        if selector == BALANCE_OF:
+            value = int(self.usdc_balance * 1e6)
+        elif selector == ALLOWANCE:
+            value = 2 ** 256 - 1
+        elif selector == IS_APPROVED_FOR_ALL:
+            value = 1
+        elif selector == BALANCE_OF_1155 and len(data) >= 68:
+            token_id = str(int.from_bytes(data[36:68], 'big'))
+            with self._lock:
+                value = int(sum(float(order['size_matched']) for order in self.orders.values()
+                                if order['asset_id'] == token_id) * 1e6)
+        else:
+            return None
+        return value.to_bytes(32, 'big')
+
+
+def _parse_date(value: Optional[str], default: float) -> float:
+    if not value:
+        return default
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return default
+
+
+class MockPolymarketServer(ThreadingHTTPServer):
+    """带延迟、错误率和吞吐量限制的模拟服务"""
+
+    daemon_threads = True
+
+    def __init__(self, address, state: MockMarketState, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, max_rps: float = 0.0):
+        super().__init__(address, MockRequestHandler)
+        self.state = state
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.max_rps = max_rps
+        self._tokens = max_rps
+        self._tokens_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.throttled_count = 0
+        self.error_count = 0
+
+    def admit(self) -> bool:
+        """令牌桶吞吐量限制，max_rps为0表示不限制"""
+        with self._lock:
+            self.request_count += 1
+            if self.max_rps <= 0:
+                return True
+            now = time.monotonic()
+            self._tokens = min(self.max_rps, self._tokens + (now - self._tokens_at) * self.max_rps)
+            self._tokens_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.throttled_count += 1
+            return False
+
+    def inject_failure(self) -> bool:
+        failed = self.error_rate > 0 and random.random() < self.error_rate
+        if failed:
+            with self._lock:
+                self.error_count += 1
+        return failed
+
+    def delay(self):
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """按路径前缀分发到Gamma、CLOB和RPC"""
+
+    protocol_version = 'HTTP/1.1'  # 保持连接，与线上行为一致
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> Any:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def _handle(self, method: str):
+        server: MockPolymarketServer = self.server
+        parsed = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        body = self._body() if method in ('POST', 'DELETE') else None
+
+        server.delay()
+        if not server.admit():
+            self._send(429, {'error': 'rate limited'}, {'Retry-After': '1'})
+            return
+        if server.inject_failure():
+            self._send(500, {'error': 'injected failure'})
+            return
+
+        prefix, _, path = parsed.path.lstrip('/').partition('/')
+        path = '/' + path
+        try:
+            if prefix == 'gamma':
+                self._gamma(method, path, query)
+            elif prefix == 'clob':
+                self._clob(method, path, query, body)
+            elif prefix == 'rpc' and method == 'POST':
+                if isinstance(body, list):
+                    self._send(200, [server.state.rpc(request) for request in body])
+                else:
+                    self._send(200, server.state.rpc(body or {}))
+            else:
+                self._send(404, {'error': 'not found'})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+
+    def _gamma(self, method: str, path: str, query: Dict[str, str]):
+        if method == 'GET' and path == '/events':
+            self._send(200, self.server.state.events(query))
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def _clob(self, method: str, path: str, query: Dict[str, str], body: Any):
+        state: MockMarketState = self.server.state
+        token_id = query.get('token_id', '')
+
+        if method == 'GET' and path == '/':
+            self._send(200, 'OK')
+        elif method == 'GET' and path == '/time':
+            self._send(200, int(time.time()))
+        elif method in ('GET', 'POST') and path in ('/auth/api-key', '/auth/derive-api-key'):
+            self._send(200, {
+                'apiKey': str(uuid.uuid5(uuid.NAMESPACE_URL, 'mock-api-key')),
+                'secret': base64.urlsafe_b64encode(b'mock-polymarket-secret-000000000').decode(),
+                'passphrase': 'mock-passphrase'
+            })
+        elif method == 'GET' and path in ('/midpoint', '/price', '/book', '/tick-size', '/neg-risk', '/fee-rate'):
+            book = state.book(token_id)
+            if book is None:
+                self._send(404, {'error': 'No orderbook exists for the requested token id'})
+            elif path == '/midpoint':
+                self._send(200, {'mid': f"{state.mid(token_id):.2f}"})
+            elif path == '/price':
+                levels = book['bids'] if query.get('side', 'BUY').upper() == 'BUY' else book['asks']
+                self._send(200, {'price': levels[-1]['price'] if levels else '0'})
+            elif path == '/book':
+                self._send(200, book)
+            elif path == '/tick-size':
+                self._send(200, {'minimum_tick_size': TICK_SIZE})
+            elif path == '/neg-risk':
+                self._send(200, {'neg_risk': False})
+            else:
+                self._send(200, {'base_fee': 0})
+        elif method == 'POST' and path == '/books':
+            books = [state.book(str(item.get('token_id'))) for item in body or []]
+            self._send(200, [book for book in books if book is not None])
+        elif method == 'POST' and path == '/order':
+            status, payload = state.post_order(body or {})
+            self._send(status, payload)
+        elif method == 'GET' and path == '/data/orders':
+            self._send(200, {'data': state.open_orders(), 'next_cursor': 'LTE=', 'limit': 500, 'count': 0})
+        elif method == 'GET' and path.startswith('/data/order/'):
+            order = state.orders.get(path.rsplit('/', 1)[-1])
+            self._send(200 if order else 404, dict(order) if order else {'error': 'order not found'})
+        elif method == 'DELETE' and path == '/order':
+            self._send(200, state.cancel([(body or {}).get('orderID', '')]))
+        elif method == 'DELETE' and path == '/orders':
+            self._send(200, state.cancel(list(body or [])))
+        elif method == 'DELETE' and path == '/cancel-all':
+            self._send(200, state.cancel([order['id'] for order in state.open_orders()]))
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟Polymarket服务（Gamma + CLOB + Polygon RPC）')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8999, help='监听端口 (默认: 8999)')
+    parser.add_argument('--assets', type=int, default=100, help='模拟的15分钟周期市场数量 (默认: 100)')
+    parser.add_argument('--horizon-minutes', type=float, default=120, help='提前多少分钟的市场已上线 (默认: 120)')
+    parser.add_argument('--depth', type=float, default=50, help='订单簿第一档数量，之后每档递增 (默认: 50)')
+    parser.add_argument('--replenish-seconds', type=float, default=5, help='订单簿深度恢复间隔 (默认: 5秒)')
+    parser.add_argument('--usdc-balance', type=float, default=1000, help='balanceOf返回的USDC余额 (默认: 1000)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='每个请求的平均延迟 (毫秒)')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='延迟抖动 (毫秒)')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回HTTP 500的比例 (0-1)')
+    parser.add_argument('--max-rps', type=float, default=0, help='每秒最大请求数，超出返回429，0表示不限制')
+    args = parser.parse_args()
+
+    state = MockMarketState(args.assets, args.horizon_minutes, args.depth, args.usdc_balance, args.replenish_seconds)
+    server = MockPolymarketServer(
+        (args.host, args.port), state,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, max_rps=args.max_rps
+    )
+    base = f"http://{args.host}:{args.port}"
+    print(f"🧪 模拟Polymarket服务已启动: {base}（{args.assets}个周期市场）")
+    print("设置以下环境变量让机器人连接到模拟服务:")
+    print(f"  GAMMA_API_URL={base}/gamma")
+    print(f"  CLOB_API_URL={base}/clob")
+    print(f"  POLYGON_RPC_URLS={base}/rpc")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n请求 {server.request_count} 次, 限流 {server.throttled_count} 次, 注入错误 {server.error_count} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+多账户交易器 - 单进程加载多个账户，共享一条行情管线，按账户并行下单
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .auto_trader import AutoTrader
+from .order_signer import OrderSigningService
+from .polymarket_trader import PolymarketTrader
+from .quote_cache import QuoteCache
+
+
+@dataclass
+class AccountConfig:
+    """单个账户配置"""
+    name: str
+    private_key: str
+    funder: str
+    signature_type: int = 0
+    trade_amount: Optional[float] = None   # 为None时使用TRADE_AMOUNT
+    max_trades: Optional[int] = None       # 为None时使用命令行的--max-trades
+
+
+def load_account_configs(path: str) -> List[AccountConfig]:
+    """
+    从JSON文件加载账户配置
+
+    文件内容为账户列表，私钥可以直接写在 private_key 中，
+    也可以用 private_key_env 指定从哪个环境变量读取（推荐）。
+
+    Args:
+        path: 配置文件路径
+
+    Returns:
+        账户配置列表
+    """
+    with open(Path(path), 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    accounts = []
+    for i, entry in enumerate(entries):
+        name = entry.get('name') or f"account-{i + 1}"
+        private_key = entry.get('private_key') or os.getenv(entry.get('private_key_env', ''), '')
+        if not private_key:
+            raise ValueError(f"账户 {name} 未设置私钥（private_key 或 private_key_env）")
+        if not entry.get('funder'):
+            raise ValueError(f"账户 {name} 未设置资金地址（funder）")
+
+        accounts.append(AccountConfig(
+            name=name,
+            private_key=private_key,
+            funder=entry['funder'],
+            signature_type=int(entry.get('signature_type', 0)),
+            trade_amount=entry.get('trade_amount'),
+            max_trades=entry.get('max_trades'),
+        ))
+
+    if not accounts:
+        raise ValueError(f"账户配置文件为空: {path}")
+    return accounts
+
+
+class MultiAccountTrader:
+    """多账户自动交易器"""
+
+    def __init__(self, accounts: List[AccountConfig], max_workers: Optional[int] = None):
+        """
+        初始化多账户交易器
+
+        Args:
+            accounts: 账户配置列表
+            max_workers: 并行下单的线程数，默认每个账户一个线程
+        """
+        self.accounts = accounts
+        self.max_workers = max_workers or len(accounts)
+        self.quote_cache = QuoteCache()  # 所有账户共享的报价缓存
+        # 所有账户共享的签名进程池，默认每个账户一个进程（不超过CPU核数）
+        signing_processes = int(os.getenv('SIGNING_PROCESSES', str(min(len(accounts), os.cpu_count() or 1))))
+        self.signing_service = OrderSigningService(signing_processes) if signing_processes > 0 else None
+
+        self.traders: Dict[str, PolymarketTrader] = {}
+        for account in accounts:
+            self.traders[account.name] = PolymarketTrader(
+                private_key=account.private_key,
+                funder=account.funder,
+                signature_type=account.signature_type,
+                quote_cache=self.quote_cache,
+                signing_service=self.signing_service
+            )
+
+        # 第一个账户的自动交易器负责扫描和分析，行情只获取一次
+        self.auto_trader = AutoTrader(trader=self.traders[accounts[0].name])
+        self.test_only = False
+
+    def _run_account(self, account: AccountConfig, opportunities: List[Dict[str, Any]], max_trades: int,
+                     balances: Dict[str, float]) -> Dict[str, Any]:
+        """在单个账户上执行交易机会，余额和交易次数独立计算"""
+        trader = self.traders[account.name]
+        trade_amount = account.trade_amount or self.auto_trader.default_trade_size
+        budget = account.max_trades if account.max_trades is not None else max_trades
+        balance = balances.get(trader.funder, 0.0)
+
+        summary = {'account': account.name, 'balance': balance, 'executed': 0, 'budget': budget, 'results': []}
+
+        for analysis in opportunities:
+            if summary['executed'] >= budget:
+                break
+            if balance < trade_amount:
+                summary['results'].append({'success': False, 'error': f'余额不足 ({balance:.2f} < {trade_amount})'})
+                break
+
+            market = analysis['market']
+            if self.test_only:
+                summary['results'].append({'success': True, 'market': market.ticker, 'test_mode': True})
+                summary['executed'] += 1
+                continue
+
+            # 按本账户的下单金额重新计算深度限制
+            account_analysis = self.auto_trader.apply_depth_sizing(dict(analysis), trade_amount)
+            if account_analysis['recommendation'] == 'HOLD':
+                summary['results'].append({'success': False, 'market': market.ticker, 'error': account_analysis['reason']})
+                continue
+
+            trade_result = self.auto_trader.execute_trade(account_analysis, trader=trader)
+            trade_result['market'] = market.ticker
+            summary['results'].append(trade_result)
+            if trade_result['success']:
+                summary['executed'] += 1
+                balance -= trade_amount
+
+        return summary
+
+    def auto_trade_loop(self, max_hours: Optional[float] = 1.0, max_trades: int = 5, start_minutes: Optional[int] = None, end_minutes: Optional[int] = None):
+        """
+        多账户自动交易循环
+
+        Args:
+            max_hours: 扫描的最大时间范围
+            max_trades: 每个账户默认的最大交易次数
+            start_minutes: 开始扫描时间（分钟）
+            end_minutes: 结束扫描时间（分钟）
+        """
+        print("=== 多账户自动交易循环开始 ===")
+        print(f"账户数量: {len(self.accounts)} ({', '.join(account.name for account in self.accounts)})")
+        print(f"测试模式: {'启用' if self.test_only else '禁用'}")
+
+        # 行情扫描和分析只做一次
+        opportunities = self.auto_trader.scan_and_analyze(max_hours, start_minutes, end_minutes)
+        actionable = [analysis for analysis in opportunities if analysis['recommendation'] != 'HOLD']
+        print(f"\n找到 {len(opportunities)} 个市场机会，其中 {len(actionable)} 个可交易")
+
+        if not actionable or not self.auto_trader.auto_trade_enabled:
+            return []
+
+        # 一次链上往返读取所有账户的余额并同步给共享的风控引擎，然后按账户并行下单
+        balances = self.auto_trader.sync_balances(list(self.traders.values()))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._run_account, account, actionable, max_trades, balances)
+                       for account in self.accounts]
+            summaries = []
+            for account, future in zip(self.accounts, futures):
+                try:
+                    summaries.append(future.result())
+                except Exception as e:
+                    summaries.append({'account': account.name, 'executed': 0, 'budget': 0, 'error': str(e), 'results': []})
+
+        print("\n=== 多账户交易总结 ===")
+        for summary in summaries:
+            if 'error' in summary:
+                print(f"❌ {summary['account']}: 执行失败 ({summary['error']})")
+                continue
+            print(f"👤 {summary['account']}: 执行交易 {summary['executed']}/{summary['budget']}, 初始余额 {summary['balance']:.2f} USD")
+            for result in summary['results']:
+                if result['success']:
+                    print(f"   ✅ {result.get('market', '')}")
+                else:
+                    print(f"   ❌ {result.get('market', '')} {result.get('error', '')}")
+
+        if self.auto_trader.order_mode == 'limit' and not self.test_only:
+            self.auto_trader.manage_resting_orders()
+
+        if self.signing_service is not None:
+            self.signing_service.print_stats()
+
+        return summaries
+
+    def close(self):
+        """释放签名进程池"""
+        if self.signing_service is not None:
+            self.signing_service.shutdown()
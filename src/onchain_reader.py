@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+批量链上读取 - 把多个资金地址的USDC余额、授权额度和条件代币（CTF ERC-1155）持仓
+合并为一次Multicall3调用或一次JSON-RPC批量请求，一个往返取回整个持仓状态
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import requests
+
+from .endpoints import polygon_rpc_urls
+
+# 尝试导入eth_abi（web3的依赖），没有安装时只使用JSON-RPC批量请求
+try:
+    from eth_abi import decode as abi_decode, encode as abi_encode
+    ETH_ABI_AVAILABLE = True
+except ImportError:
+    ETH_ABI_AVAILABLE = False
+
+# Polygon主网合约地址
+USDC_ADDRESS = "0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174"
+CTF_ADDRESS = "0x4D97DCd97eC945f40cF65F87097ACe5EA0476045"
+CTF_EXCHANGE_ADDRESS = "0x4bFb41d5B3570DeFd03C39a9A4D8dE6Bd8B8982E"
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+# 函数选择器
+BALANCE_OF = "70a08231"            # balanceOf(address)
+ALLOWANCE = "dd62ed3e"             # allowance(address,address)
+BALANCE_OF_1155 = "00fdd58e"       # balanceOf(address,uint256)
+IS_APPROVED_FOR_ALL = "e985e9c5"   # isApprovedForAll(address,address)
+AGGREGATE3 = "82ad56cb"            # aggregate3((address,bool,bytes)[])
+
+USDC_DECIMALS = 6
+CTF_DECIMALS = 6  # 条件代币与USDC抵押品精度相同
+
+
+def _address_word(address: str) -> str:
+    return address.lower().replace('0x', '').rjust(64, '0')
+
+
+def _uint_word(value: int) -> str:
+    return f"{value:064x}"
+
+
+@dataclass(frozen=True)
+class ContractCall:
+    """一次只读合约调用"""
+    target: str
+    data: str  # 0x开头的calldata
+
+
+def balance_of_call(token: str, owner: str) -> ContractCall:
+    return ContractCall(token, f"0x{BALANCE_OF}{_address_word(owner)}")
+
+
+def allowance_call(token: str, owner: str, spender: str) -> ContractCall:
+    return ContractCall(token, f"0x{ALLOWANCE}{_address_word(owner)}{_address_word(spender)}")
+
+
+def position_balance_call(owner: str, token_id: str, ctf: str = CTF_ADDRESS) -> ContractCall:
+    return ContractCall(ctf, f"0x{BALANCE_OF_1155}{_address_word(owner)}{_uint_word(int(token_id))}")
+
+
+def approved_for_all_call(owner: str, operator: str, ctf: str = CTF_ADDRESS) -> ContractCall:
+    return ContractCall(ctf, f"0x{IS_APPROVED_FOR_ALL}{_address_word(owner)}{_address_word(operator)}")
+
+
+def decode_uint(data: Optional[bytes]) -> Optional[int]:
+    """解析返回值中的第一个uint256，调用失败时返回None"""
+    if data is None or len(data) < 32:
+        return None
+    return int.from_bytes(data[:32], 'big')
+
+
+@dataclass
+class PortfolioState:
+    """一个资金地址的链上持仓状态"""
+    address: str
+    usdc_balance: Optional[float] = None     # USDC余额
+    usdc_allowance: Optional[float] = None   # 对CTF交易所的USDC授权额度
+    ctf_approved: Optional[bool] = None      # 条件代币是否已授权给CTF交易所
+    positions: Dict[str, float] = field(default_factory=dict)  # token_id -> 持有份额
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        return not self.errors
+
+
+class OnchainReader:
+    """批量链上读取器"""
+
+    def __init__(self, rpc_endpoints: Optional[Sequence[str]] = None, mode: Optional[str] = None,
+                 max_batch: Optional[int] = None):
+        """
+        初始化批量链上读取器
+
+        Args:
+            rpc_endpoints: RPC地址列表，按顺序故障切换，如果为None则读取 POLYGON_RPC_URLS
+            mode: multicall（合并为一次Multicall3调用）或 batch（JSON-RPC批量请求），
+                如果为None则从环境变量 ONCHAIN_READ_MODE 读取
+            max_batch: 单个请求最多包含的调用数，如果为None则从环境变量 ONCHAIN_BATCH_SIZE 读取
+        """
+        self.rpc_endpoints = list(rpc_endpoints or polygon_rpc_urls())
+        mode = (mode or os.getenv('ONCHAIN_READ_MODE', 'multicall')).lower()
+        if mode == 'multicall' and not ETH_ABI_AVAILABLE:
+            mode = 'batch'
+        self.mode = mode
+        self.max_batch = max_batch or int(os.getenv('ONCHAIN_BATCH_SIZE', '100'))
+        self.timeout = float(os.getenv('ONCHAIN_READ_TIMEOUT', '10'))
+
+        self._sessions: Dict[str, requests.Session] = {}
+        self._next_id = 0
+        self.round_trips = 0
+
+    def _post(self, payload):
+        """发送JSON-RPC请求，按顺序尝试各RPC端点"""
+        last_error: Optional[Exception] = None
+        for rpc_url in self.rpc_endpoints:
+            session = self._sessions.get(rpc_url)
+            if session is None:
+                session = self._sessions[rpc_url] = requests.Session()
+            try:
+                self.round_trips += 1
+                response = session.post(rpc_url, json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json()
+            except (requests.RequestException, ValueError) as e:
+                last_error = e
+        raise RuntimeError(f"所有RPC端点都失败: {last_error}")
+
+    def _eth_call_request(self, call: ContractCall) -> dict:
+        self._next_id += 1
+        return {
+            'jsonrpc': '2.0',
+            'id': self._next_id,
+            'method': 'eth_call',
+            'params': [{'to': call.target, 'data': call.data}, 'latest']
+        }
+
+    def _batch(self, calls: Sequence[ContractCall]) -> List[Optional[bytes]]:
+        """一次JSON-RPC批量请求，失败的调用返回None"""
+        requests_ = [self._eth_call_request(call) for call in calls]
+        responses = self._post(requests_)
+        if not isinstance(responses, list):
+            raise RuntimeError(f"RPC不支持批量请求: {responses}")
+        by_id = {response.get('id'): response for response in responses}
+        results = []
+        for request in requests_:
+            result = by_id.get(request['id'], {}).get('result')
+            results.append(bytes.fromhex(result[2:]) if isinstance(result, str) and result.startswith('0x') else None)
+        return results
+
+    def _multicall(self, calls: Sequence[ContractCall]) -> List[Optional[bytes]]:
+        """一次Multicall3 aggregate3调用，单个调用失败不影响其他调用"""
+        encoded = abi_encode(
+            ['(address,bool,bytes)[]'],
+            [[(call.target, True, bytes.fromhex(call.data[2:])) for call in calls]]
+        )
+        request = self._eth_call_request(ContractCall(MULTICALL3_ADDRESS, f"0x{AGGREGATE3}{encoded.hex()}"))
+        response = self._post(request)
+        if 'error' in response:
+            raise RuntimeError(f"Multicall调用失败: {response['error']}")
+        (results,) = abi_decode(['(bool,bytes)[]'], bytes.fromhex(response['result'][2:]))
+        return [bytes(data) if success else None for success, data in results]
+
+    def call_many(self, calls: Sequence[ContractCall]) -> List[Optional[bytes]]:
+        """
+        批量执行只读合约调用
+
+        Args:
+            calls: 合约调用列表
+
+        Returns:
+            与calls顺序一致的返回数据，失败的调用为None
+        """
+        results: List[Optional[bytes]] = []
+        for start in range(0, len(calls), self.max_batch):
+            chunk = calls[start:start + self.max_batch]
+            if self.mode == 'multicall':
+                try:
+                    results.extend(self._multicall(chunk))
+                    continue
+                except Exception as e:
+                    print(f"⚠️ Multicall失败，改用JSON-RPC批量请求: {e}")
+            results.extend(self._batch(chunk))
+        return results
+
+    def get_portfolio(self, addresses: Iterable[str], token_ids: Iterable[str] = (),
+                      spender: str = CTF_EXCHANGE_ADDRESS) -> Dict[str, PortfolioState]:
+        """
+        一次往返读取多个资金地址的USDC余额、授权和条件代币持仓
+
+        Args:
+            addresses: 资金地址列表
+            token_ids: 需要查询持仓的条件代币ID（对每个地址都会查询）
+            spender: 授权对象，默认为CTF交易所
+
+        Returns:
+            地址 -> 持仓状态
+        """
+        addresses = list(dict.fromkeys(addresses))
+        token_ids = list(dict.fromkeys(str(token_id) for token_id in token_ids))
+
+        calls: List[ContractCall] = []
+        slots = []  # (地址, 字段, token_id)
+        for address in addresses:
+            calls += [
+                balance_of_call(USDC_ADDRESS, address),
+                allowance_call(USDC_ADDRESS, address, spender),
+                approved_for_all_call(address, spender),
+            ]
+            slots += [(address, 'usdc_balance', None), (address, 'usdc_allowance', None), (address, 'ctf_approved', None)]
+            for token_id in token_ids:
+                calls.append(position_balance_call(address, token_id))
+                slots.append((address, 'position', token_id))
+
+        states = {address: PortfolioState(address) for address in addresses}
+        for (address, name, token_id), data in zip(slots, self.call_many(calls)):
+            state = states[address]
+            value = decode_uint(data)
+            if value is None:
+                state.errors.append(f"{name}:{token_id}" if token_id else name)
+            elif name == 'usdc_balance':
+                state.usdc_balance = value / 10 ** USDC_DECIMALS
+            elif name == 'usdc_allowance':
+                state.usdc_allowance = value / 10 ** USDC_DECIMALS
+            elif name == 'ctf_approved':
+                state.ctf_approved = bool(value)
+            elif value:
+                state.positions[token_id] = value / 10 ** CTF_DECIMALS
+        return states
+
+
+def main():
+    """测试批量链上读取"""
+    import sys
+
+    addresses = sys.argv[1:] or ["0x7e86A3FC28392CA607Ee519fA41F19C02CF77a1A"]
+    reader = OnchainReader()
+    print(f"=== 批量链上读取测试（{reader.mode}）===")
+    for address, state in reader.get_portfolio(addresses).items():
+        print(f"{address}: USDC {state.usdc_balance}, 授权 {state.usdc_allowance}, "
+              f"CTF授权 {state.ctf_approved}, 持仓 {state.positions}, 失败 {state.errors}")
+    print(f"RPC往返次数: {reader.round_trips}")
+
+
+if __name__ == "__main__":
+    main()
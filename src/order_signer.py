@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+订单签名服务 - 在进程池中完成EIP-712哈希和ECDSA签名，避免CPU密集的签名阻塞网络请求
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from py_clob_client.clob_types import CreateOrderOptions, MarketOrderArgs
+
+# 工作进程内按账户缓存的订单构建器
+_worker_accounts: Dict[str, Tuple[str, int, int, str]] = {}
+_worker_builders: Dict[str, Any] = {}
+
+
+def _init_worker(accounts: Dict[str, Tuple[str, int, int, str]]):
+    """工作进程初始化：保存账户凭据，构建器在首次使用时创建"""
+    _worker_accounts.clear()
+    _worker_accounts.update(accounts)
+    _worker_builders.clear()
+
+
+def _get_builder(account_id: str):
+    """获取（或创建）账户对应的订单构建器"""
+    builder = _worker_builders.get(account_id)
+    if builder is None:
+        from py_clob_client.order_builder.builder import OrderBuilder
+        from py_clob_client.signer import Signer
+
+        private_key, chain_id, signature_type, funder = _worker_accounts[account_id]
+        builder = OrderBuilder(Signer(private_key, chain_id), sig_type=signature_type, funder=funder)
+        _worker_builders[account_id] = builder
+    return builder
+
+
+def _sign_market_order(account_id: str, order_args: MarketOrderArgs, tick_size: str, neg_risk: bool) -> Tuple[Dict[str, Any], float]:
+    """在工作进程中签名市价单，返回 (订单JSON, 签名耗时秒)；order_args 的价格和手续费率须已由调用方解析并校验"""
+    start = time.perf_counter()
+    builder = _get_builder(account_id)
+    signed_order = builder.create_market_order(order_args, CreateOrderOptions(tick_size=tick_size, neg_risk=neg_risk))
+    return signed_order.dict(), time.perf_counter() - start
+
+
+class SignedOrderPayload:
+    """进程池返回的已签名订单，提供与SignedOrder相同的dict()接口供post_order使用"""
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload = payload
+
+    def dict(self) -> Dict[str, Any]:
+        return self.payload
+
+
+class OrderSigningService:
+    """基于进程池的订单签名服务"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        初始化签名服务
+
+        Args:
+            max_workers: 签名进程数，如果为None则从环境变量读取（默认CPU核数）
+        """
+        self.max_workers = max_workers or int(os.getenv('SIGNING_PROCESSES', '0')) or (os.cpu_count() or 1)
+        self._accounts: Dict[str, Tuple[str, int, int, str]] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # 签名耗时统计
+        self._timings = deque(maxlen=1000)
+        self.signed_count = 0
+        self.failed_count = 0
+
+    def register(self, trader) -> str:
+        """
+        注册交易器账户
+
+        Args:
+            trader: PolymarketTrader实例
+
+        Returns:
+            账户ID（资金地址）
+        """
+        account_id = trader.funder
+        credentials = (trader.private_key, trader.chain_id, trader.signature_type, trader.funder)
+        with self._lock:
+            if self._accounts.get(account_id) != credentials:
+                self._accounts[account_id] = credentials
+                # 账户变化后重建进程池，让新进程拿到完整的账户列表
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+        return account_id
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(dict(self._accounts),)
+                )
+            return self._executor
+
+    def submit_market_order(self, account_id: str, order_args: MarketOrderArgs, tick_size: str, neg_risk: bool) -> Future:
+        """
+        异步提交签名任务，调用方可以在签名期间继续进行网络请求
+
+        Returns:
+            结果为 SignedOrderPayload 的Future
+        """
+        result = Future()
+        submitted_at = time.perf_counter()
+        inner = self._get_executor().submit(_sign_market_order, account_id, order_args, tick_size, neg_risk)
+
+        def _done(done_future: Future):
+            try:
+                payload, sign_seconds = done_future.result()
+            except Exception as e:
+                with self._lock:
+                    self.failed_count += 1
+                result.set_exception(e)
+                return
+            with self._lock:
+                self.signed_count += 1
+                self._timings.append((sign_seconds, time.perf_counter() - submitted_at))
+            result.set_result(SignedOrderPayload(payload))
+
+        inner.add_done_callback(_done)
+        return result
+
+    def sign_market_order(self, account_id: str, order_args: MarketOrderArgs, tick_size: str, neg_risk: bool) -> SignedOrderPayload:
+        """同步签名市价单"""
+        return self.submit_market_order(account_id, order_args, tick_size, neg_risk).result()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取签名耗时统计（签名耗时为进程内计算时间，总耗时含排队和进程间传输）"""
+        with self._lock:
+            timings = list(self._timings)
+            signed_count = self.signed_count
+            failed_count = self.failed_count
+
+        stats = {'processes': self.max_workers, 'signed': signed_count, 'failed': failed_count}
+        if timings:
+            sign_times = sorted(t[0] for t in timings)
+            total_times = sorted(t[1] for t in timings)
+            stats.update({
+                'sign_avg_ms': sum(sign_times) / len(sign_times) * 1000,
+                'sign_p95_ms': sign_times[min(len(sign_times) - 1, int(len(sign_times) * 0.95))] * 1000,
+                'total_avg_ms': sum(total_times) / len(total_times) * 1000,
+                'total_max_ms': total_times[-1] * 1000,
+            })
+        return stats
+
+    def print_stats(self):
+        """打印签名统计"""
+        stats = self.get_stats()
+        print(f"🔏 签名服务: {stats['processes']}个进程, 成功{stats['signed']}次, 失败{stats['failed']}次")
+        if 'sign_avg_ms' in stats:
+            print(f"   签名耗时: 平均{stats['sign_avg_ms']:.1f}ms, P95 {stats['sign_p95_ms']:.1f}ms; "
+                  f"含排队总耗时: 平均{stats['total_avg_ms']:.1f}ms, 最大{stats['total_max_ms']:.1f}ms")
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
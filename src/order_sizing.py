@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+订单规模计算 - 按实时订单簿卖单深度计算VWAP，限制下单金额使成交价不超出价格范围和滑点
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+@dataclass
+class SizingResult:
+    """订单规模计算结果"""
+    notional: float               # 可成交金额（USD）
+    shares: float                 # 可成交股数
+    vwap: Optional[float]         # 成交均价
+    worst_price: Optional[float]  # 最差成交档位价格（作为FOK市价单的限价）
+    price_cap: Optional[float]    # 允许的最高成交价
+    capped: bool                  # 是否因深度或价格限制而缩小了规模
+    reason: str = ''
+
+
+def size_order(asks: List[Tuple[float, float]], target_notional: float, max_price: float, slippage: float) -> SizingResult:
+    """
+    沿卖单档位累计成交，计算目标金额下的VWAP和可成交规模
+
+    只吃价格不超过 min(max_price, 最优卖价 * (1 + slippage)) 的档位，
+    因此成交均价和最差价都不会超出价格范围和滑点限制。
+
+    Args:
+        asks: 卖单档位 [(价格, 数量), ...]，按价格从低到高排列
+        target_notional: 目标下单金额（USD）
+        max_price: 最高可接受价格（MAX_PRICE_RANGE）
+        slippage: 相对最优卖价的滑点上限
+
+    Returns:
+        订单规模计算结果
+    """
+    if not asks:
+        return SizingResult(0.0, 0.0, None, None, None, True, '订单簿没有卖单')
+
+    best_ask = asks[0][0]
+    price_cap = min(max_price, best_ask * (1 + slippage))
+    if best_ask > price_cap:
+        return SizingResult(0.0, 0.0, None, None, price_cap, True, f'最优卖价{best_ask:.3f}高于最高价格{max_price}')
+
+    notional = 0.0
+    shares = 0.0
+    worst_price = None
+    for price, size in asks:
+        if price > price_cap + 1e-9:
+            break
+        remaining = target_notional - notional
+        if remaining <= 0:
+            break
+        level_notional = price * size
+        take_notional = min(level_notional, remaining)
+        notional += take_notional
+        shares += take_notional / price
+        worst_price = price
+
+    capped = notional + 1e-9 < target_notional
+    reason = f'价格{price_cap:.3f}以内深度只有{notional:.2f} USD' if capped else ''
+    return SizingResult(
+        notional=notional,
+        shares=shares,
+        vwap=notional / shares if shares else None,
+        worst_price=worst_price,
+        price_cap=price_cap,
+        capped=capped,
+        reason=reason
+    )
@@ -1,60 +1,319 @@
 from datetime import timedelta, datetime, timezone
-import requests
+from concurrent.futures import ThreadPoolExecutor
 import json
-from .polymarket_tokenid import get_all_midpoints, get_multiple_markets
+import os
+import queue
+import requests
+import time
+from .polymarket_tokenid import get_all_midpoints, get_multiple_markets, get_multiple_books
+from .circuit_breaker import get_breaker, UPSTREAM_GAMMA
+from .gamma_stream import iter_json_array
+from .market_record import MarketRecord
+from .recurring_series import RecurringSeriesTracker
+from .quote_cache import QuoteCache
+from .quote_result import QuoteResult, QuoteStatus
+from .rate_limiter import governor, GAMMA, PRIORITY_HIGH, PRIORITY_LOW
+from .hedged_request import hedger
+from .exchange_clock import clock
+from .endpoints import gamma_api_url
 from .balance_checker import BalanceChecker
-from typing import Optional, List
+from typing import Optional, List, Iterator
+
+
+class _PageDone:
+    """分页结束标记"""
+    __slots__ = ('offset', 'count', 'error')
+
+    def __init__(self, offset: int, count: int, error: Optional[Exception] = None):
+        self.offset = offset
+        self.count = count
+        self.error = error
 
 
 class PolymarketScanner:
-    def __init__(self, trader: Optional[object] = None):
-        self.base_url = "https://gamma-api.polymarket.com"
+    def __init__(self, trader: Optional[object] = None, quote_cache: Optional[QuoteCache] = None):
+        self.base_url = gamma_api_url()
         self.trader = trader  # 可选的交易器实例，用于显示余额
-        self.balance_checker = BalanceChecker()  # 初始化余额查询器
+        self.balance_checker = getattr(trader, 'balance_checker', None) or BalanceChecker()  # 有交易器时共享其余额查询器
+        self.quote_cache = quote_cache or QuoteCache()  # 报价缓存，可与交易器共享
+        
+        # Gamma分页配置
+        self.session = requests.Session()  # 复用HTTP连接
+        self.page_size = int(os.getenv('GAMMA_PAGE_SIZE', '100'))  # 每页事件数
+        self.fetch_concurrency = int(os.getenv('GAMMA_FETCH_CONCURRENCY', '4'))  # 并行请求页数
+        self.max_pages = int(os.getenv('GAMMA_MAX_PAGES', '50'))  # 单次查询最多翻页数
+        self.page_retries = int(os.getenv('GAMMA_PAGE_RETRIES', '3'))  # 单页失败后的重试次数
+        self.page_retry_backoff = float(os.getenv('GAMMA_PAGE_RETRY_BACKOFF', '0.5'))  # 首次重试前等待秒数，之后翻倍
+        self.stream_parse = os.getenv('GAMMA_STREAM_PARSE', 'true').lower() == 'true'  # 流式解析响应
+        self.stream_chunk_size = 16 * 1024
+        
+        # 预热阶段预加载的市场目录: (加载时间, 覆盖的最早结束时间, 覆盖的最晚结束时间, 市场列表)
+        self.catalog_max_age = float(os.getenv('CATALOG_MAX_AGE', '300'))
+        self._catalog: Optional[tuple] = None
         
+        # 周期市场（RECURRING_SERIES）：按ticker推算各期，按slug定向查询，不再全量发现
+        self.series = RecurringSeriesTracker(self)
+        
+    def _iter_events(self, params: dict) -> Iterator[MarketRecord]:
+        """请求 /events 并逐个产出解析好的市场记录"""
+        url = f"{self.base_url}/events"
+        breaker = get_breaker(UPSTREAM_GAMMA)
+        if not breaker.allow_request():
+            raise RuntimeError("Gamma接口熔断中")
+        try:
+            # 建立连接并拿到响应头的阶段可以对冲，未被采用的响应会被关闭
+            sent_at = clock.local_time()
+            response = hedger.call(
+                GAMMA,
+                lambda: self.session.get(url, params=params, timeout=10, stream=self.stream_parse),
+                key='events',
+                discard=lambda unused: unused.close()
+            )
+            with response:
+                clock.observe_headers(response.headers, sent_at, clock.local_time())
+                governor.on_response(GAMMA, response.status_code, response.headers)
+                response.raise_for_status()
+                breaker.record_success()
+                if self.stream_parse:
+                    # 流式模式：事件在响应体下载完成前就能交给下游过滤
+                    events = iter_json_array(response.iter_content(chunk_size=self.stream_chunk_size))
+                else:
+                    events = response.json()
+                
+                for event in events:
+                    record = MarketRecord.from_event(event)
+                    if record is not None:
+                        yield record
+        except requests.HTTPError as e:
+            status_code = e.response.status_code if e.response is not None else 0
+            if status_code >= 500 or status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+    
     def fetch_markets(self, limit=500):
         """获取所有活跃市场数据"""
         # 根据官方文档，使用events端点获取所有活跃市场，按ID排序获取最新的
-        url = f"{self.base_url}/events?order=id&ascending=false&closed=false&limit={limit}"
-        response = requests.get(url)
-        data = response.json()
+        data = self._iter_events({'order': 'id', 'ascending': 'false', 'closed': 'false', 'limit': limit})
 
         # 同时获取体育赛事，因为体育赛事通常有更短的结束时间
-        sports_url = f"{self.base_url}/events?closed=false&limit=200"
-        sports_response = requests.get(sports_url)
-        sports_data = sports_response.json()
+        sports_data = self._iter_events({'closed': 'false', 'limit': 200})
 
         # 合并数据并去重
-        all_markets = data + sports_data
+        all_markets = list(data) + list(sports_data)
         unique_markets = []
         seen_ids = set()
         for market in all_markets:
-            if market['id'] not in seen_ids:
+            if market.id not in seen_ids:
                 unique_markets.append(market)
-                seen_ids.add(market['id'])
+                seen_ids.add(market.id)
 
         return unique_markets
 
+    def _stream_events_page(self, params: dict, offset: int, results: queue.Queue, delay: float = 0.0):
+        """在工作线程中流式获取单页事件，逐个放入结果队列（delay为重试前的等待秒数）"""
+        if delay > 0:
+            time.sleep(delay)
+        count = 0
+        try:
+            for event in self._iter_events(dict(params, limit=self.page_size, offset=offset)):
+                results.put(event)
+                count += 1
+            results.put(_PageDone(offset, count))
+        except Exception as e:
+            results.put(_PageDone(offset, count, e))
+
+    def iter_markets_by_end_date(self, end_date_min: datetime, end_date_max: datetime) -> Iterator[MarketRecord]:
+        """
+        按结束时间范围获取市场（服务端过滤 + 并行分页 + 流式产出）
+        
+        Args:
+            end_date_min: 最早结束时间（UTC）
+            end_date_max: 最晚结束时间（UTC）
+            
+        Yields:
+            结束时间在范围内的未关闭事件（已去重），按到达顺序产出
+            
+        Raises:
+            RuntimeError: 某一页重试 page_retries 次后仍然失败（结果不完整，不能当作已到末尾）
+        """
+        params = {
+            'closed': 'false',
+            'end_date_min': end_date_min.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'end_date_max': end_date_max.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'order': 'endDate',
+            'ascending': 'true',
+        }
+        
+        seen_ids = set()
+        results = queue.Queue()
+        next_page = 0
+        attempts = {}  # 偏移 -> 已失败次数
+        
+        # 每轮并行请求 fetch_concurrency 页，任意一页不满即说明已到末尾
+        with ThreadPoolExecutor(max_workers=self.fetch_concurrency) as executor:
+            while next_page < self.max_pages:
+                pages = range(next_page, min(next_page + self.fetch_concurrency, self.max_pages))
+                for page in pages:
+                    executor.submit(self._stream_events_page, params, page * self.page_size, results)
+                next_page = pages.stop
+                
+                pending = len(pages)
+                exhausted = False
+                while pending:
+                    item = results.get()
+                    if isinstance(item, _PageDone):
+                        pending -= 1
+                        if item.error is not None:
+                            # 失败的页按指数退避重试同一偏移，已产出的事件由去重跳过
+                            failures = attempts[item.offset] = attempts.get(item.offset, 0) + 1
+                            if failures > self.page_retries:
+                                raise RuntimeError(f"Gamma分页 offset={item.offset} 重试{self.page_retries}次后仍失败，"
+                                                   f"市场列表不完整: {item.error}")
+                            delay = self.page_retry_backoff * 2 ** (failures - 1)
+                            print(f"⚠️ 获取Gamma分页失败 (offset={item.offset})，{delay:.1f}秒后重试: {item.error}")
+                            executor.submit(self._stream_events_page, params, item.offset, results, delay)
+                            pending += 1
+                        elif item.count < self.page_size:
+                            exhausted = True
+                        continue
+                    
+                    if item.id not in seen_ids:
+                        seen_ids.add(item.id)
+                        yield item
+                
+                if exhausted:
+                    break
+            else:
+                print(f"⚠️ 已达到最大翻页数 {self.max_pages}，结果可能不完整")
+
+    def fetch_markets_by_end_date(self, end_date_min: datetime, end_date_max: datetime) -> List[MarketRecord]:
+        """按结束时间范围获取市场列表"""
+        return list(self.iter_markets_by_end_date(end_date_min, end_date_max))
+
+    def fetch_events_by_slug(self, slug: str) -> List[MarketRecord]:
+        """按slug定向查询事件"""
+        return list(self._iter_events({'slug': slug}))
+
+    def fetch_winning_token(self, market_id: str, ticker: str) -> Optional[str]:
+        """
+        查询市场结算结果
+        
+        Args:
+            market_id: 事件ID
+            ticker: 事件slug
+        
+        Returns:
+            胜出的token ID，市场尚未结算时返回None
+        """
+        governor.acquire(GAMMA, PRIORITY_LOW)
+        response = self.session.get(f"{self.base_url}/events", params={'slug': ticker}, timeout=10)
+        governor.on_response(GAMMA, response.status_code, response.headers)
+        response.raise_for_status()
+        for event in response.json():
+            if str(event.get('id')) != market_id:
+                continue
+            for event_market in event.get('markets') or []:
+                if not event_market.get('closed') or not event_market.get('outcomePrices'):
+                    continue
+                # outcomePrices 与 clobTokenIds 顺序一致，结算后胜出一方为1
+                prices = [float(price) for price in json.loads(event_market['outcomePrices'])]
+                token_ids = json.loads(event_market['clobTokenIds'])
+                if max(prices) >= 0.99:
+                    return token_ids[prices.index(max(prices))]
+        return None
+
+    def fetch_markets_ending_within(self, start_minutes: float, end_minutes: float) -> Iterator[MarketRecord]:
+        """
+        流式获取在 start_minutes - end_minutes 分钟内结束的市场
+        
+        配置了周期市场时只返回推算出的各期；预加载的目录覆盖该范围时不请求Gamma
+        """
+        now_utc = clock.now_datetime()
+        end_date_min = now_utc + timedelta(minutes=start_minutes)
+        end_date_max = now_utc + timedelta(minutes=end_minutes)
+        
+        if self.series.enabled:
+            return iter(self.series.markets_ending_between(end_date_min.timestamp(), end_date_max.timestamp()))
+        
+        catalog = self._catalog
+        if catalog is not None:
+            loaded_at, covered_min, covered_max, markets = catalog
+            if (time.monotonic() - loaded_at <= self.catalog_max_age and
+                    covered_min <= end_date_min.timestamp() and end_date_max.timestamp() <= covered_max):
+                return iter([
+                    market for market in markets
+                    if end_date_min.timestamp() <= market.end_ts <= end_date_max.timestamp()
+                ])
+        
+        return self.iter_markets_by_end_date(end_date_min, end_date_max)
+
+    def preload_catalog(self, start_minutes: float, end_minutes: float) -> int:
+        """
+        预加载在 start_minutes - end_minutes 分钟内结束的市场，供随后的入场扫描直接使用
+        
+        Returns:
+            预加载的市场数量
+        """
+        now_utc = clock.now_datetime()
+        end_date_min = now_utc + timedelta(minutes=start_minutes)
+        end_date_max = now_utc + timedelta(minutes=end_minutes)
+        if self.series.enabled:
+            # 周期市场只需提前解析各期的token ID
+            return self.series.prefetch(end_date_min.timestamp(), end_date_max.timestamp())
+        markets = self.fetch_markets_by_end_date(end_date_min, end_date_max)
+        self._catalog = (time.monotonic(), end_date_min.timestamp(), end_date_max.timestamp(), markets)
+        return len(markets)
+
+    def clear_catalog(self):
+        """丢弃预加载的市场目录"""
+        self._catalog = None
+
     def get_markets_with_time(self, markets):
         """获取带有时间信息的市场列表"""
         markets_with_time = []
-        current_time_utc = datetime.now(timezone.utc)
+        current_ts = clock.now()  # 以交易所时间计算剩余时间
         
         for market in markets:
-            try:
-                # 使用UTC时间进行比较
-                end_time_utc = datetime.fromisoformat(market['endDate'].replace('Z', '+00:00'))
-                
-                if end_time_utc > current_time_utc:  # 只考虑未来的market
-                    time_diff = end_time_utc - current_time_utc
-                    markets_with_time.append((market, time_diff))
-            except Exception as e:
-                continue
+            # end_ts 在入口处已解析为UTC epoch秒
+            seconds_remaining = market.end_ts - current_ts
+            if seconds_remaining > 0:  # 只考虑未来的market
+                markets_with_time.append((market, timedelta(seconds=seconds_remaining)))
                 
         # 按时间差排序
         markets_with_time.sort(key=lambda x: x[1])
         return markets_with_time
 
+    def find_target_markets(self, max_hours: Optional[float] = 1.0, start_minutes: Optional[int] = None,
+                            end_minutes: Optional[int] = None) -> List[tuple]:
+        """
+        按扫描范围选出待分析的市场（只查询市场目录，不获取报价）
+        
+        Args:
+            max_hours: 扫描的最大时间范围，None表示扫描所有市场
+            start_minutes: 开始扫描时间（分钟）
+            end_minutes: 结束扫描时间（分钟）
+            
+        Returns:
+            [(市场, 剩余时间), ...]
+        """
+        if start_minutes is not None and end_minutes is not None:
+            print(f"扫描 {start_minutes}-{end_minutes} 分钟内结束的市场机会...")
+            # 使用新的时间范围扫描
+            return self.scan_near_end_markets(start_minutes, end_minutes)
+        if max_hours is None:
+            print("扫描所有未结束的市场机会...")
+            # 获取所有市场
+            return self.get_markets_with_time(self.fetch_markets())
+        print(f"扫描 {max_hours} 小时内的市场机会...")
+        # 获取短期市场
+        markets_with_time = self.get_markets_with_time(self.fetch_markets_ending_within(0, max_hours * 60))
+        return self.get_short_term_markets(markets_with_time, max_hours)
+
     def format_time_difference(self, time_diff):
         """格式化时间差为可读格式"""
         total_seconds = time_diff.total_seconds()
@@ -76,86 +335,124 @@ class PolymarketScanner:
                 short_term_markets.append((market, time_diff))
         return short_term_markets
 
-    def get_market_data(self, market):
-        """获取市场交易数据"""
-        if 'markets' in market and market['markets']:
-            try:
-                tokenids = json.loads(market['markets'][0]['clobTokenIds'])
-                no_token_id = tokenids[0]
-                yes_token_id = tokenids[1]
-                yes_mid, no_mid, yes_price, no_price, yes_book, no_book, yes_books, no_books = get_all_midpoints(yes_token_id, no_token_id)
-                # 计算网站显示的价格 (1 - API价格)
-                yes_price_display = 1.0 - float(yes_price['price'])
-                no_price_display = 1.0 - float(no_price['price'])
-                
-                return {
-                    'yes': {
-                        'mid': yes_mid['mid'],
-                        'price': yes_price_display,
-                        'book': yes_book,
-                        'books': yes_books
-                    },
-                    'no': {
-                        'mid': no_mid['mid'],
-                        'price': no_price_display,
-                        'book': no_book,
-                        'books': no_books
-                    }
-                }
-            except Exception as e:
-                return None
-        return None
+    @staticmethod
+    def _build_market_data(yes_quote: dict, no_quote: dict, status: QuoteStatus = QuoteStatus.OK, quote_age: float = 0.0) -> dict:
+        """组合YES/NO报价为市场数据"""
+        # 计算网站显示的价格 (1 - API价格)
+        return {
+            'yes': {
+                'mid': yes_quote['mid'],
+                'price': 1.0 - float(yes_quote['price']),
+                'book': yes_quote['book'],
+                'asks': yes_quote['asks'],
+                'books': yes_quote['books']
+            },
+            'no': {
+                'mid': no_quote['mid'],
+                'price': 1.0 - float(no_quote['price']),
+                'book': no_quote['book'],
+                'asks': no_quote['asks'],
+                'books': no_quote['books']
+            },
+            'status': status,          # OK 或 STALE（上游故障时使用的缓存报价）
+            'quote_age': quote_age     # 最旧一侧报价的时间（秒）
+        }
 
-    def get_multiple_markets_data(self, markets):
-        """批量获取多个市场的交易数据"""
-        market_tokens = []
-        valid_markets = []
+    def _combine_results(self, yes_result: QuoteResult, no_result: QuoteResult, allow_stale: bool = True) -> Optional[dict]:
+        """缓存实时报价，并把YES/NO结果组合为市场数据；任一侧不可用时返回None"""
+        for result in (yes_result, no_result):
+            if result.ok:
+                self.quote_cache.put(result.token_id, result.quote)
         
-        for market in markets:
-            if 'markets' in market and market['markets']:
-                try:
-                    tokenids = json.loads(market['markets'][0]['clobTokenIds'])
-                    no_token_id = tokenids[0]
-                    yes_token_id = tokenids[1]
-                    market_tokens.append((yes_token_id, no_token_id))
-                    valid_markets.append(market)
-                except Exception as e:
-                    continue
+        if not (yes_result.usable and no_result.usable):
+            return None
+        if yes_result.ok and no_result.ok:
+            return self._build_market_data(yes_result.quote, no_result.quote)
+        if not allow_stale:
+            return None
+        return self._build_market_data(yes_result.quote, no_result.quote, QuoteStatus.STALE, max(yes_result.age, no_result.age))
+
+    def get_market_data(self, market: MarketRecord, max_age: Optional[float] = None, allow_stale: bool = True):
+        """
+        获取市场交易数据（优先使用缓存）
+        
+        Args:
+            market: 市场记录
+            max_age: 可接受的最大报价时间（秒），如果为None则使用缓存默认值
+            allow_stale: 上游故障时是否接受过期的缓存报价（交易决策应设为False）
+            
+        Returns:
+            市场数据，无法获取可用报价时返回None
+        """
+        if not market.has_tokens:
+            return None
+        yes_quote = self.quote_cache.get(market.yes_token_id, max_age)
+        no_quote = self.quote_cache.get(market.no_token_id, max_age)
+        if yes_quote is not None and no_quote is not None:
+            return self._build_market_data(yes_quote, no_quote)
         
-        if not market_tokens:
+        yes_result, no_result = get_all_midpoints(market.yes_token_id, market.no_token_id, self.quote_cache)
+        return self._combine_results(yes_result, no_result, allow_stale)
+
+    def get_multiple_markets_data(self, markets, max_age: Optional[float] = None, allow_stale: bool = True,
+                                  priority: int = PRIORITY_LOW):
+        """
+        批量获取多个市场的交易数据（只请求缓存中没有的市场，无法获取报价的市场不返回）
+        
+        Args:
+            markets: 市场记录列表
+            max_age: 可接受的最大报价时间（秒），如果为None则使用缓存默认值
+            allow_stale: 上游故障时是否接受过期的缓存报价（交易决策应设为False）
+            priority: 请求优先级（交易决策使用 PRIORITY_HIGH）
+        """
+        valid_markets = [market for market in markets if market.has_tokens]
+        if not valid_markets:
             return []
         
-        # 批量获取数据
-        results = get_multiple_markets(market_tokens)
+        # 先从缓存取，缺失的再批量获取
+        market_data = {}
+        missing_markets = []
+        for market in valid_markets:
+            yes_quote = self.quote_cache.get(market.yes_token_id, max_age)
+            no_quote = self.quote_cache.get(market.no_token_id, max_age)
+            if yes_quote is None or no_quote is None:
+                missing_markets.append(market)
+            else:
+                market_data[market.id] = self._build_market_data(yes_quote, no_quote)
+        
+        if missing_markets:
+            results = get_multiple_markets([(market.yes_token_id, market.no_token_id) for market in missing_markets],
+                                           priority=priority, quote_cache=self.quote_cache)
+            for market, (yes_result, no_result) in zip(missing_markets, results):
+                market_data[market.id] = self._combine_results(yes_result, no_result, allow_stale)
         
         # 组合结果
-        market_data_list = []
-        for i, (market, result) in enumerate(zip(valid_markets, results)):
-            yes_mid, no_mid, yes_price, no_price, yes_book, no_book, yes_books, no_books = result
-            
-            # 计算网站显示的价格 (1 - API价格)
-            yes_price_display = 1.0 - float(yes_price['price'])
-            no_price_display = 1.0 - float(no_price['price'])
-            
-            market_data = {
-                'market': market,
-                'data': {
-                    'yes': {
-                        'mid': yes_mid['mid'],
-                        'price': yes_price_display,
-                        'book': yes_book,
-                        'books': yes_books
-                    },
-                    'no': {
-                        'mid': no_mid['mid'],
-                        'price': no_price_display,
-                        'book': no_book,
-                        'books': no_books
-                    }
-                }
-            }
-            market_data_list.append(market_data)
+        return [
+            {'market': market, 'data': market_data[market.id]}
+            for market in valid_markets
+            if market_data[market.id] is not None
+        ]
+
+    def get_books_data(self, markets, allow_stale: bool = False, priority: int = PRIORITY_HIGH):
+        """
+        只请求订单簿获取多个市场的实时交易数据（不读缓存，结果写入缓存），
+        同一市场的YES/NO合并为一次 /books 请求；返回格式同 get_multiple_markets_data
         
+        Args:
+            markets: 市场记录列表
+            allow_stale: 上游故障时是否接受过期的缓存报价
+            priority: 请求优先级
+        """
+        valid_markets = [market for market in markets if market.has_tokens]
+        if not valid_markets:
+            return []
+        results = get_multiple_books([(market.yes_token_id, market.no_token_id) for market in valid_markets],
+                                     priority=priority, quote_cache=self.quote_cache)
+        market_data_list = []
+        for market, (yes_result, no_result) in zip(valid_markets, results):
+            data = self._combine_results(yes_result, no_result, allow_stale)
+            if data is not None:
+                market_data_list.append({'market': market, 'data': data})
         return market_data_list
 
     def scan_short_term_markets(self, max_hours=1, show_top_n=20):
@@ -163,21 +460,19 @@ class PolymarketScanner:
         print(f"当前时间: {datetime.now().isoformat()}")
         print(f"{max_hours}小时后: {(datetime.now() + timedelta(hours=max_hours)).isoformat()}")
         
-        # 获取市场数据
-        markets = self.fetch_markets()
-        print(f"总共有 {len(markets)} 个market")
-        
-
+        # 获取市场数据（只请求max_hours内结束的事件）
+        markets = self.fetch_markets_ending_within(0, max_hours * 60)
         
-        # 获取带时间信息的市场
+        # 获取带时间信息的市场（边接收边过滤）
         markets_with_time = self.get_markets_with_time(markets)
+        print(f"总共有 {len(markets_with_time)} 个market")
 
         # 显示前N个最近结束的市场
         print(f"\n前{show_top_n}个最近结束的market:")
         for i, (market, time_diff) in enumerate(markets_with_time[:show_top_n]):
             time_str = self.format_time_difference(time_diff)
-            print(f"{i+1}. {market['ticker']} - {market['title']}")
-            print(f"   结束时间: {market['endDate']} (还有 {time_str})")
+            print(f"{i+1}. {market.ticker} - {market.title}")
+            print(f"   结束时间: {market.end_date} (还有 {time_str})")
         
         # 查找短期市场
         print(f"\n查找{max_hours}小时内结束的market:")
@@ -192,17 +487,18 @@ class PolymarketScanner:
             market_data_list = self.get_multiple_markets_data(markets_list)
             
             # 创建市场数据映射
-            market_data_map = {data['market']['ticker']: data['data'] for data in market_data_list}
+            market_data_map = {data['market'].ticker: data['data'] for data in market_data_list}
             
             for market, time_diff in short_term_markets:
                 time_str = self.format_time_difference(time_diff)
-                print(f"找到{max_hours}小时内结束的market: {market['ticker']} - {market['title']}")
-                print(f"结束时间: {market['endDate']} (还有 {time_str})")
+                print(f"找到{max_hours}小时内结束的market: {market.ticker} - {market.title}")
+                print(f"结束时间: {market.end_date} (还有 {time_str})")
                 
                 # 从批量获取的数据中获取市场数据
-                market_data = market_data_map.get(market['ticker'])
+                market_data = market_data_map.get(market.ticker)
                 if market_data:
-                    
+                    if market_data['status'] is QuoteStatus.STALE:
+                        print(f"⚠️ 行情接口异常，使用 {market_data['quote_age']:.0f} 秒前的缓存报价")
                     print(f"yes : mid:{market_data['yes']['mid']} {market_data['yes']['price']} {market_data['yes']['book']} {market_data['yes']['books']}")
                     print(f"no : mid:{market_data['no']['mid']} {market_data['no']['price']} {market_data['no']['book']} {market_data['no']['books']}")
                 else:
@@ -238,10 +534,6 @@ class PolymarketScanner:
         print(f"=== 扫描{start_minutes}-{end_minutes}分钟内结束的市场 ===")
         print(f"策略: 在交易结束前4分钟开始分析")
         
-        # 获取所有市场
-        markets = self.fetch_markets()
-        markets_with_time = self.get_markets_with_time(markets)
-        
         # 筛选在指定时间范围内结束的市场
         near_end_markets = []
         
@@ -256,6 +548,10 @@ class PolymarketScanner:
             actual_start = start_minutes
             actual_end = end_minutes
         
+        # 只向Gamma请求时间窗口内结束的市场
+        markets = self.fetch_markets_ending_within(actual_start, actual_end)
+        markets_with_time = self.get_markets_with_time(markets)
+        
         for market, time_diff in markets_with_time:
             minutes_remaining = time_diff.total_seconds() / 60
             if actual_start <= minutes_remaining <= actual_end:
@@ -268,8 +564,8 @@ class PolymarketScanner:
             print(f"\n找到 {len(near_end_markets)} 个在{start_minutes}-{end_minutes}分钟内结束的市场:")
         for i, (market, time_diff) in enumerate(near_end_markets[:show_top_n], 1):
             time_str = self.format_time_difference(time_diff)
-            print(f"{i:2d}. {market['ticker']} - {market['title']}")
-            print(f"   结束时间: {market['endDate']} (还有 {time_str})")
+            print(f"{i:2d}. {market.ticker} - {market.title}")
+            print(f"   结束时间: {market.end_date} (还有 {time_str})")
         
         # 显示账户余额信息
         if self.trader and hasattr(self.trader, 'funder'):
@@ -299,8 +595,8 @@ class PolymarketScanner:
         print(f"\n前{show_top_n}个最近结束的market:")
         for i, (market, time_diff) in enumerate(markets_with_time[:show_top_n], 1):
             time_str = self.format_time_difference(time_diff)
-            print(f"{i:2d}. {market['ticker']} - {market['title']}")
-            print(f"   结束时间: {market['endDate']} (还有 {time_str})")
+            print(f"{i:2d}. {market.ticker} - {market.title}")
+            print(f"   结束时间: {market.end_date} (还有 {time_str})")
 
         # 显示账户余额信息
         if self.trader and hasattr(self.trader, 'funder'):
@@ -1,21 +1,90 @@
 import asyncio
 import aiohttp
-from typing import Dict, Any, Tuple, List
+import os
+import requests
+from typing import Dict, Any, Optional, Tuple, List
 import json
+from concurrent.futures import ThreadPoolExecutor
 from py_clob_client.client import ClobClient
 from py_clob_client.clob_types import BookParams
+from py_clob_client.exceptions import PolyApiException
+from .circuit_breaker import get_breaker, UPSTREAM_CLOB
+from .endpoints import clob_api_url
+from .quote_cache import QuoteCache
+from .hedged_request import hedger
+from .quote_result import QuoteResult, QuoteStatus
+from .rate_limiter import governor, CLOB_READ, PRIORITY_HIGH, PRIORITY_LOW
+
+
+class ClobReadError(Exception):
+    """CLOB读取接口返回非200状态码"""
+    
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def make_quote(mid: Dict[str, Any], price: Dict[str, Any], book: Dict[str, Any], books: int) -> Dict[str, Any]:
+    """将单个token的API返回值整理为报价（QuoteCache中的条目格式）"""
+    return {'mid': mid['mid'], 'price': price['price'], 'book': book['market'], 'asks': book['asks'], 'books': books}
+
+
+def _book_field(book: Any, name: str) -> Any:
+    return book.get(name) if isinstance(book, dict) else getattr(book, name, None)
+
+
+def _book_levels(book: Any, side: str) -> List[Tuple[float, float]]:
+    """订单簿某一侧的档位，按价格从低到高排序"""
+    levels = []
+    for level in _book_field(book, side) or []:
+        price = level.get('price') if isinstance(level, dict) else level.price
+        size = level.get('size') if isinstance(level, dict) else level.size
+        levels.append((float(price), float(size)))
+    levels.sort()
+    return levels
+
+
+def summarize_book(book: Any) -> Dict[str, Any]:
+    """
+    整理订单簿：保留市场ID和按价格从低到高排序的卖单档位
+    
+    Args:
+        book: OrderBookSummary对象或 /book 接口返回的JSON
+        
+    Returns:
+        {'market': 市场ID, 'asks': [(价格, 数量), ...]}
+    """
+    return {'market': _book_field(book, 'market'), 'asks': _book_levels(book, 'asks')}
+
+
+def book_quote(book: Any) -> Dict[str, Any]:
+    """
+    只用订单簿推出报价（格式同 make_quote），省掉 /midpoint 和 /price 请求
+    
+    中间价取买一和卖一的均值（单边时取该侧价格），BUY价格取买一，与 /midpoint、/price 的返回一致
+    """
+    bids = _book_levels(book, 'bids')
+    asks = _book_levels(book, 'asks')
+    best_bid = bids[-1][0] if bids else None
+    best_ask = asks[0][0] if asks else None
+    if best_bid is not None and best_ask is not None:
+        mid = (best_bid + best_ask) / 2
+    else:
+        mid = best_bid if best_bid is not None else (best_ask if best_ask is not None else 0.0)
+    return {'mid': str(round(mid, 4)), 'price': str(best_bid or 0.0), 'book': _book_field(book, 'market'), 'asks': asks, 'books': 1}
 
 
 class AsyncPolymarketClient:
     """异步Polymarket客户端"""
     
-    def __init__(self, base_url: str = "https://clob.polymarket.com"):
-        self.base_url = base_url
+    def __init__(self, base_url: Optional[str] = None, priority: int = PRIORITY_HIGH):
+        self.base_url = base_url or clob_api_url()
+        self.priority = priority  # 限流优先级
         self.session = None
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
-        self.session = aiohttp.ClientSession()
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -23,53 +92,155 @@ class AsyncPolymarketClient:
         if self.session:
             await self.session.close()
     
+    async def _get(self, path: str, params: Dict[str, Any], name: str) -> Any:
+        """限流后发送GET请求（慢请求会被对冲）"""
+        async def attempt():
+            async with self.session.get(f"{self.base_url}{path}", params=params) as response:
+                governor.on_response(CLOB_READ, response.status, response.headers)
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    raise ClobReadError(f"Failed to get {name}: {response.status}", response.status)
+        
+        return await hedger.call_async(CLOB_READ, attempt, self.priority, key=path)
+    
     async def get_midpoint(self, token_id: str) -> Dict[str, Any]:
         """异步获取中间价"""
-        url = f"{self.base_url}/midpoint"
-        params = {"token_id": token_id}
-        
-        async with self.session.get(url, params=params) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                raise Exception(f"Failed to get midpoint: {response.status}")
+        return await self._get("/midpoint", {"token_id": token_id}, "midpoint")
     
     async def get_price(self, token_id: str, side: str = "BUY") -> Dict[str, Any]:
         """异步获取价格"""
-        url = f"{self.base_url}/price"
-        params = {"token_id": token_id, "side": side}
-        
-        async with self.session.get(url, params=params) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                raise Exception(f"Failed to get price: {response.status}")
+        return await self._get("/price", {"token_id": token_id, "side": side}, "price")
     
     async def get_order_book(self, token_id: str) -> Dict[str, Any]:
         """异步获取订单簿"""
-        url = f"{self.base_url}/book"
-        params = {"token_id": token_id}
-        
-        async with self.session.get(url, params=params) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                raise Exception(f"Failed to get order book: {response.status}")
+        return await self._get("/book", {"token_id": token_id}, "order book")
     
     async def get_order_books(self, token_ids: List[str]) -> List[Dict[str, Any]]:
         """异步批量获取订单簿"""
-        url = f"{self.base_url}/books"
-        params = {"token_ids": ",".join(token_ids)}
+        return await self._get("/books", {"token_ids": ",".join(token_ids)}, "order books")
+
+
+def clob_read(func, *args, priority: int = PRIORITY_HIGH, **kwargs):
+    """
+    限流后调用同步CLOB客户端的读取接口，遇到429时通知限流器
+    
+    超过该接口P95延迟仍未返回时会发出对冲请求，因此只能用于幂等读取，下单不要走这里
+    """
+    def attempt():
+        try:
+            return func(*args, **kwargs)
+        except PolyApiException as e:
+            governor.on_response(CLOB_READ, e.status_code or 0)
+            raise
+    
+    return hedger.call(CLOB_READ, attempt, priority, key=getattr(func, '__name__', None))
+
+
+def get_token_data(client: ClobClient, token_id: str, priority: int = PRIORITY_HIGH) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any], int]:
+    """同步获取单个token的中间价、价格、订单簿和订单簿数量"""
+    mid = clob_read(client.get_midpoint, token_id, priority=priority)
+    price = clob_read(client.get_price, token_id, side="BUY", priority=priority)
+    book = clob_read(client.get_order_book, token_id, priority=priority)
+    books = clob_read(client.get_order_books, [BookParams(token_id=token_id)], priority=priority)
+    return mid, price, summarize_book(book), len(books)
+
+
+def fetch_book_quotes(client: ClobClient, token_ids: List[str], priority: int = PRIORITY_HIGH,
+                      quote_cache: Optional[QuoteCache] = None) -> List[QuoteResult]:
+    """
+    用一次 /books 请求获取多个token的订单簿并推出报价，CLOB熔断时不发请求，直接回退到缓存
+    
+    Args:
+        client: 同步CLOB客户端
+        token_ids: Token ID列表
+        priority: 限流优先级
+        quote_cache: 用于失败回退的报价缓存
         
-        async with self.session.get(url, params=params) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                raise Exception(f"Failed to get order books: {response.status}")
+    Returns:
+        与 token_ids 顺序一致的报价结果，没有订单簿的token返回失败结果
+    """
+    if not get_breaker(UPSTREAM_CLOB).allow_request():
+        return [_fallback_result(token_id, QuoteStatus.ERROR, 'CLOB接口熔断中', quote_cache) for token_id in token_ids]
+    try:
+        books = clob_read(client.get_order_books, [BookParams(token_id=token_id) for token_id in token_ids],
+                          priority=priority)
+    except Exception as e:
+        _record_result(e)
+        print(f"Error getting order books for {len(token_ids)} tokens: {e}")
+        return [_fallback_result(token_id, _failure_status(e), str(e), quote_cache) for token_id in token_ids]
+    _record_result(None)
+    
+    by_token = {str(_book_field(book, 'asset_id')): book for book in books or []}
+    results = []
+    for token_id in token_ids:
+        book = by_token.get(str(token_id))
+        if book is None:
+            results.append(_fallback_result(token_id, QuoteStatus.ERROR, '没有订单簿', quote_cache))
+        else:
+            results.append(QuoteResult(token_id, QuoteStatus.OK, book_quote(book)))
+    return results
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """超时、连接错误、5xx和429计入熔断；其他4xx（如token没有订单簿）说明上游可用"""
+    status_code = getattr(error, 'status_code', None)
+    return not (status_code and 400 <= status_code < 500 and status_code != 429)
+
+
+def _failure_status(error: Exception) -> QuoteStatus:
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, requests.Timeout)):
+        return QuoteStatus.TIMEOUT
+    return QuoteStatus.ERROR
+
 
+def _record_result(error: Optional[Exception]):
+    breaker = get_breaker(UPSTREAM_CLOB)
+    if error is None or not _is_upstream_failure(error):
+        breaker.record_success()
+    else:
+        breaker.record_failure()
 
-async def get_midpoint_async(client: AsyncPolymarketClient, token_id: str) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any], int]:
+
+def _fallback_result(token_id: str, status: QuoteStatus, error: str, quote_cache: Optional[QuoteCache]) -> QuoteResult:
+    """获取失败时回退到过期时间内的缓存报价，没有缓存则返回失败结果"""
+    if quote_cache is not None:
+        cached = quote_cache.get_stale(token_id, float(os.getenv('QUOTE_STALE_MAX_AGE', '30')))
+        if cached is not None:
+            quote, age = cached
+            return QuoteResult(token_id, QuoteStatus.STALE, quote, age, error)
+    return QuoteResult(token_id, status, error=error)
+
+
+def fetch_token_quote(client: ClobClient, token_id: str, priority: int = PRIORITY_HIGH, quote_cache: Optional[QuoteCache] = None) -> QuoteResult:
+    """
+    同步获取单个token的报价，CLOB熔断时不发请求，直接回退到缓存
+    
+    Args:
+        client: 同步CLOB客户端
+        token_id: Token ID
+        priority: 限流优先级
+        quote_cache: 用于失败回退的报价缓存
+        
+    Returns:
+        报价结果
+    """
+    if not get_breaker(UPSTREAM_CLOB).allow_request():
+        return _fallback_result(token_id, QuoteStatus.ERROR, 'CLOB接口熔断中', quote_cache)
+    try:
+        quote = make_quote(*get_token_data(client, token_id, priority))
+    except Exception as e:
+        _record_result(e)
+        print(f"Error getting data for token {token_id}: {e}")
+        return _fallback_result(token_id, _failure_status(e), str(e), quote_cache)
+    _record_result(None)
+    return QuoteResult(token_id, QuoteStatus.OK, quote)
+
+
+async def get_midpoint_async(client: AsyncPolymarketClient, token_id: str, quote_cache: Optional[QuoteCache] = None) -> QuoteResult:
     """异步获取单个token的所有数据"""
+    if not get_breaker(UPSTREAM_CLOB).allow_request():
+        return _fallback_result(token_id, QuoteStatus.ERROR, 'CLOB接口熔断中', quote_cache)
     try:
         # 并行获取所有数据
         mid_task = client.get_midpoint(token_id)
@@ -81,126 +252,104 @@ async def get_midpoint_async(client: AsyncPolymarketClient, token_id: str) -> Tu
         
         # 获取订单簿数量
         books = await client.get_order_books([token_id])
-        
-        return mid, price, book, len(books)
     except Exception as e:
         print(f"Async API failed for token {token_id}: {e}")
-        # 回退到同步客户端
-        try:
-            sync_client = ClobClient("https://clob.polymarket.com")
-            mid = sync_client.get_midpoint(token_id)
-            price = sync_client.get_price(token_id, side="BUY")
-            book = sync_client.get_order_book(token_id)
-            books = sync_client.get_order_books([BookParams(token_id=token_id)])
-            return mid, price, book.market, len(books)
-        except Exception as sync_e:
-            print(f"Sync fallback also failed for token {token_id}: {sync_e}")
-            # 返回默认值
-            return {"mid": "0"}, {"price": "0"}, {"market": "0"}, 0
-
-
-async def get_all_midpoints_async(yes_token_id: str, no_token_id: str) -> Tuple:
-    """异步获取yes和no token的所有数据"""
-    async with AsyncPolymarketClient() as client:
-        # 并行获取yes和no token的数据
-        yes_task = get_midpoint_async(client, yes_token_id)
-        no_task = get_midpoint_async(client, no_token_id)
-        
-        # 等待两个任务完成
-        (yes_mid, yes_price, yes_book, yes_books), (no_mid, no_price, no_book, no_books) = await asyncio.gather(yes_task, no_task)
-        
-        return yes_mid, no_mid, yes_price, no_price, yes_book, no_book, yes_books, no_books
+        # 只计一次失败，不再用同步客户端重试（同一次故障不重复计入熔断，也不再等一次超时）
+        _record_result(e)
+        return _fallback_result(token_id, _failure_status(e), str(e), quote_cache)
+    
+    _record_result(None)
+    return QuoteResult(token_id, QuoteStatus.OK, make_quote(mid, price, summarize_book(book), len(books)))
 
 
-def get_all_midpoints(yes_token_id: str, no_token_id: str) -> Tuple:
-    """同步接口，直接使用同步客户端（更稳定）"""
-    try:
-        client = ClobClient("https://clob.polymarket.com")
-        
-        # 获取yes token数据
-        yes_mid = client.get_midpoint(yes_token_id)
-        yes_price = client.get_price(yes_token_id, side="BUY")
-        yes_book = client.get_order_book(yes_token_id)
-        yes_books = client.get_order_books([BookParams(token_id=yes_token_id)])
+async def get_all_midpoints_async(yes_token_id: str, no_token_id: str, priority: int = PRIORITY_HIGH, quote_cache: Optional[QuoteCache] = None) -> Tuple[QuoteResult, QuoteResult]:
+    """异步获取yes和no token的所有数据，返回 (yes结果, no结果)"""
+    async with AsyncPolymarketClient(priority=priority) as client:
+        # 并行获取yes和no token的数据
+        yes_task = get_midpoint_async(client, yes_token_id, quote_cache)
+        no_task = get_midpoint_async(client, no_token_id, quote_cache)
         
-        # 获取no token数据
-        no_mid = client.get_midpoint(no_token_id)
-        no_price = client.get_price(no_token_id, side="BUY")
-        no_book = client.get_order_book(no_token_id)
-        no_books = client.get_order_books([BookParams(token_id=no_token_id)])
+        # 等待两个任务完成
+        yes_result, no_result = await asyncio.gather(yes_task, no_task)
         
-        return yes_mid, no_mid, yes_price, no_price, yes_book.market, no_book.market, len(yes_books), len(no_books)
-    except Exception as e:
-        print(f"Error getting market data: {e}")
-        # 返回默认值
-        return (
-            {"mid": "0"}, {"mid": "0"}, 
-            {"price": "0"}, {"price": "0"}, 
-            {"market": "0"}, {"market": "0"}, 
-            0, 0
-        )
+        return yes_result, no_result
 
 
-async def get_multiple_markets_async(market_tokens: List[Tuple[str, str]]) -> List[Tuple]:
-    """异步批量获取多个市场的数据"""
-    async with AsyncPolymarketClient() as client:
-        tasks = []
-        for yes_token_id, no_token_id in market_tokens:
-            task = get_all_midpoints_async(yes_token_id, no_token_id)
-            tasks.append(task)
-        
-        # 并行执行所有任务
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # 处理异常结果
-        processed_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                print(f"Error processing market {i}: {result}")
-                # 返回默认值
-                processed_results.append((
-                    {"mid": "0"}, {"mid": "0"}, 
-                    {"price": "0"}, {"price": "0"}, 
-                    {"market": "0"}, {"market": "0"}, 
-                    0, 0
-                ))
-            else:
-                processed_results.append(result)
-        
-        return processed_results
+def get_all_midpoints(yes_token_id: str, no_token_id: str, quote_cache: Optional[QuoteCache] = None) -> Tuple[QuoteResult, QuoteResult]:
+    """同步接口，直接使用同步客户端（更稳定），返回 (yes结果, no结果)"""
+    client = ClobClient(clob_api_url())
+    return (
+        fetch_token_quote(client, yes_token_id, quote_cache=quote_cache),
+        fetch_token_quote(client, no_token_id, quote_cache=quote_cache)
+    )
 
 
-def get_multiple_markets(market_tokens: List[Tuple[str, str]]) -> List[Tuple]:
-    """同步接口，批量获取多个市场数据"""
-    results = []
-    client = ClobClient("https://clob.polymarket.com")
-    
+async def get_multiple_markets_async(market_tokens: List[Tuple[str, str]], quote_cache: Optional[QuoteCache] = None) -> List[Tuple[QuoteResult, QuoteResult]]:
+    """异步批量获取多个市场的数据（批量刷新使用低优先级限流通道）"""
+    tasks = []
     for yes_token_id, no_token_id in market_tokens:
-        try:
-            # 获取yes token数据
-            yes_mid = client.get_midpoint(yes_token_id)
-            yes_price = client.get_price(yes_token_id, side="BUY")
-            yes_book = client.get_order_book(yes_token_id)
-            yes_books = client.get_order_books([BookParams(token_id=yes_token_id)])
-            
-            # 获取no token数据
-            no_mid = client.get_midpoint(no_token_id)
-            no_price = client.get_price(no_token_id, side="BUY")
-            no_book = client.get_order_book(no_token_id)
-            no_books = client.get_order_books([BookParams(token_id=no_token_id)])
-            
-            results.append((yes_mid, no_mid, yes_price, no_price, yes_book.market, no_book.market, len(yes_books), len(no_books)))
-        except Exception as e:
-            print(f"Error getting data for market {yes_token_id}/{no_token_id}: {e}")
-            # 添加默认值
-            results.append((
-                {"mid": "0"}, {"mid": "0"}, 
-                {"price": "0"}, {"price": "0"}, 
-                {"market": "0"}, {"market": "0"}, 
-                0, 0
+        task = get_all_midpoints_async(yes_token_id, no_token_id, PRIORITY_LOW, quote_cache)
+        tasks.append(task)
+    
+    # 并行执行所有任务
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    # 处理异常结果
+    processed_results = []
+    for (yes_token_id, no_token_id), result in zip(market_tokens, results):
+        if isinstance(result, Exception):
+            print(f"Error processing market {yes_token_id}/{no_token_id}: {result}")
+            status = _failure_status(result)
+            processed_results.append((
+                QuoteResult(yes_token_id, status, error=str(result)),
+                QuoteResult(no_token_id, status, error=str(result))
             ))
+        else:
+            processed_results.append(result)
     
-    return results
+    return processed_results
+
+
+def get_multiple_markets(market_tokens: List[Tuple[str, str]], priority: int = PRIORITY_LOW, quote_cache: Optional[QuoteCache] = None) -> List[Tuple[QuoteResult, QuoteResult]]:
+    """同步接口，批量获取多个市场数据（默认使用低优先级限流通道），每个市场返回 (yes结果, no结果)"""
+    client = ClobClient(clob_api_url())
+    return [
+        (
+            fetch_token_quote(client, yes_token_id, priority, quote_cache),
+            fetch_token_quote(client, no_token_id, priority, quote_cache)
+        )
+        for yes_token_id, no_token_id in market_tokens
+    ]
+
+
+def get_multiple_books(market_tokens: List[Tuple[str, str]], priority: int = PRIORITY_HIGH,
+                       quote_cache: Optional[QuoteCache] = None) -> List[Tuple[QuoteResult, QuoteResult]]:
+    """
+    只用订单簿批量获取多个市场的报价，YES/NO两侧合并到同一个 /books 请求，
+    每个请求最多 CLOB_BOOKS_BATCH_SIZE 个token，最多 CLOB_BOOKS_CONCURRENCY 个请求并行；
+    每个市场返回 (yes结果, no结果)
+    """
+    batch_size = max(2, int(os.getenv('CLOB_BOOKS_BATCH_SIZE', '100')))
+    batch_size -= batch_size % 2  # 同一市场的两侧不拆到两个请求
+    concurrency = max(1, int(os.getenv('CLOB_BOOKS_CONCURRENCY', '4')))
+    client = ClobClient(clob_api_url())
+    token_ids = [token_id for tokens in market_tokens for token_id in tokens]
+    batches = [token_ids[start:start + batch_size] for start in range(0, len(token_ids), batch_size)]
+    if len(batches) <= 1 or concurrency == 1:
+        batch_results = [fetch_book_quotes(client, batch, priority, quote_cache) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as executor:
+            batch_results = list(executor.map(lambda batch: fetch_book_quotes(client, batch, priority, quote_cache), batches))
+    results = [result for batch in batch_results for result in batch]
+    return list(zip(results[0::2], results[1::2]))
+
+
+def _print_result(label: str, result: QuoteResult):
+    if not result.usable:
+        print(f"{label} : {result.status.value} {result.error}")
+        return
+    quote = result.quote
+    print(f"{label} : mid:{quote['mid']} {1.0 - float(quote['price'])} {quote['book']} {quote['books']} ({result.status.value})")
 
 
 async def main():
@@ -211,17 +360,13 @@ async def main():
     print("测试单个市场异步获取:")
     start_time = asyncio.get_event_loop().time()
     
-    yes_mid, no_mid, yes_price, no_price, yes_book, no_book, yes_books, no_books = await get_all_midpoints_async(yes_token_id, no_token_id)
+    yes_result, no_result = await get_all_midpoints_async(yes_token_id, no_token_id)
     
     end_time = asyncio.get_event_loop().time()
     print(f"单个市场获取耗时: {end_time - start_time:.2f}秒")
     
-    # 计算价格
-    yes_price_calc = 1.0 - float(yes_price['price'])
-    no_price_calc = 1.0 - float(no_price['price'])
-    
-    print(f"yes : mid:{yes_mid['mid']} {yes_price_calc} {yes_book} {yes_books}")
-    print(f"no : mid:{no_mid['mid']} {no_price_calc} {no_book} {no_books}")
+    _print_result("yes", yes_result)
+    _print_result("no", no_result)
     
     print("\n测试批量市场异步获取:")
     # 测试批量获取
@@ -234,8 +379,9 @@ async def main():
     results = await get_multiple_markets_async(market_tokens)
     end_time = asyncio.get_event_loop().time()
     
+    ok_count = sum(1 for yes_result, no_result in results if yes_result.ok and no_result.ok)
     print(f"批量获取{len(market_tokens)}个市场耗时: {end_time - start_time:.2f}秒")
-    print(f"成功获取 {len(results)} 个市场数据")
+    print(f"成功获取 {ok_count}/{len(results)} 个市场数据")
 
 
 if __name__ == "__main__":
@@ -5,10 +5,17 @@ from decimal import Decimal
 from py_clob_client.client import ClobClient
 from py_clob_client.clob_types import OrderArgs, OrderType, OpenOrderParams, MarketOrderArgs, BalanceAllowanceParams
 from py_clob_client.order_builder.constants import BUY, SELL
+from py_clob_client.exceptions import PolyApiException
+from py_clob_client.utilities import price_valid
 from dotenv import load_dotenv
 
 # 导入余额查询器
 from .balance_checker import BalanceChecker
+from .quote_cache import QuoteCache
+from .order_signer import OrderSigningService
+from .rate_limiter import governor, CLOB_ORDER
+from .polymarket_tokenid import clob_read
+from .endpoints import clob_api_url
 
 # 加载环境变量
 load_dotenv()
@@ -17,7 +24,14 @@ load_dotenv()
 class PolymarketTrader:
     """Polymarket交易器"""
     
-    def __init__(self, private_key: Optional[str] = None, funder: Optional[str] = None, signature_type: Optional[int] = None):
+    def __init__(
+        self,
+        private_key: Optional[str] = None,
+        funder: Optional[str] = None,
+        signature_type: Optional[int] = None,
+        quote_cache: Optional[QuoteCache] = None,
+        signing_service: Optional[OrderSigningService] = None
+    ):
         """
         初始化交易器
         
@@ -28,10 +42,13 @@ class PolymarketTrader:
                            0: Standard EOA (MetaMask, 硬件钱包等)
                            1: Email/Magic wallet signatures (委托签名)
                            2: Browser wallet proxy signatures (代理合约)
+            quote_cache: 报价缓存，如果为None则新建（可与扫描器共享）
+            signing_service: 进程池签名服务，如果为None则在当前线程签名
         """
         self.private_key = private_key or os.getenv('PRIVATE_KEY')
         self.funder = funder or os.getenv('FUNDER')
         self.signature_type = signature_type or int(os.getenv('SIGNATURE_TYPE', '0'))
+        self.chain_id = int(os.getenv('CHAIN_ID', '137'))  # Polygon主网
         
         if not self.private_key:
             raise ValueError("私钥未设置，请设置PRIVATE_KEY环境变量或传入private_key参数")
@@ -45,9 +62,9 @@ class PolymarketTrader:
         
         # 初始化客户端
         self.client = ClobClient(
-            host="https://clob.polymarket.com",
+            host=clob_api_url(),
             key=self.private_key,
-            chain_id=int(os.getenv('CHAIN_ID', '137')),  # Polygon主网
+            chain_id=self.chain_id,
             signature_type=self.signature_type,
             funder=self.funder  # Address that holds your funds
         )
@@ -69,6 +86,14 @@ class PolymarketTrader:
         # 初始化余额查询器
         self.balance_checker = BalanceChecker()
         
+        # 报价缓存
+        self.quote_cache = quote_cache or QuoteCache()
+        
+        # 签名服务（可选）
+        self.signing_service = None
+        if signing_service is not None:
+            self.set_signing_service(signing_service)
+        
     def get_account_info(self) -> Dict[str, Any]:
         """获取账户信息"""
         try:
@@ -116,10 +141,22 @@ class PolymarketTrader:
                 # 如果还是失败，返回一个通用的token ID
                 return "0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174"
     
-    def get_market_price(self, token_id: str, side: str = "BUY") -> Optional[float]:
-        """获取市场价格"""
+    def get_market_price(self, token_id: str, side: str = "BUY", max_age: Optional[float] = None) -> Optional[float]:
+        """
+        获取市场价格（BUY方向优先使用缓存报价）
+        
+        Args:
+            token_id: Token ID
+            side: 买卖方向
+            max_age: 可接受的最大报价时间（秒），如果为None则使用缓存默认值
+        """
         try:
-            price_data = self.client.get_price(token_id, side=side)
+            # 扫描器缓存的是BUY方向的价格
+            cached_quote = self.quote_cache.get(token_id, max_age) if side == "BUY" else None
+            if cached_quote is not None:
+                return 1.0 - float(cached_quote['price'])
+            
+            price_data = clob_read(self.client.get_price, token_id, side=side)
             if price_data and 'price' in price_data:
                 # API返回的价格需要 1 - price 才是网站上显示的价格
                 api_price = float(price_data['price'])
@@ -130,13 +167,82 @@ class PolymarketTrader:
             print(f"获取市场价格失败 (token: {token_id}): {e}")
             return None
     
+    def set_signing_service(self, signing_service: OrderSigningService):
+        """使用进程池签名服务签名订单"""
+        self.signing_service = signing_service
+        self.signing_account_id = signing_service.register(self)
+    
+    def _sign_with_service(self, order_args: MarketOrderArgs):
+        """
+        在当前线程完成 ClobClient.create_market_order 中签名前的步骤（解析价格、tick size、
+        neg risk和手续费率，校验价格），再交给签名进程完成签名
+        """
+        tick_size = clob_read(self.client.get_tick_size, order_args.token_id)
+        if order_args.price is None or order_args.price <= 0:
+            order_args.price = clob_read(
+                self.client.calculate_market_price,
+                order_args.token_id, order_args.side, order_args.amount, order_args.order_type
+            )
+        if not price_valid(order_args.price, tick_size):
+            raise ValueError(f"价格 {order_args.price} 超出范围: {tick_size} - {1 - float(tick_size)}")
+        neg_risk = clob_read(self.client.get_neg_risk, order_args.token_id)
+        # 市场手续费率非0时，调用方指定的非0费率必须与之一致（与客户端校验相同）
+        fee_rate_bps = clob_read(self.client.get_fee_rate_bps, order_args.token_id)
+        if fee_rate_bps and order_args.fee_rate_bps and order_args.fee_rate_bps != fee_rate_bps:
+            raise ValueError(f"手续费率 {order_args.fee_rate_bps} 与市场手续费率 {fee_rate_bps} 不一致")
+        order_args.fee_rate_bps = fee_rate_bps
+        return self.signing_service.sign_market_order(self.signing_account_id, order_args, tick_size, neg_risk)
+    
+    def _post_order(self, signed_order, order_type):
+        """限流后提交订单，遇到429时通知限流器"""
+        governor.acquire(CLOB_ORDER)
+        try:
+            return self.client.post_order(signed_order, order_type)
+        except PolyApiException as e:
+            governor.on_response(CLOB_ORDER, e.status_code or 0)
+            raise
+    
+    def prepare_market_order(self, token_id: str, side: str, size: float, price: Optional[float] = None):
+        """
+        创建并签名FOK市价单但不提交（可提前签名，在需要时用 post_prepared_order 提交）
+        
+        Args:
+            token_id: Token ID
+            side: 买卖方向 ("BUY" 或 "SELL")
+            size: 订单金额
+            price: 最差成交价，如果为None则由客户端按订单簿计算
+            
+        Returns:
+            已签名的订单
+        """
+        market_order_args = MarketOrderArgs(
+            token_id=token_id,
+            amount=size,
+            side=BUY if side == "BUY" else SELL,
+            price=price or 0,  # 0表示由客户端按订单簿计算
+            order_type=OrderType.FOK  # Fill or Kill - 立即成交或取消
+        )
+        if self.signing_service is not None:
+            return self._sign_with_service(market_order_args)
+        return self.client.create_market_order(market_order_args)
+    
+    def post_prepared_order(self, signed_order, token_id: str) -> Dict[str, Any]:
+        """提交已签名的FOK市价单，失败时抛出异常"""
+        result = self._post_order(signed_order, OrderType.FOK)
+        
+        # 下单后订单簿和余额已变化，缓存的报价和余额失效
+        self.quote_cache.invalidate(token_id)
+        self.balance_checker.invalidate(self.funder)
+        return result
+    
     def place_market_order(
         self,
         token_id: str,
         side: str,
         size: float,
         slippage: Optional[float] = None,
-        token_type: Optional[str] = None
+        token_type: Optional[str] = None,
+        price: Optional[float] = None
     ) -> Optional[Dict[str, Any]]:
         """
         下市价单
@@ -147,6 +253,7 @@ class PolymarketTrader:
             size: 订单大小
             slippage: 滑点容忍度，如果为None则使用默认值
             token_type: Token类型 ("YES" 或 "NO")，用于显示方向
+            price: 最差成交价（由订单簿深度计算得出），如果为None则由客户端按订单簿计算
             
         Returns:
             订单结果字典，失败时返回None
@@ -166,10 +273,6 @@ class PolymarketTrader:
             if slippage is None:
                 slippage = self.default_slippage
             
-            
-            # 转换side为常量
-            side_constant = BUY if side == "BUY" else SELL
-            
             # 先检查订单簿是否有足够的流动性
             try:
                 # 获取当前价格
@@ -182,19 +285,9 @@ class PolymarketTrader:
                 print(f"⚠️ 价格检查失败: {e}")
                 # 继续尝试下单，但记录警告
             
-            # 创建市价单参数
-            market_order_args = MarketOrderArgs(
-                token_id=token_id,
-                amount=size,
-                side=side_constant,
-                order_type=OrderType.FOK  # Fill or Kill - 立即成交或取消
-            )
-            
-            # 创建签名订单
-            signed_order = self.client.create_market_order(market_order_args)
-            
-            # 下订单
-            result = self.client.post_order(signed_order, OrderType.FOK)
+            # 创建签名订单，然后下单（下单使用独立的限流通道，不会排在行情请求后面）
+            signed_order = self.prepare_market_order(token_id, side, size, price)
+            result = self.post_prepared_order(signed_order, token_id)
             
             # 确定交易方向显示
             # 在Polymarket的"Up or Down"市场中：
@@ -248,6 +341,75 @@ class PolymarketTrader:
             
             return None
     
+    def place_limit_order(
+        self,
+        token_id: str,
+        side: str,
+        price: float,
+        size: float,
+        expiration: int,
+        token_type: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        下GTD限价单
+        
+        Args:
+            token_id: Token ID
+            side: 买卖方向 ("BUY" 或 "SELL")
+            price: 限价
+            size: 订单金额（USD），会按限价换算为股数
+            expiration: 过期时间（UTC epoch秒，需包含Polymarket的60秒安全阈值）
+            token_type: Token类型 ("YES" 或 "NO")，用于显示方向
+            
+        Returns:
+            订单结果字典，失败时返回None
+        """
+        try:
+            if side not in ["BUY", "SELL"]:
+                raise ValueError("side必须是'BUY'或'SELL'")
+            
+            if size < self.min_order_size:
+                raise ValueError(f"订单大小 {size} 小于最小订单大小 {self.min_order_size}")
+            
+            if size > self.max_order_size:
+                raise ValueError(f"订单大小 {size} 大于最大订单大小 {self.max_order_size}")
+            
+            if not 0 < price < 1:
+                raise ValueError(f"限价 {price} 必须在0-1之间")
+            
+            order_args = OrderArgs(
+                token_id=token_id,
+                price=price,
+                size=round(size / price, 2),  # 限价单大小以股数计
+                side=BUY if side == "BUY" else SELL,
+                expiration=expiration
+            )
+            
+            signed_order = self.client.create_order(order_args)
+            result = self._post_order(signed_order, OrderType.GTD)
+            self.quote_cache.invalidate(token_id)
+            self.balance_checker.invalidate(self.funder)
+            
+            print(f"限价单下单成功:")
+            print(f"  Token ID: {token_id}")
+            print(f"  方向: {side} ({token_type or side})")
+            print(f"  限价: {price:.3f}, 大小: {size} USD ({order_args.size} 股)")
+            print(f"  订单类型: GTD (过期时间 {expiration})")
+            print(f"  订单ID: {result.get('orderID', result.get('id', 'N/A'))}")
+            
+            return result
+            
+        except Exception as e:
+            print(f"下限价单失败: {e}")
+            return None
+    
+    def get_tick_size(self, token_id: str) -> float:
+        """获取token的最小价格变动单位"""
+        try:
+            return float(clob_read(self.client.get_tick_size, token_id))
+        except Exception as e:
+            print(f"获取tick size失败 (token: {token_id}): {e}")
+            return 0.01
     
     def cancel_order(self, order_id: str) -> bool:
         """取消指定订单"""
@@ -259,6 +421,18 @@ class PolymarketTrader:
             print(f"取消订单失败: {e}")
             return False
     
+    def cancel_orders(self, order_ids: List[str]) -> bool:
+        """按订单ID批量取消订单（一次请求）"""
+        if not order_ids:
+            return True
+        try:
+            result = self.client.cancel_orders(order_ids)
+            print(f"批量取消 {len(order_ids)} 笔订单: {result}")
+            return True
+        except Exception as e:
+            print(f"批量取消订单失败: {e}")
+            return False
+    
     def cancel_all_orders(self) -> bool:
         """取消所有未成交订单"""
         try:
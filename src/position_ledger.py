@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+持仓账本 - 按订单ID记录成交，跟踪每个市场在endDate的待结算持仓，
+市场结算后增量更新已实现盈亏（SQLite存储，按索引更新，不重新扫描历史）
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .market_record import MarketRecord
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fills (
+    order_id   TEXT PRIMARY KEY,
+    account    TEXT NOT NULL,
+    market_id  TEXT NOT NULL,
+    token_id   TEXT NOT NULL,
+    shares     REAL NOT NULL,   -- 累计成交股数
+    cost       REAL NOT NULL,   -- 累计成交金额（USD）
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    account    TEXT NOT NULL,
+    token_id   TEXT NOT NULL,
+    market_id  TEXT NOT NULL,
+    ticker     TEXT NOT NULL,
+    outcome    TEXT NOT NULL,   -- YES / NO
+    end_ts     INTEGER NOT NULL,
+    shares     REAL NOT NULL DEFAULT 0,
+    cost       REAL NOT NULL DEFAULT 0,
+    settled    INTEGER NOT NULL DEFAULT 0,
+    payout     REAL,
+    pnl        REAL,
+    settled_at REAL,
+    PRIMARY KEY (account, token_id)
+);
+CREATE INDEX IF NOT EXISTS idx_positions_pending ON positions (settled, end_ts);
+CREATE INDEX IF NOT EXISTS idx_positions_market ON positions (market_id, settled);
+CREATE INDEX IF NOT EXISTS idx_positions_settled_at ON positions (settled_at);
+CREATE TABLE IF NOT EXISTS account_pnl (
+    account      TEXT PRIMARY KEY,
+    realized_pnl REAL NOT NULL DEFAULT 0,
+    settled      INTEGER NOT NULL DEFAULT 0,
+    wins         INTEGER NOT NULL DEFAULT 0,
+    open_cost    REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+class PositionLedger:
+    """持仓和盈亏账本（线程安全）"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化持仓账本
+
+        Args:
+            path: SQLite数据库路径，如果为None则从环境变量 POSITION_DB 读取（默认 positions.db）
+        """
+        self.path = path or os.getenv('POSITION_DB', 'positions.db')
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record_fill(self, order_id: str, account: str, market: MarketRecord, token_id: str, outcome: str,
+                    shares: float, cost: float) -> float:
+        """
+        记录订单的累计成交（同一订单重复记录时只计入增量，可用于限价单的部分成交）
+
+        Args:
+            order_id: 订单ID
+            account: 资金地址
+            market: 市场记录
+            token_id: 成交的token ID
+            outcome: "YES" 或 "NO"
+            shares: 该订单累计成交股数
+            cost: 该订单累计成交金额（USD）
+
+        Returns:
+            本次新增的成交金额（USD），重复记录时为0
+        """
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            row = self._conn.execute('SELECT shares, cost FROM fills WHERE order_id = ?', (order_id,)).fetchone()
+            delta_shares = shares - (row['shares'] if row else 0.0)
+            delta_cost = cost - (row['cost'] if row else 0.0)
+            if row is not None and abs(delta_shares) < 1e-9 and abs(delta_cost) < 1e-9:
+                return 0.0
+
+            self._conn.execute(
+                'INSERT INTO fills (order_id, account, market_id, token_id, shares, cost, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(order_id) DO UPDATE SET shares = excluded.shares, cost = excluded.cost, updated_at = excluded.updated_at',
+                (order_id, account.lower(), market.id, token_id, shares, cost, time.time())
+            )
+            self._conn.execute(
+                'INSERT INTO positions (account, token_id, market_id, ticker, outcome, end_ts, shares, cost) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(account, token_id) DO UPDATE SET shares = shares + excluded.shares, cost = cost + excluded.cost',
+                (account.lower(), token_id, market.id, market.ticker, outcome, market.end_ts, delta_shares, delta_cost)
+            )
+            self._conn.execute(
+                'INSERT INTO account_pnl (account, open_cost) VALUES (?, ?) '
+                'ON CONFLICT(account) DO UPDATE SET open_cost = open_cost + excluded.open_cost',
+                (account.lower(), delta_cost)
+            )
+            return delta_cost
+
+    def pending_markets(self, now_ts: float) -> List[Dict[str, Any]]:
+        """
+        获取已到endDate、仍有未结算持仓的市场
+
+        Returns:
+            [{'market_id', 'ticker', 'end_ts'}, ...]，按结束时间排序
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT market_id, ticker, MIN(end_ts) AS end_ts FROM positions '
+                'WHERE settled = 0 AND end_ts <= ? GROUP BY market_id, ticker ORDER BY end_ts',
+                (int(now_ts),)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def settle_market(self, market_id: str, winning_token_id: str) -> float:
+        """
+        结算一个市场：胜出token每股兑付1 USD，其余为0，并增量更新各账户的已实现盈亏
+
+        Returns:
+            本次结算的盈亏合计（USD）
+        """
+        total_pnl = 0.0
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            rows = self._conn.execute(
+                'SELECT account, token_id, shares, cost FROM positions WHERE market_id = ? AND settled = 0',
+                (market_id,)
+            ).fetchall()
+            for row in rows:
+                won = row['token_id'] == winning_token_id
+                payout = row['shares'] if won else 0.0
+                pnl = payout - row['cost']
+                total_pnl += pnl
+                self._conn.execute(
+                    'UPDATE positions SET settled = 1, payout = ?, pnl = ?, settled_at = ? WHERE account = ? AND token_id = ?',
+                    (payout, pnl, time.time(), row['account'], row['token_id'])
+                )
+                self._conn.execute(
+                    'UPDATE account_pnl SET realized_pnl = realized_pnl + ?, settled = settled + 1, '
+                    'wins = wins + ?, open_cost = open_cost - ? WHERE account = ?',
+                    (pnl, int(won and row['shares'] > 0), row['cost'], row['account'])
+                )
+        return total_pnl
+
+    def realized_pnl_since(self, since_ts: float) -> float:
+        """获取某时间之后结算的已实现盈亏合计"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT COALESCE(SUM(pnl), 0) FROM positions WHERE settled_at >= ?', (since_ts,)
+            ).fetchone()
+        return row[0]
+
+    def open_positions(self, account: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取未结算的持仓"""
+        query = 'SELECT * FROM positions WHERE settled = 0'
+        params: tuple = ()
+        if account is not None:
+            query += ' AND account = ?'
+            params = (account.lower(),)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query + ' ORDER BY end_ts', params).fetchall()]
+
+    def get_summary(self, account: Optional[str] = None) -> Dict[str, Any]:
+        """获取已实现盈亏汇总（读取增量维护的汇总表，不扫描历史）"""
+        query = ('SELECT COALESCE(SUM(realized_pnl), 0) AS realized_pnl, COALESCE(SUM(settled), 0) AS settled, '
+                 'COALESCE(SUM(wins), 0) AS wins, COALESCE(SUM(open_cost), 0) AS open_cost FROM account_pnl')
+        params: tuple = ()
+        if account is not None:
+            query += ' WHERE account = ?'
+            params = (account.lower(),)
+        with self._lock:
+            row = dict(self._conn.execute(query, params).fetchone())
+        row['win_rate'] = row['wins'] / row['settled'] if row['settled'] else 0.0
+        return row
+
+
+def main():
+    """打印账本汇总"""
+    ledger = PositionLedger()
+    summary = ledger.get_summary()
+    print(f"=== 持仓账本 ({ledger.path}) ===")
+    print(f"已实现盈亏: {summary['realized_pnl']:+.4f} USD, 已结算 {summary['settled']} 笔, 胜率 {summary['win_rate']*100:.1f}%")
+    print(f"未结算成本: {summary['open_cost']:.4f} USD")
+    for position in ledger.open_positions():
+        print(f"  {position['ticker']} {position['outcome']}: {position['shares']:.2f} 股, 成本 {position['cost']:.4f} USD")
+
+
+if __name__ == "__main__":
+    main()
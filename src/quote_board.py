@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+共享内存报价板 - 行情进程把报价写入固定布局的共享内存数组（每个token一个槽位，序号锁保护），
+同一台机器上的交易进程直接从共享内存解包读取，不经过pickle和队列；
+槽位由CLOB token ID（clobTokenIds中的uint256）经开放寻址确定，读取方无需与写入方同步映射表
+"""
+
+import os
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+_MAGIC = b'QBRD'
+_VERSION = 1
+# 头部: 魔数, 版本, 槽位数, 每个槽位的卖单档位数
+_HEADER = struct.Struct('<4sIII')
+# 槽位头部: 序号(奇数表示正在写入), token ID(uint256大端), 市场ID(32字节), 写入时间(monotonic), mid, price, 订单簿数, 卖单档位数
+_SLOT_HEADER = struct.Struct('<Q32s32sdddII')
+_SEQ = struct.Struct('<Q')
+_EMPTY_KEY = bytes(32)
+
+
+def token_key(token_id: str) -> bytes:
+    """CLOB token ID（十进制uint256字符串）转换为32字节键"""
+    return int(token_id).to_bytes(32, 'big')
+
+
+def _market_key(market_id: Optional[str]) -> bytes:
+    if not market_id:
+        return _EMPTY_KEY
+    try:
+        return bytes.fromhex(market_id[2:] if market_id.startswith('0x') else market_id).rjust(32, b'\0')[-32:]
+    except ValueError:
+        return _EMPTY_KEY
+
+
+class QuoteBoard:
+    """共享内存报价板（单写多读）"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+        magic, version, self.capacity, self.ask_levels = _HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"共享内存 {shm.name} 不是报价板")
+        self._asks = struct.Struct(f'<{2 * self.ask_levels}d')
+        self.slot_size = (_SLOT_HEADER.size + self._asks.size + 7) // 8 * 8
+        self._buf = shm.buf
+        self._slots: Dict[str, int] = {}    # 本进程的 token ID -> 槽位偏移缓存
+        self.torn_reads = 0                 # 读取时遇到并发写入而重试的次数
+        self._full_warned = False
+
+    @classmethod
+    def create(cls, name: Optional[str] = None, capacity: Optional[int] = None,
+               ask_levels: Optional[int] = None) -> 'QuoteBoard':
+        """
+        创建报价板（行情进程调用，是唯一的写入方）
+
+        Args:
+            name: 共享内存名称，如果为None则自动生成
+            capacity: 槽位数，如果为None则从环境变量 QUOTE_BOARD_SLOTS 读取（默认4096）
+            ask_levels: 每个token保留的卖单档位数，如果为None则从环境变量 QUOTE_BOARD_ASK_LEVELS 读取（默认10）
+        """
+        capacity = capacity or int(os.getenv('QUOTE_BOARD_SLOTS', '4096'))
+        ask_levels = ask_levels or int(os.getenv('QUOTE_BOARD_ASK_LEVELS', '10'))
+        slot_size = (_SLOT_HEADER.size + 16 * ask_levels + 7) // 8 * 8
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_HEADER.size + capacity * slot_size)
+        shm.buf[:] = bytes(shm.size)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, capacity, ask_levels)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'QuoteBoard':
+        """连接已有的报价板（交易进程调用，只读）"""
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)  # 由创建方负责释放
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    def close(self):
+        """断开报价板，创建方同时释放共享内存"""
+        self._buf = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    def _offset(self, index: int) -> int:
+        return _HEADER.size + index * self.slot_size
+
+    def _find(self, token_id: str, create: bool) -> Optional[int]:
+        """按token ID开放寻址查找槽位偏移，create为True时占用空槽（只有写入方可以）"""
+        offset = self._slots.get(token_id)
+        if offset is not None:
+            return offset
+        key = token_key(token_id)
+        start = int.from_bytes(key, 'big') % self.capacity
+        for probe in range(self.capacity):
+            offset = self._offset((start + probe) % self.capacity)
+            slot_key = bytes(self._buf[offset + 8:offset + 40])
+            if slot_key == key:
+                self._slots[token_id] = offset
+                return offset
+            if slot_key == _EMPTY_KEY:
+                if not create:
+                    return None
+                # 先写入键再发布（序号保持偶数、写入时间为0，读取方视为暂无报价）
+                self._buf[offset + 8:offset + 40] = key
+                self._slots[token_id] = offset
+                return offset
+        if create:
+            raise RuntimeError(f"报价板已满 ({self.capacity} 个槽位)")
+        return None
+
+    def publish(self, token_id: str, quote: Dict[str, Any]) -> bool:
+        """
+        写入一个token的报价（序号锁：写入前序号加一变为奇数，写完再加一变为偶数）
+
+        Args:
+            token_id: CLOB token ID
+            quote: QuoteCache格式的报价 {'mid', 'price', 'book', 'asks', 'books'}
+
+        Returns:
+            是否写入（报价板已满时返回False）
+        """
+        if not self.owner:
+            raise RuntimeError("只有创建报价板的进程可以写入")
+        try:
+            offset = self._find(token_id, create=True)
+        except RuntimeError as e:
+            if not self._full_warned:
+                self._full_warned = True
+                print(f"⚠️ {e}，新的token不再发布，请调大 QUOTE_BOARD_SLOTS")
+            return False
+        buf = self._buf
+        seq = _SEQ.unpack_from(buf, offset)[0]
+        asks = quote['asks'][:self.ask_levels]
+        levels: List[float] = [value for level in asks for value in level]
+        levels.extend([0.0] * (2 * self.ask_levels - len(levels)))
+
+        _SEQ.pack_into(buf, offset, seq + 1)
+        _SLOT_HEADER.pack_into(buf, offset, seq + 1, token_key(token_id), _market_key(quote.get('book')),
+                               time.monotonic(), float(quote['mid']), float(quote['price']),
+                               int(quote.get('books') or 0), len(asks))
+        self._asks.pack_into(buf, offset + _SLOT_HEADER.size, *levels)
+        _SEQ.pack_into(buf, offset, seq + 2)
+        return True
+
+    def _read(self, offset: int, retries: int = 100) -> Optional[Tuple[tuple, tuple]]:
+        """在两次读到相同的偶数序号之间解包槽位，返回 (槽位头部, 卖单档位)"""
+        buf = self._buf
+        for _ in range(retries):
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                self.torn_reads += 1
+                continue
+            header = _SLOT_HEADER.unpack_from(buf, offset)
+            levels = self._asks.unpack_from(buf, offset + _SLOT_HEADER.size)
+            if _SEQ.unpack_from(buf, offset)[0] == seq:
+                return header, levels
+            self.torn_reads += 1
+        return None
+
+    def get(self, token_id: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取报价（QuoteCache格式）
+
+        Args:
+            token_id: CLOB token ID
+            max_age: 可接受的最大报价时间（秒），为None时不检查
+
+        Returns:
+            报价字典，没有报价或已过期时返回None
+        """
+        offset = self._find(token_id, create=False)
+        if offset is None:
+            return None
+        snapshot = self._read(offset)
+        if snapshot is None:
+            return None
+        (_, _, market, updated, mid, price, books, ask_count), levels = snapshot
+        if not updated or (max_age is not None and time.monotonic() - updated > max_age):
+            return None
+        return {
+            'mid': mid,
+            'price': price,
+            'book': '0x' + market.hex() if market != _EMPTY_KEY else None,
+            'asks': [(levels[2 * i], levels[2 * i + 1]) for i in range(ask_count)],
+            'books': books
+        }
+
+    def get_mid(self, token_id: str, max_age: Optional[float] = None) -> Optional[float]:
+        """只读取mid（不构建报价字典）"""
+        offset = self._find(token_id, create=False)
+        if offset is None:
+            return None
+        snapshot = self._read(offset)
+        if snapshot is None:
+            return None
+        updated, mid = snapshot[0][3], snapshot[0][4]
+        if not updated or (max_age is not None and time.monotonic() - updated > max_age):
+            return None
+        return mid
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取报价板状态"""
+        used = sum(1 for index in range(self.capacity)
+                   if bytes(self._buf[self._offset(index) + 8:self._offset(index) + 40]) != _EMPTY_KEY)
+        return {'name': self.name, 'capacity': self.capacity, 'used': used, 'torn_reads': self.torn_reads}
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+报价缓存 - 按token ID缓存行情数据，供扫描器和交易器共享
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class QuoteCache:
+    """带过期时间和LRU淘汰的报价缓存（线程安全）"""
+
+    def __init__(self, max_age: Optional[float] = None, max_entries: Optional[int] = None):
+        """
+        初始化报价缓存
+
+        Args:
+            max_age: 默认最大缓存时间（秒），如果为None则从环境变量读取
+            max_entries: 最大缓存条目数，超出时淘汰最久未使用的条目
+        """
+        self.max_age = max_age if max_age is not None else float(os.getenv('QUOTE_CACHE_MAX_AGE', '2.0'))
+        self.max_entries = max_entries or int(os.getenv('QUOTE_CACHE_SIZE', '1024'))
+
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # token_id -> (写入时间, 报价)
+        self._lock = threading.Lock()
+
+        # 可选的共享内存报价板：创建方写入缓存时同步发布，连接方在本地未命中时读取
+        self.board = None
+        self.board_hits = 0
+
+        # 命中统计
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, token_id: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        获取足够新鲜的报价
+
+        Args:
+            token_id: Token ID
+            max_age: 调用方要求的最大报价时间（秒），如果为None则使用默认值
+
+        Returns:
+            报价字典，不存在或已过期时返回None
+        """
+        if max_age is None:
+            max_age = self.max_age
+
+        with self._lock:
+            entry = self._entries.get(token_id)
+            if entry is not None:
+                timestamp, quote = entry
+                if time.monotonic() - timestamp <= max_age:
+                    self._entries.move_to_end(token_id)
+                    self.hits += 1
+                    return quote
+                self.expired += 1
+
+        board = self.board
+        if board is not None and not board.owner:
+            quote = board.get(token_id, max_age)
+            if quote is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.board_hits += 1
+                return quote
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get_age(self, token_id: str) -> Optional[float]:
+        """获取报价已缓存的时间（秒），不存在时返回None"""
+        with self._lock:
+            entry = self._entries.get(token_id)
+            return None if entry is None else time.monotonic() - entry[0]
+
+    def get_stale(self, token_id: str, max_age: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        获取可能已过期的报价（上游故障时回退使用，不计入命中统计）
+
+        Args:
+            token_id: Token ID
+            max_age: 可接受的最大报价时间（秒）
+
+        Returns:
+            (报价, 报价时间秒)，不存在或超过max_age时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(token_id)
+            if entry is None:
+                return None
+            age = time.monotonic() - entry[0]
+            return (entry[1], age) if age <= max_age else None
+
+    def put(self, token_id: str, quote: Dict[str, Any]):
+        """写入报价"""
+        with self._lock:
+            self._entries[token_id] = (time.monotonic(), quote)
+            self._entries.move_to_end(token_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        board = self.board
+        if board is not None and board.owner:
+            board.publish(token_id, quote)
+
+    def attach_board(self, board):
+        """
+        关联共享内存报价板
+
+        Args:
+            board: QuoteBoard；创建方的缓存会把写入的报价发布到报价板，连接方的缓存在本地未命中时从报价板读取
+        """
+        self.board = board
+
+    def invalidate(self, token_id: str):
+        """使指定token的报价失效（如下单后订单簿已变化）"""
+        with self._lock:
+            self._entries.pop(token_id, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'board_hits': self.board_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+报价结果 - 区分正常、过期（缓存回退）、错误和超时，不再用 {"mid": "0"} 冒充真实价格
+"""
+
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, Optional
+
+
+class QuoteStatus(str, Enum):
+    """报价状态"""
+    OK = 'ok'            # 实时获取成功
+    STALE = 'stale'      # 获取失败，使用过期时间内的缓存报价
+    ERROR = 'error'      # 获取失败且没有可用缓存
+    TIMEOUT = 'timeout'  # 请求超时且没有可用缓存
+
+
+@dataclass(slots=True)
+class QuoteResult:
+    """单个token的报价结果"""
+    token_id: str
+    status: QuoteStatus
+    quote: Optional[Dict[str, Any]] = None  # 报价（格式同 QuoteCache 中的条目）
+    age: float = 0.0                        # 报价时间（秒），实时报价为0
+    error: str = ''
+
+    @property
+    def ok(self) -> bool:
+        """是否为实时报价"""
+        return self.status is QuoteStatus.OK
+
+    @property
+    def usable(self) -> bool:
+        """是否有可用报价（实时或过期缓存）"""
+        return self.quote is not None and self.status in (QuoteStatus.OK, QuoteStatus.STALE)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+限流器 - 按接口类别（Gamma事件、CLOB读取、CLOB下单）使用令牌桶限流，
+遵守 Retry-After，并为交易关键请求保留优先通道
+"""
+
+import asyncio
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+# 接口类别
+GAMMA = 'gamma'
+CLOB_READ = 'clob_read'
+CLOB_ORDER = 'clob_order'
+
+# 优先级：高优先级为交易决策和下单路径，低优先级为批量行情刷新
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1
+
+
+class TokenBucket:
+    """令牌桶（线程安全）"""
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, reserve: float = 0.0) -> float:
+        """
+        尝试取出一个令牌
+
+        Args:
+            reserve: 需要为高优先级保留的令牌数，桶内令牌不超过该值时不允许取出
+
+        Returns:
+            0表示已取到令牌，否则为建议等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens - 1 >= reserve:
+                self._tokens -= 1
+                return 0.0
+            return (reserve + 1 - self._tokens) / self.rate
+
+
+class RateLimitGovernor:
+    """按接口类别统一管理限流"""
+
+    def __init__(self, configure: bool = True):
+        """
+        初始化限流器
+
+        Args:
+            configure: 是否立即从环境变量读取设置；为False时在首次使用时读取（模块级单例在导入时创建，此时.env可能尚未加载）
+        """
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.reserve_ratio = 0.0
+        self._configured = False
+
+        self._blocked_until: Dict[str, float] = {}  # Retry-After 解除时间（monotonic）
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {family: {'acquired': 0, 'waited': 0, 'throttled': 0}
+                                                 for family in (GAMMA, CLOB_READ, CLOB_ORDER)}
+        if configure:
+            self.configure()
+
+    def configure(self):
+        """从环境变量读取限流设置（只读取一次）"""
+        with self._lock:
+            if self._configured:
+                return
+            # 每秒请求数和突发容量，可通过环境变量调整
+            self.buckets = {
+                GAMMA: TokenBucket(float(os.getenv('GAMMA_RATE_LIMIT', '10')), float(os.getenv('GAMMA_RATE_BURST', '20'))),
+                CLOB_READ: TokenBucket(float(os.getenv('CLOB_READ_RATE_LIMIT', '20')), float(os.getenv('CLOB_READ_RATE_BURST', '40'))),
+                CLOB_ORDER: TokenBucket(float(os.getenv('CLOB_ORDER_RATE_LIMIT', '10')), float(os.getenv('CLOB_ORDER_RATE_BURST', '20'))),
+            }
+            # 低优先级请求不能动用的桶容量比例
+            self.reserve_ratio = float(os.getenv('RATE_LIMIT_RESERVE_RATIO', '0.25'))
+            self._configured = True
+
+    def _reserve(self, family: str, priority: int) -> float:
+        return self.buckets[family].burst * self.reserve_ratio if priority == PRIORITY_LOW else 0.0
+
+    def _wait_time(self, family: str, priority: int) -> float:
+        """返回需要等待的秒数，0表示已取到令牌"""
+        if not self._configured:
+            self.configure()
+        with self._lock:
+            blocked_for = self._blocked_until.get(family, 0.0) - time.monotonic()
+        if blocked_for > 0:
+            return blocked_for
+        return self.buckets[family].try_acquire(self._reserve(family, priority))
+
+    def _record(self, family: str, waited: bool):
+        with self._lock:
+            self.stats[family]['acquired'] += 1
+            if waited:
+                self.stats[family]['waited'] += 1
+
+    def acquire(self, family: str, priority: int = PRIORITY_HIGH, timeout: Optional[float] = None) -> bool:
+        """
+        阻塞直到允许发出请求
+
+        Args:
+            family: 接口类别
+            priority: 优先级
+            timeout: 最长等待秒数，None表示一直等待
+
+        Returns:
+            是否取到令牌（超时返回False）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        while True:
+            wait = self._wait_time(family, priority)
+            if wait <= 0:
+                self._record(family, waited)
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            waited = True
+            time.sleep(wait)
+
+    async def acquire_async(self, family: str, priority: int = PRIORITY_HIGH):
+        """异步版本的 acquire"""
+        waited = False
+        while True:
+            wait = self._wait_time(family, priority)
+            if wait <= 0:
+                self._record(family, waited)
+                return
+            waited = True
+            await asyncio.sleep(wait)
+
+    def on_response(self, family: str, status_code: int, headers: Optional[Mapping[str, Any]] = None):
+        """
+        根据响应更新限流状态：429/503 时按 Retry-After 暂停该类别的请求
+
+        Args:
+            family: 接口类别
+            status_code: HTTP状态码
+            headers: 响应头
+        """
+        if status_code not in (429, 503):
+            return
+
+        retry_after = self._parse_retry_after((headers or {}).get('Retry-After'))
+        if retry_after is None:
+            retry_after = float(os.getenv('RATE_LIMIT_DEFAULT_BACKOFF', '1.0'))
+
+        with self._lock:
+            self.stats[family]['throttled'] += 1
+            self._blocked_until[family] = max(self._blocked_until.get(family, 0.0), time.monotonic() + retry_after)
+        print(f"⚠️ {family} 接口被限流 (HTTP {status_code})，暂停 {retry_after:.1f} 秒")
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """解析 Retry-After（秒数或HTTP日期）"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """获取各类别的限流统计"""
+        with self._lock:
+            return {family: dict(stats) for family, stats in self.stats.items()}
+
+
+# 进程内共享的限流器（首次使用时读取设置）
+governor = RateLimitGovernor(configure=False)
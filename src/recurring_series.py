@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+周期市场 - 识别 btc-updown-15m-<开始时间> 这类按固定周期滚动的市场，
+根据ticker推算后续各期的结束时间，并提前用按slug的定向查询解析token ID，
+使交易窗口内不再需要全量发现市场
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from .market_record import MarketRecord
+
+# <资产>-updown-<周期><m|h>-<开始时间epoch秒>
+_TICKER_RE = re.compile(r'^(?P<series>[a-z0-9]+-updown-(?P<count>\d+)(?P<unit>[mh]))-(?P<start>\d{9,11})$')
+_SERIES_RE = re.compile(r'^[a-z0-9]+-updown-(?P<count>\d+)(?P<unit>[mh])$')
+_UNIT_SECONDS = {'m': 60, 'h': 3600}
+
+
+@dataclass(frozen=True)
+class SeriesInstance:
+    """周期市场中的一期"""
+    series: str       # 如 btc-updown-15m
+    start_ts: int     # 开始时间（UTC epoch秒）
+    interval: int     # 周期（秒）
+
+    @property
+    def end_ts(self) -> int:
+        return self.start_ts + self.interval
+
+    @property
+    def slug(self) -> str:
+        return f"{self.series}-{self.start_ts}"
+
+
+def parse_ticker(ticker: str) -> Optional[SeriesInstance]:
+    """解析周期市场的ticker，不是周期市场时返回None"""
+    match = _TICKER_RE.match(ticker or '')
+    if not match:
+        return None
+    interval = int(match.group('count')) * _UNIT_SECONDS[match.group('unit')]
+    return SeriesInstance(match.group('series'), int(match.group('start')), interval)
+
+
+def series_interval(series: str) -> Optional[int]:
+    """解析周期市场名称（如 btc-updown-15m）对应的周期秒数"""
+    match = _SERIES_RE.match(series)
+    if not match or int(match.group('count')) <= 0:
+        return None
+    return int(match.group('count')) * _UNIT_SECONDS[match.group('unit')]
+
+
+class RecurringSeriesTracker:
+    """周期市场跟踪器：推算后续各期并缓存已解析的市场记录（线程安全）"""
+
+    def __init__(self, scanner, series: Optional[Iterable[str]] = None):
+        """
+        初始化周期市场跟踪器
+
+        Args:
+            scanner: PolymarketScanner实例，用于按slug查询Gamma
+            series: 跟踪的周期市场名称，如果为None则从环境变量 RECURRING_SERIES 读取（逗号分隔）
+        """
+        self.scanner = scanner
+        if series is None:
+            series = [name.strip().lower() for name in os.getenv('RECURRING_SERIES', '').split(',') if name.strip()]
+
+        self.series: Dict[str, int] = {}  # 名称 -> 周期秒数（各期开始时间为周期的整数倍）
+        for name in series:
+            interval = series_interval(name)
+            if interval is None:
+                print(f"⚠️ 无法识别的周期市场: {name}（格式应为 <资产>-updown-<周期><m|h>）")
+                continue
+            self.series[name] = interval
+
+        self.negative_ttl = float(os.getenv('RECURRING_NEGATIVE_TTL', '30'))  # 查询不到的期数多久后重试（秒）
+        self._records: Dict[str, MarketRecord] = {}
+        self._missing: Dict[str, float] = {}  # slug -> 查询不到的时间（monotonic）
+        self._lock = threading.Lock()
+        self.lookups = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.series)
+
+    def predict(self, end_min_ts: float, end_max_ts: float) -> List[SeriesInstance]:
+        """推算结束时间在 [end_min_ts, end_max_ts] 内的各期"""
+        instances = []
+        for name, interval in self.series.items():
+            start_ts = math.ceil((end_min_ts - interval) / interval) * interval
+            while start_ts + interval <= end_max_ts:
+                if start_ts + interval >= end_min_ts:
+                    instances.append(SeriesInstance(name, start_ts, interval))
+                start_ts += interval
+        instances.sort(key=lambda instance: instance.end_ts)
+        return instances
+
+    def resolve(self, instance: SeriesInstance) -> Optional[MarketRecord]:
+        """
+        获取某一期的市场记录（优先使用缓存，否则按slug定向查询Gamma）
+
+        Returns:
+            市场记录，Gamma上尚不存在时返回None
+        """
+        with self._lock:
+            record = self._records.get(instance.slug)
+            missing_at = self._missing.get(instance.slug)
+        if record is not None:
+            return record
+        if missing_at is not None and time.monotonic() - missing_at < self.negative_ttl:
+            return None
+
+        self.lookups += 1
+        try:
+            records = self.scanner.fetch_events_by_slug(instance.slug)
+        except Exception as e:
+            print(f"⚠️ 查询周期市场失败 {instance.slug}: {e}")
+            return None
+        record = next((r for r in records if r.ticker == instance.slug), records[0] if records else None)
+
+        with self._lock:
+            if record is None:
+                self._missing[instance.slug] = time.monotonic()
+            else:
+                self._records[instance.slug] = record
+                self._missing.pop(instance.slug, None)
+        return record
+
+    def prefetch(self, end_min_ts: float, end_max_ts: float) -> int:
+        """
+        提前解析结束时间在范围内的各期
+
+        Returns:
+            已解析的期数
+        """
+        self._prune(end_min_ts)
+        return sum(1 for instance in self.predict(end_min_ts, end_max_ts) if self.resolve(instance) is not None)
+
+    def markets_ending_between(self, end_min_ts: float, end_max_ts: float) -> List[MarketRecord]:
+        """获取结束时间在范围内的各期市场记录"""
+        markets = []
+        for instance in self.predict(end_min_ts, end_max_ts):
+            record = self.resolve(instance)
+            if record is not None and end_min_ts <= record.end_ts <= end_max_ts:
+                markets.append(record)
+        return markets
+
+    def _prune(self, before_ts: float):
+        """丢弃已结束一小时以上的缓存记录"""
+        with self._lock:
+            for slug in [slug for slug, record in self._records.items() if record.end_ts < before_ts - 3600]:
+                del self._records[slug]
+            now = time.monotonic()
+            for slug in [slug for slug, missing_at in self._missing.items() if now - missing_at >= self.negative_ttl]:
+                del self._missing[slug]
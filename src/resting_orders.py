@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+挂单管理器 - 跟踪临近结束时挂出的GTD限价单，各市场结束前撤销本管理器挂出的订单，并按行情逐步调整价格
+"""
+
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from .exchange_clock import clock
+from .market_record import MarketRecord
+
+# Polymarket对GTD订单有60秒的安全阈值，实际过期时间 = expiration - 60
+GTD_SECURITY_THRESHOLD = 60
+
+# 订单终态
+FINAL_STATUSES = {'MATCHED', 'CANCELED', 'CANCELLED', 'EXPIRED', 'FILLED'}
+
+
+@dataclass
+class RestingOrder:
+    """一笔挂出的限价单"""
+    order_id: str
+    market: MarketRecord
+    token_id: str
+    token_type: str
+    price: float
+    amount: float                 # 下单金额（USD）
+    expiration: int
+    trader: object = field(repr=False)
+    status: str = 'LIVE'
+    size_matched: float = 0.0     # 已成交股数
+    created_at: float = field(default_factory=time.time)
+    reprice_count: int = 0
+    reservation_id: int = 0       # 风控预留ID，改价时转移到新订单，订单终结时释放
+    origin_id: str = ''           # 改价链上第一笔订单的ID（改价产生的新订单与原订单是同一笔交易）
+
+    @property
+    def is_live(self) -> bool:
+        return self.status.upper() not in FINAL_STATUSES
+
+
+def round_to_tick(price: float, tick_size: float) -> float:
+    """将价格向下取整到tick"""
+    return round(math.floor(price / tick_size + 1e-9) * tick_size, 6)
+
+
+class RestingOrderManager:
+    """限价挂单管理器"""
+
+    def __init__(self, reprice_step_ticks: int = 1, on_fill: Optional[Callable[[RestingOrder], None]] = None,
+                 on_close: Optional[Callable[[RestingOrder], None]] = None):
+        """
+        初始化挂单管理器
+
+        Args:
+            reprice_step_ticks: 每次改价最多移动的tick数
+            on_fill: 订单成交数量增加时的回调（如记录到持仓账本）
+            on_close: 订单终结（全部成交、撤销或过期）时的回调（如释放风控预留）
+        """
+        self.reprice_step_ticks = reprice_step_ticks
+        self.on_fill = on_fill
+        self.on_close = on_close
+        self.orders: Dict[str, RestingOrder] = {}
+
+    def _close(self, order: RestingOrder, status: str):
+        order.status = status
+        if self.on_close is not None:
+            self.on_close(order)
+
+    def place(self, trader, market: MarketRecord, token_id: str, token_type: str, amount: float, price: float,
+              reservation_id: int = 0, origin_id: Optional[str] = None) -> Optional[RestingOrder]:
+        """
+        挂出在市场结束时过期的GTD买单
+
+        Args:
+            trader: PolymarketTrader实例
+            market: 市场记录
+            token_id: Token ID
+            token_type: "YES" 或 "NO"
+            amount: 下单金额（USD）
+            price: 限价
+            reservation_id: 风控预留ID
+            origin_id: 改价时传入原订单的 origin_id，如果为None则以新订单ID为准
+
+        Returns:
+            挂单记录，下单失败时返回None
+        """
+        tick_size = trader.get_tick_size(token_id)
+        price = round_to_tick(price, tick_size)
+        expiration = market.end_ts + GTD_SECURITY_THRESHOLD  # 在endDate时失效
+
+        result = trader.place_limit_order(token_id, "BUY", price, amount, expiration, token_type)
+        if not result or not result.get('orderID'):
+            return None
+
+        order = RestingOrder(
+            order_id=result['orderID'],
+            market=market,
+            token_id=token_id,
+            token_type=token_type,
+            price=price,
+            amount=amount,
+            expiration=expiration,
+            trader=trader,
+            status=(result.get('status') or 'LIVE').upper(),
+            reservation_id=reservation_id,
+            origin_id=origin_id or result['orderID']
+        )
+        self.orders[order.order_id] = order
+        return order
+
+    def live_orders(self) -> List[RestingOrder]:
+        """获取仍在挂单中的订单"""
+        return [order for order in self.orders.values() if order.is_live]
+
+    def refresh(self, orders: Optional[List[RestingOrder]] = None):
+        """
+        同步订单状态：每个账户只请求一次 get_open_orders，
+        不在未成交列表中的订单再单独查询最终状态
+
+        Args:
+            orders: 需要同步的订单，如果为None则同步所有仍在挂单中的订单
+        """
+        orders = self.live_orders() if orders is None else orders
+        traders = {id(order.trader): order.trader for order in orders}
+        for trader in traders.values():
+            open_orders = {o.get('id'): o for o in trader.get_open_orders() if isinstance(o, dict)}
+            for order in orders:
+                if order.trader is not trader:
+                    continue
+                open_order = open_orders.get(order.order_id)
+                status = order.status
+                if open_order is None:
+                    open_order = trader.get_order_status(order.order_id)
+                    if not open_order:
+                        continue  # 查询失败，下一轮再确认
+                    status = (open_order.get('status') or order.status).upper()
+                self._apply_fill(order, open_order)
+                if status.upper() in FINAL_STATUSES:
+                    self._close(order, status)
+
+    def _apply_fill(self, order: RestingOrder, info: Dict):
+        """按查询到的订单信息更新成交数量，增加时回调 on_fill"""
+        size_matched = float(info.get('size_matched', order.size_matched) or 0)
+        filled = size_matched > order.size_matched
+        order.size_matched = size_matched
+        if filled and self.on_fill is not None:
+            self.on_fill(order)
+
+    def reprice(self, order: RestingOrder, target_price: float) -> bool:
+        """
+        向目标价格逐步改价（撤单后按剩余金额重新挂单）
+
+        Returns:
+            是否进行了改价
+        """
+        tick_size = order.trader.get_tick_size(order.token_id)
+        target_price = round_to_tick(target_price, tick_size)
+        max_move = tick_size * self.reprice_step_ticks
+        new_price = round_to_tick(order.price + max(-max_move, min(max_move, target_price - order.price)), tick_size)
+        if abs(new_price - order.price) < tick_size / 2:
+            return False
+
+        remaining_amount = round(order.amount - order.size_matched * order.price, 2)
+        if remaining_amount < order.trader.min_order_size:
+            return False
+
+        if not order.trader.cancel_order(order.order_id):
+            return False
+        order.status = 'CANCELED'
+        # 撤单前可能又有成交，按最终成交数量重新计算剩余金额
+        final = order.trader.get_order_status(order.order_id)
+        if final:
+            self._apply_fill(order, final)
+            remaining_amount = round(order.amount - order.size_matched * order.price, 2)
+            if remaining_amount < order.trader.min_order_size:
+                self._close(order, 'CANCELED')
+                return False
+
+        # 风控预留和交易标识转移到新订单，重新挂单失败时才释放
+        new_order = self.place(order.trader, order.market, order.token_id, order.token_type, remaining_amount, new_price,
+                               order.reservation_id, order.origin_id)
+        if new_order is None:
+            self._close(order, 'CANCELED')
+            return False
+        new_order.reprice_count = order.reprice_count + 1
+        print(f"🔁 改价 {order.market.ticker} {order.token_type}: {order.price:.3f} -> {new_price:.3f}")
+        return True
+
+    def cancel(self, orders: List[RestingOrder]):
+        """
+        按订单ID批量撤销本管理器挂出的订单（不影响账户上的其他订单），
+        撤单后再同步一次状态，让撤单前最后的成交数量经 on_fill 记录
+
+        Args:
+            orders: 要撤销的订单
+        """
+        orders = [order for order in orders if order.is_live]
+        traders = {id(order.trader): order.trader for order in orders}
+        for trader in traders.values():
+            trader.cancel_orders([order.order_id for order in orders if order.trader is trader])
+        # 撤单失败或已成交的订单按查询到的真实状态处理，仍在挂单中的留给下一轮
+        self.refresh(orders)
+
+    def cancel_all(self):
+        """批量撤销所有仍在挂单中的订单"""
+        self.cancel(self.live_orders())
+
+    def manage_until(self, cancel_before: float, poll_interval: float = 2.0, target_price_fn: Optional[Callable[[RestingOrder], Optional[float]]] = None):
+        """
+        管理挂单直到全部终结，每笔订单在其市场结束前 cancel_before 秒撤销
+
+        Args:
+            cancel_before: 市场结束前多少秒撤单
+            poll_interval: 轮询间隔（秒）
+            target_price_fn: 根据最新行情给出目标价格的函数，返回None表示不改价
+        """
+        while self.live_orders():
+            now_ts = clock.now()
+            expired = [order for order in self.live_orders() if order.market.end_ts - cancel_before <= now_ts]
+            if expired:
+                print(f"⏰ 到达撤单截止时间，撤销 {len(expired)} 笔挂单")
+                self.cancel(expired)
+            for order in self.live_orders():
+                if order.market.end_ts <= now_ts:
+                    # GTD订单在endDate已由交易所失效，状态一直查询不到时不再等待
+                    self._close(order, 'EXPIRED')
+
+            self.refresh()
+            if target_price_fn is not None:
+                for order in self.live_orders():
+                    target_price = target_price_fn(order)
+                    if target_price is not None:
+                        self.reprice(order, target_price)
+
+            live_orders = self.live_orders()
+            if not live_orders:
+                break
+            # 已过截止时间但撤单未确认的订单按轮询间隔重试
+            wait = min(order.market.end_ts for order in live_orders) - cancel_before - clock.now()
+            time.sleep(min(poll_interval, wait) if wait > 0 else poll_interval)
+
+    def get_summary(self) -> Dict[str, int]:
+        """统计挂单结果"""
+        summary = {'total': len(self.orders), 'live': 0, 'matched': 0, 'canceled': 0, 'repriced': 0}
+        for order in self.orders.values():
+            status = order.status.upper()
+            if order.is_live:
+                summary['live'] += 1
+            elif status in ('MATCHED', 'FILLED'):
+                summary['matched'] += 1
+            else:
+                summary['canceled'] += 1
+            if order.reprice_count:
+                summary['repriced'] += 1
+        return summary
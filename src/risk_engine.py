@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+交易前风控 - 在内存中维护余额、各市场系列的未结算敞口和当日亏损，
+对每笔候选订单做常数时间的限额检查，关键路径上不发起任何网络请求
+"""
+
+import itertools
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Tuple
+
+from .exchange_clock import clock
+from .market_record import MarketRecord
+from .recurring_series import parse_ticker
+
+
+def market_family(market: MarketRecord) -> str:
+    """市场所属系列：周期市场为系列名（如 btc-updown-15m），其他市场为其ticker"""
+    instance = parse_ticker(market.ticker)
+    return instance.series if instance is not None else market.ticker
+
+
+@dataclass(frozen=True)
+class RiskDecision:
+    """风控检查结果"""
+    approved: bool
+    reason: str = ''
+    reservation_id: int = 0  # 通过检查时预留的额度，成交时由 on_fill 转为敞口，失败或撤单时由 release 释放
+
+
+@dataclass
+class _Reservation:
+    """已通过检查、尚未成交的订单占用的额度"""
+    account: str
+    market_id: str
+    family: str
+    amount: float
+    filled: bool = False  # 是否已有成交（已计入当日成交笔数）
+
+
+APPROVED = RiskDecision(True)
+
+
+class RiskEngine:
+    """交易前风控引擎（线程安全）"""
+
+    def __init__(self, min_order_size: float = 1.0, max_order_size: float = 1.0):
+        """
+        初始化风控引擎，限额为0表示不限制
+
+        Args:
+            min_order_size: 最小单笔订单金额（USD）
+            max_order_size: 最大单笔订单金额（USD）
+        """
+        self.min_order_size = min_order_size
+        self.max_order_size = max_order_size
+        self.max_family_exposure = float(os.getenv('RISK_MAX_FAMILY_EXPOSURE', '0'))  # 单个市场系列最大未结算金额
+        self.max_total_exposure = float(os.getenv('RISK_MAX_TOTAL_EXPOSURE', '0'))    # 所有市场最大未结算金额
+        self.max_daily_loss = float(os.getenv('RISK_MAX_DAILY_LOSS', '0'))            # 当日已实现亏损上限
+        self.max_daily_trades = int(os.getenv('RISK_MAX_DAILY_TRADES', '0'))          # 当日最大成交笔数
+        self.balance_reserve = float(os.getenv('RISK_BALANCE_RESERVE', '0'))          # 下单后至少保留的余额
+
+        self._balances: Dict[str, float] = {}               # 账户 -> 可用余额（USD）
+        self._family_exposure: Dict[str, float] = {}        # 系列 -> 未结算成本
+        self._market_exposure: Dict[str, Tuple[str, float]] = {}  # 市场ID -> (系列, 未结算成本)
+        self._total_exposure = 0.0
+        self._day = self._today()
+        self._daily_pnl = 0.0
+        self._daily_trades = 0
+        # 预留额度：已通过检查但尚未成交的订单（含挂出的GTD限价单），同样占用余额、敞口和成交笔数
+        self._reservations: Dict[int, _Reservation] = {}
+        self._reservation_ids = itertools.count(1)
+        self._reserved_balance: Dict[str, float] = {}
+        self._reserved_family: Dict[str, float] = {}
+        self._reserved_total = 0.0
+        self._pending_trades = 0
+        self.rejections = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _today() -> int:
+        return int(clock.local_time() + clock.offset) // 86400  # 交易所时间的UTC日期（不触发时钟同步）
+
+    def _roll_day(self):
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._daily_pnl = 0.0
+            self._daily_trades = 0
+
+    def update_balance(self, account: str, balance: float):
+        """更新账户余额（在关键路径之外调用，如扫描时查询余额之后）"""
+        with self._lock:
+            self._balances[account.lower()] = balance
+
+    def load_positions(self, positions: Iterable[Dict], daily_pnl: float = 0.0):
+        """
+        从持仓账本加载状态（启动时调用一次）
+
+        Args:
+            positions: 未结算持仓
+            daily_pnl: 当日（UTC）已实现盈亏
+        """
+        with self._lock:
+            self._daily_pnl = daily_pnl
+            for position in positions:
+                family = parse_ticker(position['ticker'])
+                family = family.series if family is not None else position['ticker']
+                self._add_exposure(position['market_id'], family, position['cost'])
+
+    def _add_exposure(self, market_id: str, family: str, amount: float):
+        previous = self._market_exposure.get(market_id, (family, 0.0))[1]
+        self._market_exposure[market_id] = (family, previous + amount)
+        self._family_exposure[family] = self._family_exposure.get(family, 0.0) + amount
+        self._total_exposure += amount
+
+    def _reserve(self, reservation: _Reservation, sign: float):
+        account, family, amount = reservation.account, reservation.family, sign * reservation.amount
+        self._reserved_balance[account] = self._reserved_balance.get(account, 0.0) + amount
+        self._reserved_family[family] = self._reserved_family.get(family, 0.0) + amount
+        self._reserved_total += amount
+        if not reservation.filled:
+            self._pending_trades += int(sign)
+
+    def check(self, account: str, market: MarketRecord, amount: float) -> RiskDecision:
+        """
+        检查候选订单是否符合所有限额，通过时在同一把锁内预留额度（并发下单不会共同超限）
+
+        通过后必须二选一：成交时调用 on_fill(reservation_id=...)，下单失败或撤单时调用 release
+
+        Args:
+            account: 下单的资金地址
+            market: 市场记录
+            amount: 下单金额（USD）
+
+        Returns:
+            风控检查结果，通过时带有预留ID
+        """
+        family = market_family(market)
+        account = account.lower()
+        with self._lock:
+            self._roll_day()
+            decision = self._evaluate(account, family, amount)
+            if not decision.approved:
+                self.rejections += 1
+                return decision
+            reservation_id = next(self._reservation_ids)
+            reservation = self._reservations[reservation_id] = _Reservation(account, market.id, family, amount)
+            self._reserve(reservation, 1)
+            return RiskDecision(True, reservation_id=reservation_id)
+
+    def release(self, reservation_id: int):
+        """释放预留中尚未成交的额度（下单失败、FOK未成交、挂单撤销或过期时调用，可重复调用）"""
+        with self._lock:
+            reservation = self._reservations.pop(reservation_id, None)
+            if reservation is not None:
+                self._reserve(reservation, -1)
+
+    def _evaluate(self, account: str, family: str, amount: float) -> RiskDecision:
+        if amount < self.min_order_size:
+            return RiskDecision(False, f'订单金额 {amount} 小于最小订单 {self.min_order_size} USD')
+        if self.max_order_size and amount > self.max_order_size:
+            return RiskDecision(False, f'订单金额 {amount} 大于最大订单 {self.max_order_size} USD')
+
+        # 余额、敞口和成交笔数都包含已预留但尚未成交的订单
+        balance = self._balances.get(account)
+        if balance is not None:
+            balance -= self._reserved_balance.get(account, 0.0)
+            if balance - amount < self.balance_reserve:
+                return RiskDecision(False, f'余额不足: {balance:.2f} USD，需要 {amount + self.balance_reserve:.2f} USD')
+
+        family_exposure = self._family_exposure.get(family, 0.0) + self._reserved_family.get(family, 0.0)
+        if self.max_family_exposure and family_exposure + amount > self.max_family_exposure:
+            return RiskDecision(False, f'{family} 敞口 {family_exposure:.2f} USD 将超过上限 {self.max_family_exposure} USD')
+        total_exposure = self._total_exposure + self._reserved_total
+        if self.max_total_exposure and total_exposure + amount > self.max_total_exposure:
+            return RiskDecision(False, f'总敞口 {total_exposure:.2f} USD 将超过上限 {self.max_total_exposure} USD')
+
+        if self.max_daily_loss and -self._daily_pnl >= self.max_daily_loss:
+            return RiskDecision(False, f'当日亏损 {-self._daily_pnl:.2f} USD 已达上限 {self.max_daily_loss} USD')
+        daily_trades = self._daily_trades + self._pending_trades
+        if self.max_daily_trades and daily_trades >= self.max_daily_trades:
+            return RiskDecision(False, f'当日已成交和待成交 {daily_trades} 笔，达到上限')
+        return APPROVED
+
+    def on_fill(self, account: str, market: MarketRecord, cost: float, new_trade: bool = True,
+                reservation_id: int = 0, final: bool = True):
+        """
+        订单成交后占用余额和敞口
+
+        Args:
+            account: 资金地址
+            market: 市场记录
+            cost: 新增的成交金额（USD）
+            new_trade: 是否计入当日成交笔数（同一限价单的后续部分成交不重复计数）
+            reservation_id: 检查时得到的预留ID，成交部分从预留中转为敞口
+            final: 订单是否已终结（FOK成交），为True时释放预留的剩余额度；挂单的部分成交传False
+        """
+        with self._lock:
+            self._roll_day()
+            account = account.lower()
+            reservation = self._reservations.get(reservation_id)
+            if reservation is not None:
+                self._reserve(reservation, -1)
+                reservation.amount = max(0.0, reservation.amount - cost)
+                reservation.filled = reservation.filled or new_trade
+                if final:
+                    del self._reservations[reservation_id]
+                else:
+                    self._reserve(reservation, 1)
+            if account in self._balances:
+                self._balances[account] -= cost
+            self._add_exposure(market.id, market_family(market), cost)
+            if new_trade:
+                self._daily_trades += 1
+
+    def on_settle(self, market_id: str, pnl: float):
+        """市场结算后释放敞口并计入当日盈亏"""
+        with self._lock:
+            self._roll_day()
+            family, cost = self._market_exposure.pop(market_id, (None, 0.0))
+            if family is not None:
+                remaining = self._family_exposure.get(family, 0.0) - cost
+                if remaining > 1e-9:
+                    self._family_exposure[family] = remaining
+                else:
+                    self._family_exposure.pop(family, None)
+                self._total_exposure -= cost
+            self._daily_pnl += pnl
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取风控状态"""
+        with self._lock:
+            self._roll_day()
+            return {
+                'total_exposure': self._total_exposure,
+                'reserved': self._reserved_total,
+                'families': len(self._family_exposure),
+                'daily_pnl': self._daily_pnl,
+                'daily_trades': self._daily_trades,
+                'rejections': self.rejections
+            }
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+分片协调器 - 协调进程持有市场目录和按结束时间的索引，按市场ID的一致性哈希把市场分配给N个工作进程；
+每个工作进程为自己的分片获取报价、评估策略并签名下单，通过本机进程间队列汇报结果，吞吐量随CPU核数扩展；
+风控状态只有一份，由协调进程启动的管理进程持有，工作进程下单前通过代理取得批准和预留额度
+"""
+
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing.managers import BaseManager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .exchange_clock import clock
+from .market_record import MarketRecord
+from .position_ledger import PositionLedger
+from .quote_board import QuoteBoard
+from .rate_limiter import PRIORITY_HIGH
+from .risk_engine import RiskEngine
+
+
+class HashRing:
+    """一致性哈希环：增删工作进程时只有该进程负责的市场会被重新分配"""
+
+    def __init__(self, nodes: Iterable[int] = (), replicas: Optional[int] = None):
+        """
+        Args:
+            nodes: 初始节点（工作进程编号）
+            replicas: 每个节点的虚拟节点数，如果为None则从环境变量 SHARD_VIRTUAL_NODES 读取
+        """
+        self.replicas = replicas or int(os.getenv('SHARD_VIRTUAL_NODES', '64'))
+        self._points: List[int] = []   # 已排序的哈希值
+        self._owners: List[int] = []   # 与 _points 对应的节点
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    @property
+    def nodes(self) -> List[int]:
+        return sorted(set(self._owners))
+
+    def add(self, node: int):
+        for replica in range(self.replicas):
+            point = self._hash(f'{node}#{replica}')
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: int):
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> Optional[int]:
+        """key 所属的节点，环为空时返回None"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class _RiskManager(BaseManager):
+    """在管理进程中持有所有工作进程共享的风控引擎（限额不随工作进程数成倍放大）"""
+
+
+_RiskManager.register('RiskEngine', RiskEngine)
+
+
+def _take_trade_slot(trade_slots) -> bool:
+    """从所有工作进程共享的交易次数额度中占用一次"""
+    with trade_slots.get_lock():
+        if trade_slots.value <= 0:
+            return False
+        trade_slots.value -= 1
+        return True
+
+
+def _release_trade_slot(trade_slots):
+    with trade_slots.get_lock():
+        trade_slots.value += 1
+
+
+def _run_shard(auto_trader, shard: List[MarketRecord], test_only: bool, trade_slots) -> List[Dict[str, Any]]:
+    """在工作进程中分析并交易一个分片，返回可序列化的结果"""
+    now_ts = clock.now()
+    target_markets = auto_trader.scanner.get_markets_with_time(shard)  # 按工作进程当前时间重新计算剩余时间
+    reports = []
+    for analysis in auto_trader.analyze_markets(target_markets):
+        market = analysis['market']
+        report = {
+            'market_id': market.id,
+            'ticker': market.ticker,
+            'title': market.title,
+            'seconds_remaining': market.end_ts - now_ts,
+            'recommendation': analysis['recommendation'],
+            'trade_size': analysis['trade_size'],
+            'reason': analysis['reason'],
+            'executed': False,
+            'success': False,
+            'error': None,
+            'attempts': 0
+        }
+        if analysis['recommendation'] != 'HOLD' and _take_trade_slot(trade_slots):
+            report['executed'] = True
+            if test_only:
+                report['success'] = True
+            else:
+                result = auto_trader.execute_trade(analysis)
+                report['success'] = result['success']
+                report['error'] = result.get('error')
+                report['attempts'] = result.get('attempts', 1)
+                if not result['success']:
+                    _release_trade_slot(trade_slots)  # 失败的交易不占用额度
+        reports.append(report)
+    if not test_only:
+        auto_trader.sync_balances([auto_trader.trader])  # 成交后余额已变化，推送给共享风控（不在下单路径上）
+    return reports
+
+
+def _worker_main(worker_id: int, strategy: str, test_only: bool, tasks, results, trade_slots,
+                 board_name: Optional[str] = None, risk=None):
+    """工作进程入口：创建自己的交易器（报价缓存、签名），使用协调进程共享的风控，然后循环处理分片"""
+    board = None
+    try:
+        from .auto_trader import AutoTrader
+
+        auto_trader = AutoTrader()
+        auto_trader.current_strategy = strategy
+        auto_trader.auto_trade_enabled = True
+        auto_trader.test_only = test_only
+        if risk is not None:
+            auto_trader.risk = risk
+            if not test_only:
+                auto_trader.sync_balances([auto_trader.trader])
+        if board_name:
+            # 本地缓存未命中时直接读取协调进程发布在共享内存中的报价
+            board = QuoteBoard.attach(board_name)
+            auto_trader.quote_cache.attach_board(board)
+    except Exception as e:
+        results.put(('error', worker_id, {'round': None, 'error': f'初始化失败: {e}'}))
+        return
+    results.put(('ready', worker_id, os.getpid()))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        round_id, shard = task
+        start = time.perf_counter()
+        try:
+            reports = _run_shard(auto_trader, shard, test_only, trade_slots)
+        except Exception as e:
+            results.put(('error', worker_id, {'round': round_id, 'error': f'第{round_id}轮分析失败: {e}'}))
+            continue
+        results.put(('round', worker_id, {
+            'round': round_id,
+            'reports': reports,
+            'elapsed': time.perf_counter() - start
+        }))
+
+    if not test_only:
+        auto_trader.settle_positions()
+    auto_trader.config_store.stop()
+    if board is not None:
+        auto_trader.quote_cache.attach_board(None)
+        board.close()
+
+
+class ShardCoordinator:
+    """分片协调器"""
+
+    def __init__(self, num_workers: Optional[int] = None, strategy: str = 'moderate', test_only: bool = False,
+                 scanner=None):
+        """
+        初始化分片协调器
+
+        Args:
+            num_workers: 工作进程数，如果为None则从环境变量 SHARD_WORKERS 读取（默认CPU核数）
+            strategy: 工作进程使用的策略预设
+            test_only: 测试模式，不执行实际交易
+            scanner: 持有市场目录的PolymarketScanner，如果为None则自动创建（不获取报价）
+        """
+        if scanner is None:
+            from .polymarket_scanner import PolymarketScanner
+            scanner = PolymarketScanner()
+        self.scanner = scanner
+        self.num_workers = num_workers or int(os.getenv('SHARD_WORKERS', '0')) or (os.cpu_count() or 1)
+        self.round_timeout = float(os.getenv('SHARD_ROUND_TIMEOUT', '30'))  # 单轮等待工作进程结果的最长时间（秒）
+        self.strategy = strategy
+        self.test_only = test_only
+        # SHARD_QUOTE_BOARD=true 时由协调进程统一获取报价并写入共享内存报价板，工作进程只读取
+        self.quote_board_enabled = os.getenv('SHARD_QUOTE_BOARD', 'false').lower() == 'true'
+        self.quote_max_age = float(os.getenv('TRADE_QUOTE_MAX_AGE', '1.0'))
+        self.board: Optional[QuoteBoard] = None
+        self._risk_manager: Optional[_RiskManager] = None
+        self.risk = None  # 共享风控引擎的代理，start() 时创建
+
+        # 工作进程内有后台线程，使用spawn避免fork继承锁状态
+        self._ctx = multiprocessing.get_context('spawn')
+        self._results = self._ctx.Queue()
+        self._trade_slots = self._ctx.Value('i', 0)
+        self._workers: Dict[int, Tuple[Any, Any]] = {}   # 工作进程编号 -> (进程, 任务队列)
+        self.ring = HashRing()
+        self._round = 0
+        self.reassigned = 0
+        self.worker_stats: Dict[int, Dict[str, float]] = {}
+
+    def start(self, timeout: float = 60.0) -> int:
+        """
+        启动工作进程并等待其初始化完成
+
+        Returns:
+            可用的工作进程数
+        """
+        if self.quote_board_enabled and self.board is None:
+            self.board = QuoteBoard.create()
+            self.scanner.quote_cache.attach_board(self.board)
+            print(f"📋 报价板 {self.board.name}: {self.board.capacity} 个槽位")
+
+        if self._risk_manager is None:
+            self._start_risk()
+
+        board_name = self.board.name if self.board is not None else None
+        for worker_id in range(self.num_workers):
+            tasks = self._ctx.Queue()
+            process = self._ctx.Process(
+                target=_worker_main, name=f'shard-worker-{worker_id}', daemon=True,
+                args=(worker_id, self.strategy, self.test_only, tasks, self._results, self._trade_slots, board_name,
+                      self.risk)
+            )
+            process.start()
+            self._workers[worker_id] = (process, tasks)
+
+        deadline = time.monotonic() + timeout
+        waiting = set(self._workers)
+        while waiting and time.monotonic() < deadline:
+            try:
+                kind, worker_id, payload = self._results.get(timeout=0.5)
+            except queue.Empty:
+                waiting -= self._drop_dead_workers()
+                continue
+            if kind == 'ready':
+                self.ring.add(worker_id)
+                self.worker_stats[worker_id] = {'batches': 0, 'markets': 0, 'busy': 0.0}
+                print(f"✅ 工作进程 {worker_id} 已就绪 (pid {payload})")
+            else:
+                print(f"❌ 工作进程 {worker_id}: {payload['error']}")
+                self._workers.pop(worker_id, None)
+            waiting.discard(worker_id)
+        for worker_id in waiting:
+            print(f"❌ 工作进程 {worker_id} 初始化超时")
+            self._terminate(worker_id)
+        return len(self.ring.nodes)
+
+    def _start_risk(self):
+        """启动持有共享风控引擎的管理进程，并从持仓账本加载未结算持仓和当日盈亏"""
+        self._risk_manager = _RiskManager(ctx=self._ctx)
+        self._risk_manager.start()
+        self.risk = self._risk_manager.RiskEngine(float(os.getenv('MIN_ORDER_SIZE', '1.0')),
+                                                  float(os.getenv('MAX_ORDER_SIZE', '1.0')))
+        if os.getenv('POSITION_LEDGER_ENABLED', 'true').lower() == 'true':
+            ledger = PositionLedger()
+            try:
+                day_start = int(clock.now()) // 86400 * 86400
+                self.risk.load_positions(ledger.open_positions(), ledger.realized_pnl_since(day_start))
+            finally:
+                ledger.close()
+
+    def _terminate(self, worker_id: int):
+        process, _ = self._workers.pop(worker_id, (None, None))
+        if process is not None and process.is_alive():
+            process.terminate()
+        self.ring.remove(worker_id)
+
+    def _drop_dead_workers(self) -> set:
+        """把已退出的工作进程移出哈希环，返回其编号"""
+        dead = {worker_id for worker_id, (process, _) in self._workers.items() if not process.is_alive()}
+        for worker_id in dead:
+            print(f"⚠️ 工作进程 {worker_id} 已退出，移出哈希环")
+            self._terminate(worker_id)
+        return dead
+
+    def assign(self, markets: Iterable[MarketRecord]) -> Dict[int, List[MarketRecord]]:
+        """按市场ID的一致性哈希把市场分配给工作进程"""
+        shards: Dict[int, List[MarketRecord]] = {}
+        for market in markets:
+            worker_id = self.ring.node_for(market.id)
+            if worker_id is not None:
+                shards.setdefault(worker_id, []).append(market)
+        return shards
+
+    def _dispatch(self, round_id: int, markets: List[MarketRecord], pending: Dict[int, List[List[MarketRecord]]]):
+        for worker_id, shard in self.assign(markets).items():
+            self._workers[worker_id][1].put((round_id, shard))
+            pending.setdefault(worker_id, []).append(shard)
+
+    def run_round(self, markets: List[MarketRecord], max_trades: int) -> List[Dict[str, Any]]:
+        """
+        把一批市场分发给各工作进程并收集结果
+
+        Args:
+            markets: 待分析的市场
+            max_trades: 本轮所有工作进程合计的最大交易次数
+
+        Returns:
+            各市场的结果，按剩余时间排序
+        """
+        self._round += 1
+        round_id = self._round
+        with self._trade_slots.get_lock():
+            self._trade_slots.value = max_trades
+
+        # 工作进程 -> 已发送、尚未返回的批次（工作进程按顺序处理，先发送的先返回）
+        pending: Dict[int, List[List[MarketRecord]]] = {}
+        self._dispatch(round_id, markets, pending)
+
+        reports: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.round_timeout
+        while pending and time.monotonic() < deadline:
+            try:
+                kind, worker_id, payload = self._results.get(timeout=0.5)
+            except queue.Empty:
+                dead = self._drop_dead_workers()
+                lost = [market for worker_id in dead for batch in pending.pop(worker_id, []) for market in batch]
+                if lost:
+                    # 只有退出进程负责的市场需要重新分配
+                    self.reassigned += len(lost)
+                    self._dispatch(round_id, lost, pending)
+                continue
+
+            if kind == 'error' and payload['round'] != round_id:
+                # 不属于本轮的错误（初始化失败或之前轮次）只记录，不结束本轮的批次
+                print(f"⚠️ 工作进程 {worker_id}: {payload['error']}（非本轮，忽略）")
+                continue
+            if kind == 'error':
+                print(f"⚠️ 工作进程 {worker_id}: {payload['error']}")
+            elif kind != 'round' or payload['round'] != round_id:
+                continue
+            batches = pending.get(worker_id)
+            if not batches:
+                continue
+            batch = batches.pop(0)
+            if not batches:
+                del pending[worker_id]
+            if kind == 'round':
+                stats = self.worker_stats[worker_id]
+                stats['batches'] += 1
+                stats['markets'] += len(batch)
+                stats['busy'] += payload['elapsed']
+                reports.extend(payload['reports'])
+
+        for worker_id, batches in pending.items():
+            print(f"⚠️ 工作进程 {worker_id} 在 {self.round_timeout} 秒内未返回 {sum(map(len, batches))} 个市场的结果")
+        reports.sort(key=lambda report: report['seconds_remaining'])
+        return reports
+
+    def publish_quotes(self, markets: List[MarketRecord]) -> int:
+        """
+        只请求订单簿获取市场报价并写入报价板（每个 /books 请求包含多个市场的YES/NO两侧），
+        使工作进程在 TRADE_QUOTE_MAX_AGE 内读到的报价不必再请求
+
+        Returns:
+            获取到报价的市场数
+        """
+        start = time.perf_counter()
+        published = len(self.scanner.get_books_data(markets, priority=PRIORITY_HIGH))
+        elapsed = time.perf_counter() - start
+        if elapsed > self.quote_max_age:
+            print(f"⚠️ 报价板发布 {published} 个市场耗时 {elapsed:.2f} 秒，超过报价有效期 {self.quote_max_age} 秒")
+        return published
+
+    def auto_trade_loop(self, max_hours: Optional[float] = 1.0, max_trades: int = 5,
+                        start_minutes: Optional[int] = None, end_minutes: Optional[int] = None):
+        """
+        分片模式的自动交易循环（与AutoTrader.auto_trade_loop相同的扫描范围参数）
+
+        Args:
+            max_hours: 扫描的最大时间范围
+            max_trades: 所有工作进程合计的最大交易次数
+            start_minutes: 开始扫描时间（分钟）
+            end_minutes: 结束扫描时间（分钟）
+        """
+        print("=== 分片自动交易循环开始 ===")
+        print(f"工作进程: {self.num_workers}, 策略预设: {self.strategy}, 报价板: {'启用' if self.quote_board_enabled else '禁用'}")
+        print(f"测试模式: {'启用' if self.test_only else '禁用'}")
+
+        if not self.ring.nodes and self.start() == 0:
+            print("❌ 没有可用的工作进程")
+            return
+
+        # 协调进程只查询市场目录，报价由各工作进程获取（启用报价板时由协调进程用批量 /books 请求获取一次并发布）
+        start = time.perf_counter()
+        markets = [market for market, _ in self.scanner.find_target_markets(max_hours, start_minutes, end_minutes)]
+        if self.board is not None:
+            self.publish_quotes(markets)
+        reports = self.run_round(markets, max_trades)
+        elapsed = time.perf_counter() - start
+
+        print(f"\n找到 {len(reports)} 个市场机会:")
+        for i, report in enumerate(reports[:10], 1):  # 只显示前10个
+            print(f"\n{i}. {report['ticker']} - {report['title']}")
+            print(f"   建议: {report['recommendation']}")
+            print(f"   原因: {report['reason']}")
+            if report['executed']:
+                if self.test_only:
+                    print(f"   🧪 测试模式: 可以交易")
+                elif report['success']:
+                    print(f"   ✅ 交易成功!")
+                else:
+                    print(f"   ❌ 交易失败: {report['error']} (尝试{report['attempts']}次)")
+
+        trades_executed = sum(1 for report in reports if report['executed'] and report['success'])
+        print(f"\n=== 交易总结 ===")
+        print(f"执行交易: {trades_executed}/{max_trades}")
+        print(f"分析市场: {len(reports)}/{len(markets)}, 耗时 {elapsed:.2f} 秒")
+        if self.reassigned:
+            print(f"重新分配: {self.reassigned} 个市场")
+        for worker_id, stats in sorted(self.worker_stats.items()):
+            print(f"工作进程 {worker_id}: {stats['batches']}批, {stats['markets']}个市场, 处理耗时 {stats['busy']:.2f} 秒")
+        if self.risk is not None:
+            risk_stats = self.risk.get_stats()
+            print(f"风控: 总敞口 {risk_stats['total_exposure']:.2f} USD, 当日盈亏 {risk_stats['daily_pnl']:+.2f} USD, "
+                  f"当日成交{risk_stats['daily_trades']}笔, 拒绝{risk_stats['rejections']}次")
+
+    def stop(self, timeout: float = 10.0):
+        """通知工作进程退出并等待其结束"""
+        for _, tasks in self._workers.values():
+            tasks.put(None)
+        for worker_id, (process, _) in list(self._workers.items()):
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._workers.clear()
+        self.ring = HashRing()
+        if self.board is not None:
+            self.scanner.quote_cache.attach_board(None)
+            self.board.close()
+            self.board = None
+        if self._risk_manager is not None:
+            self.risk = None
+            self._risk_manager.shutdown()
+            self._risk_manager = None
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+策略引擎 - 注册多个策略，所有策略在一次遍历中读取同一份预先获取的报价快照，
+各市场的信号按优先级合并，并记录每个策略的耗时；新增策略不会增加行情请求
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config_store import TradingConfig
+from .market_record import MarketRecord
+
+
+@dataclass(frozen=True)
+class Signal:
+    """策略给出的交易信号"""
+    strategy: str
+    recommendation: str       # BUY_YES 或 BUY_NO
+    trade_size: float         # 目标下单金额（USD），之后还会按订单簿深度调整
+    reason: str
+    priority: int = 0
+
+
+class Strategy:
+    """策略基类：只读取传入的快照，不得自行请求行情"""
+
+    name = 'base'
+
+    def __init__(self, priority: int = 0):
+        self.priority = priority
+
+    def evaluate(self, market: MarketRecord, seconds_remaining: float, market_data: Dict[str, Any],
+                 config: TradingConfig) -> Optional[Signal]:
+        """
+        评估一个市场
+
+        Args:
+            market: 市场记录
+            seconds_remaining: 剩余时间（秒）
+            market_data: PolymarketScanner 返回的市场数据（yes/no 的 mid、asks 等）
+            config: 当前交易配置快照
+
+        Returns:
+            交易信号，不交易时返回None
+        """
+        raise NotImplementedError
+
+
+class PriceBandStrategy(Strategy):
+    """只买入价格在区间内的一方，两边都在区间内时买价格更高的一方"""
+
+    name = 'price_band'
+
+    def __init__(self, priority: int = 0, lower_shift: float = 0.0, size_ratio: float = 1.0, label: Optional[str] = None):
+        """
+        Args:
+            priority: 优先级，同一市场有多个信号时采用优先级最高的
+            lower_shift: 区间下限的偏移（正数收窄区间，负数放宽区间），上限不变
+            size_ratio: 下单金额占配置交易金额的比例
+            label: 策略名称，默认为 price_band
+        """
+        super().__init__(priority)
+        self.lower_shift = lower_shift
+        self.size_ratio = size_ratio
+        if label:
+            self.name = label
+
+    def evaluate(self, market, seconds_remaining, market_data, config):
+        minutes_remaining = seconds_remaining / 60
+        if minutes_remaining < config.min_time_remaining:
+            return None
+
+        low = min(config.max_price_range, config.min_price_range + self.lower_shift)
+        high = config.max_price_range
+        yes_mid = float(market_data['yes']['mid'])
+        no_mid = float(market_data['no']['mid'])
+        yes_in_range = low <= yes_mid <= high
+        no_in_range = low <= no_mid <= high
+
+        if yes_in_range and (not no_in_range or yes_mid >= no_mid):
+            recommendation, side, mid = 'BUY_YES', 'Up', yes_mid
+        elif no_in_range:
+            recommendation, side, mid = 'BUY_NO', 'Down', no_mid
+        else:
+            return None
+
+        prefix = f'{self.name}: ' if self.name != PriceBandStrategy.name else ''
+        both = f'YES价格{yes_mid:.3f}和NO价格{no_mid:.3f}都在{low:.2f}-{high}范围内，{"YES" if side == "Up" else "NO"}价格更高，' \
+            if yes_in_range and no_in_range else f'{"YES" if side == "Up" else "NO"}价格{mid:.3f}在{low:.2f}-{high}范围内，'
+        return Signal(
+            strategy=self.name,
+            recommendation=recommendation,
+            trade_size=config.trade_amount * self.size_ratio,
+            reason=f'{prefix}{both}买入{side}，剩余时间{minutes_remaining:.1f}分钟',
+            priority=self.priority
+        )
+
+
+def build_preset(name: str) -> List[Strategy]:
+    """
+    按 --strategy 预设创建策略组合
+
+    - conservative: 区间下限提高0.02，只在价格更确定时买入
+    - moderate: 配置的价格区间（默认）
+    - aggressive: 配置的价格区间，另外在区间下方0.05内以较低优先级买入
+    """
+    if name == 'conservative':
+        return [PriceBandStrategy(priority=10, lower_shift=0.02, label='price_band_tight')]
+    if name == 'aggressive':
+        return [
+            PriceBandStrategy(priority=10),
+            PriceBandStrategy(priority=5, lower_shift=-0.05, label='price_band_wide'),
+        ]
+    return [PriceBandStrategy(priority=10)]
+
+
+class StrategyEngine:
+    """策略引擎"""
+
+    def __init__(self, strategies: Optional[Iterable[Strategy]] = None):
+        self.strategies: List[Strategy] = []
+        self._timings: Dict[str, List[float]] = {}  # 策略 -> [调用次数, 总耗时(秒), 最大耗时(秒), 信号数]
+        for strategy in strategies or ():
+            self.register(strategy)
+
+    def register(self, strategy: Strategy):
+        """注册策略（同名策略会被替换）"""
+        self.strategies = [s for s in self.strategies if s.name != strategy.name] + [strategy]
+        self.strategies.sort(key=lambda s: s.priority, reverse=True)
+        self._timings.setdefault(strategy.name, [0, 0.0, 0.0, 0])
+
+    def evaluate(self, candidates: Iterable[Tuple[MarketRecord, float]], snapshot: Dict[str, Dict[str, Any]],
+                 config: TradingConfig) -> Dict[str, Signal]:
+        """
+        在一次遍历中用所有策略评估所有候选市场
+
+        Args:
+            candidates: [(市场, 剩余秒数), ...]
+            snapshot: 市场ID -> 市场数据（预先获取，没有报价的市场不评估）
+            config: 交易配置快照（整轮评估使用同一份）
+
+        Returns:
+            市场ID -> 优先级最高的信号，没有信号的市场不返回
+        """
+        signals: Dict[str, Signal] = {}
+        for market, seconds_remaining in candidates:
+            market_data = snapshot.get(market.id)
+            if market_data is None:
+                continue
+            for strategy in self.strategies:  # 已按优先级从高到低排序
+                start = time.perf_counter()
+                try:
+                    signal = strategy.evaluate(market, seconds_remaining, market_data, config)
+                except Exception as e:
+                    print(f"⚠️ 策略 {strategy.name} 评估 {market.ticker} 失败: {e}")
+                    signal = None
+                elapsed = time.perf_counter() - start
+
+                timing = self._timings[strategy.name]
+                timing[0] += 1
+                timing[1] += elapsed
+                timing[2] = max(timing[2], elapsed)
+                if signal is not None:
+                    timing[3] += 1
+                    if market.id not in signals:
+                        signals[market.id] = signal
+        return signals
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """各策略的调用次数、平均/最大耗时（微秒）和信号数"""
+        return {
+            name: {
+                'calls': calls,
+                'avg_us': total / calls * 1e6 if calls else 0.0,
+                'max_us': max_elapsed * 1e6,
+                'signals': signal_count
+            }
+            for name, (calls, total, max_elapsed, signal_count) in self._timings.items()
+        }
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+入场前预热 - 在交易窗口开始前解析DNS、建立并保持到Gamma/CLOB/RPC的连接、
+刷新余额缓存并预加载候选市场，使入场时只走已预热的路径
+"""
+
+import socket
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+from urllib.parse import urlparse
+
+from .polymarket_tokenid import clob_read
+from .rate_limiter import governor, GAMMA, PRIORITY_LOW
+
+
+@dataclass
+class WarmupReport:
+    """预热结果，各步骤耗时单位为毫秒"""
+    steps: Dict[str, float] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    markets: int = 0
+    total_ms: float = 0.0
+
+    def summary(self) -> str:
+        steps = ', '.join(f"{name} {ms:.0f}ms" for name, ms in self.steps.items())
+        text = f"预热耗时 {self.total_ms:.0f}ms ({steps}), 预加载 {self.markets} 个市场"
+        if self.errors:
+            text += f", 失败: {', '.join(f'{name}({error})' for name, error in self.errors.items())}"
+        return text
+
+
+def _run_step(report: WarmupReport, name: str, func: Callable[[], object]):
+    start = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        report.errors[name] = str(e)
+    report.steps[name] = (time.perf_counter() - start) * 1000
+
+
+def _resolve_hosts(urls: List[str]):
+    for url in urls:
+        parsed = urlparse(url)
+        socket.getaddrinfo(parsed.hostname, parsed.port or 443, proto=socket.IPPROTO_TCP)
+
+
+def warm_up(auto_trader, start_minutes: float, end_minutes: float, lead_seconds: float) -> WarmupReport:
+    """
+    在入场前 lead_seconds 秒执行预热
+
+    Args:
+        auto_trader: 长期存活的AutoTrader实例，预热的连接和缓存保存在其中
+        start_minutes: 入场时扫描的开始时间（分钟，相对入场时刻）
+        end_minutes: 入场时扫描的结束时间（分钟，相对入场时刻）
+        lead_seconds: 距离入场的秒数
+
+    Returns:
+        预热结果
+    """
+    scanner = auto_trader.scanner
+    trader = auto_trader.trader
+    report = WarmupReport()
+    start = time.perf_counter()
+
+    hosts = [scanner.base_url, trader.client.host] + list(trader.balance_checker.rpc_endpoints[:1])
+    _run_step(report, 'dns', lambda: _resolve_hosts(hosts))
+
+    def _gamma():
+        governor.acquire(GAMMA, PRIORITY_LOW)
+        scanner.session.get(f"{scanner.base_url}/events", params={'limit': 1}, timeout=10).raise_for_status()
+
+    _run_step(report, 'gamma', _gamma)
+    _run_step(report, 'clob', lambda: clob_read(trader.client.get_ok, priority=PRIORITY_LOW))
+    # 与入场时 sync_balances 相同的批量链上读取：预热 OnchainReader 自己的连接，同时刷新余额缓存
+    _run_step(report, 'balance', lambda: trader.balance_checker.get_portfolio([trader.funder]))
+
+    # 目录覆盖入场时的扫描窗口，并多留1分钟应对入场时间偏差
+    lead_minutes = lead_seconds / 60
+
+    def _catalog():
+        report.markets = scanner.preload_catalog(start_minutes, end_minutes + lead_minutes + 1)
+
+    _run_step(report, 'catalog', _catalog)
+
+    report.total_ms = (time.perf_counter() - start) * 1000
+    return report
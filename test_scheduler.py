@@ -70,6 +70,408 @@ def test_command_building():
     else:
         print("❌ 命令中仍然包含--test-only参数")
 
+def test_gamma_stream():
+    """测试Gamma流式解析：块边界落在字符串、转义符和多字节字符中间，以及响应体被截断"""
+    print("\n🧪 测试Gamma流式解析...")
+    
+    from src.gamma_stream import iter_json_array
+    
+    events = [{'slug': 'a"b', 'title': '结束 [x] {y}', 'path': 'c:\\d'}, {'slug': 'e', 'markets': [{'id': 1}]}]
+    data = json.dumps(events, ensure_ascii=False).encode('utf-8')
+    
+    # 在每个字节位置切分，以及逐字节传入
+    splits_ok = all(list(iter_json_array([data[:i], data[i:]])) == events for i in range(len(data) + 1))
+    bytes_ok = list(iter_json_array(data[i:i + 1] for i in range(len(data)))) == events
+    if splits_ok and bytes_ok:
+        print(f"✅ {len(data) + 1}种块边界和逐字节传入均解析正确")
+    else:
+        print(f"❌ 块边界处解析错误: 切分{splits_ok}, 逐字节{bytes_ok}")
+    
+    parsed = []
+    try:
+        for event in iter_json_array([data[:-3]]):
+            parsed.append(event)
+        print("❌ 截断的响应体没有报错")
+    except ValueError:
+        if parsed == events[:1]:
+            print("✅ 截断的响应体: 已完整的元素先产出，随后报错")
+        else:
+            print(f"❌ 截断前产出的元素错误: {parsed}")
+
+def test_order_sizing():
+    """测试按卖单深度计算下单规模（深度不足时缩小）"""
+    print("\n🧪 测试订单规模计算...")
+    
+    from src.order_sizing import size_order
+    
+    # 最优卖价0.50，滑点5%限价0.525，0.60档位不可用
+    asks = [(0.50, 2.0), (0.51, 2.0), (0.60, 100.0)]
+    sizing = size_order(asks, 5.0, 0.95, 0.05)
+    if (sizing.capped and abs(sizing.notional - 2.02) < 1e-9 and abs(sizing.shares - 4.0) < 1e-9
+            and sizing.worst_price == 0.51 and abs(sizing.vwap - 0.505) < 1e-9):
+        print(f"✅ 深度不足: 只成交 {sizing.notional:.2f} USD, 均价 {sizing.vwap:.3f} ({sizing.reason})")
+    else:
+        print(f"❌ 深度不足时规模错误: {sizing}")
+    
+    full = size_order(asks, 1.5, 0.95, 0.05)
+    empty = size_order([], 1.0, 0.95, 0.05)
+    if not full.capped and abs(full.notional - 1.5) < 1e-9 and empty.capped and empty.notional == 0:
+        print("✅ 深度充足时按目标金额成交，空订单簿不成交")
+    else:
+        print(f"❌ 规模计算错误: {full}, {empty}")
+
+def test_circuit_breaker():
+    """测试熔断器：连续失败后熔断，超时后只放行一个试探请求，成功后关闭"""
+    print("\n🧪 测试熔断器...")
+    
+    import time
+    from src.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+    
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    opened = breaker.state == OPEN and not breaker.allow_request()
+    
+    time.sleep(0.06)
+    probe = breaker.state == HALF_OPEN and breaker.allow_request() and not breaker.allow_request()
+    breaker.record_failure()  # 试探失败，重新熔断
+    reopened = breaker.state == OPEN and not breaker.allow_request()
+    
+    time.sleep(0.06)
+    breaker.allow_request()
+    breaker.record_success()
+    closed = breaker.state == CLOSED and breaker.allow_request() and breaker.allow_request()
+    
+    if opened and probe and reopened and closed:
+        print(f"✅ 关闭 -> 熔断 -> 试探 -> 熔断 -> 试探 -> 关闭，拒绝{breaker.rejected_count}次")
+    else:
+        print(f"❌ 熔断器状态错误: 熔断{opened}, 试探{probe}, 重新熔断{reopened}, 关闭{closed}")
+
+def test_exchange_clock_alignment():
+    """测试执行时间按交易所时间对齐"""
+    print("\n🧪 测试交易所时间对齐...")
+    
+    from src.exchange_clock import ExchangeClock
+    
+    exchange_clock = ExchangeClock()
+    exchange_clock.enabled = False  # 不访问网络
+    
+    # 本地时钟慢3秒：服务器时间比本地时间多3秒，RTT为100ms
+    sent_at = exchange_clock.local_time()
+    exchange_clock.observe(int(sent_at + 3.05), sent_at, sent_at + 0.1)
+    offset = exchange_clock.offset
+    
+    if 2.0 <= offset <= 4.0:
+        print(f"✅ 估计的时钟偏差: {offset:+.2f}秒")
+    else:
+        print(f"❌ 时钟偏差估计错误: {offset:+.2f}秒")
+    
+    scheduler = AutoTraderScheduler()
+    next_time = scheduler.get_next_execution_time()
+    if next_time.tzinfo is not None and next_time.minute in (10, 25, 40, 55) and next_time > scheduler.exchange_now():
+        print(f"✅ 下次执行时间（UTC）: {next_time.isoformat()}")
+    else:
+        print(f"❌ 下次执行时间错误: {next_time}")
+
+def test_execution_journal():
+    """测试执行日志的追加、崩溃恢复和压缩"""
+    print("\n🧪 测试执行日志...")
+    
+    import tempfile
+    from pathlib import Path
+    from src.execution_journal import ExecutionJournal
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        journal_path = Path(tmp) / "journal.jsonl"
+        summary_path = Path(tmp) / "stats.json"
+        
+        journal = ExecutionJournal(journal_path, summary_path)
+        journal.record_execution(True, 1, {'entry': 100.0})
+        journal.record_execution(False, 3, {'entry': 300.0})
+        journal.sync()
+        
+        # 模拟写入一半时崩溃
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"seq": 3, "type": "execu')
+        
+        recovered = ExecutionJournal(journal_path, summary_path)
+        if recovered.stats['execution_count'] == 2 and recovered.stats['success_count'] == 1:
+            print("✅ 崩溃后重放日志: 2次执行, 1次成功")
+        else:
+            print(f"❌ 重放结果错误: {recovered.stats['execution_count']}次执行")
+        
+        recovered.compact()
+        recovered.record_execution(True, 1, {'entry': 200.0})
+        recovered.close()
+        
+        reloaded = ExecutionJournal(journal_path, summary_path)
+        latency = reloaded.stage_latency('entry')
+        hours = reloaded.success_rate_by_hour()
+        if reloaded.stats['execution_count'] == 3 and latency['count'] == 3 and hours and hours[-1][1] == 3:
+            print(f"✅ 压缩后统计一致: 入场平均{latency['avg_ms']:.0f}ms, 本小时成功率{hours[-1][2]*100:.0f}%")
+        else:
+            print(f"❌ 压缩后统计错误: {reloaded.stats['execution_count']}次执行")
+        reloaded.close()
+
+def test_quote_board():
+    """测试共享内存报价板的写入、连接读取和槽位用尽"""
+    print("\n🧪 测试共享内存报价板...")
+    
+    from src.quote_board import QuoteBoard
+    
+    board = QuoteBoard.create(capacity=2, ask_levels=2)
+    reader = QuoteBoard.attach(board.name)
+    try:
+        quote = {'mid': 0.55, 'price': 0.56, 'book': '0x01', 'asks': [(0.56, 10.0), (0.57, 20.0), (0.58, 30.0)], 'books': 2}
+        board.publish('111', quote)
+        read = reader.get('111', max_age=5)
+        if read and read['mid'] == 0.55 and read['asks'] == [(0.56, 10.0), (0.57, 20.0)] and read['book'].endswith('01'):
+            print("✅ 连接方读到写入的报价（卖单截断为2档）")
+        else:
+            print(f"❌ 读取的报价错误: {read}")
+        
+        full = board.publish('222', quote) and not board.publish('333', quote)
+        if full and reader.get('333') is None and reader.get_stats()['used'] == 2:
+            print("✅ 报价板已满时拒绝新token，已有槽位不受影响")
+        else:
+            print(f"❌ 报价板已满处理错误: {reader.get_stats()}")
+    finally:
+        reader.close()
+        board.close()
+
+def test_quote_board_freshness():
+    """测试分片协调进程用批量 /books 请求发布大量市场的报价，工作进程读取时仍在报价有效期内"""
+    print("\n🧪 测试报价板批量发布...")
+    
+    import os
+    import threading
+    from src.mock_polymarket import MockMarketState, MockPolymarketServer
+    from src.market_record import MarketRecord
+    from src.quote_board import QuoteBoard
+    try:
+        from src.polymarket_scanner import PolymarketScanner
+        from src.shard_coordinator import ShardCoordinator
+    except ImportError as e:
+        print(f"⏭️ 跳过: 缺少依赖 ({e})")
+        return
+    
+    state = MockMarketState(500, 120, 50, 1000, 5)
+    server = MockPolymarketServer(('127.0.0.1', 0), state, latency_ms=50)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    saved_url = os.environ.get('CLOB_API_URL')
+    os.environ['CLOB_API_URL'] = f"http://127.0.0.1:{server.server_address[1]}/clob"
+    coordinator = ShardCoordinator(num_workers=1, scanner=PolymarketScanner())
+    coordinator.board = QuoteBoard.create()
+    coordinator.scanner.quote_cache.attach_board(coordinator.board)
+    reader = QuoteBoard.attach(coordinator.board.name)
+    try:
+        markets = [market for market in map(MarketRecord.from_event, state.events({'limit': '500'})) if market and market.has_tokens]
+        requests_before = server.request_count
+        published = coordinator.publish_quotes(markets)
+        requests = server.request_count - requests_before
+        fresh = sum(1 for market in markets
+                    if reader.get(market.yes_token_id, coordinator.quote_max_age) is not None
+                    and reader.get(market.no_token_id, coordinator.quote_max_age) is not None)
+        batches = -(-len(markets) * 2 // 100)
+        if published == fresh == len(markets) and requests <= 2 * batches:
+            print(f"✅ {len(markets)} 个市场用 {requests} 个 /books 请求发布，全部在 {coordinator.quote_max_age} 秒有效期内")
+        else:
+            print(f"❌ 报价板发布错误: 发布{published}/{len(markets)}, 有效{fresh}, 请求{requests}次")
+    finally:
+        reader.close()
+        coordinator.stop()
+        server.shutdown()
+        server.server_close()
+        if saved_url is None:
+            os.environ.pop('CLOB_API_URL', None)
+        else:
+            os.environ['CLOB_API_URL'] = saved_url
+
+def test_position_ledger():
+    """测试持仓账本的增量成交记录和结算盈亏"""
+    print("\n🧪 测试持仓账本...")
+    
+    import tempfile
+    from pathlib import Path
+    from src.market_record import MarketRecord
+    from src.position_ledger import PositionLedger
+    
+    market = MarketRecord('1', 'btc-updown-15m-1700000000', 'BTC', '', 1700000900, '111', '222')
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = PositionLedger(str(Path(tmp) / "positions.db"))
+        # 同一限价单先成交一半，再全部成交；重复记录不计入
+        first = ledger.record_fill('order-1', '0xABC', market, '111', 'YES', 1.0, 0.5)
+        second = ledger.record_fill('order-1', '0xABC', market, '111', 'YES', 2.0, 1.0)
+        repeat = ledger.record_fill('order-1', '0xABC', market, '111', 'YES', 2.0, 1.0)
+        ledger.record_fill('order-2', '0xABC', market, '222', 'NO', 1.0, 0.4)
+        position = ledger.open_positions('0xabc')[0]
+        if (first, second, repeat) == (0.5, 0.5, 0.0) and position['shares'] == 2.0 and position['cost'] == 1.0:
+            print("✅ 部分成交按增量记录，重复记录被忽略")
+        else:
+            print(f"❌ 成交记录错误: {first}, {second}, {repeat}, {position}")
+        
+        pending = ledger.pending_markets(market.end_ts)
+        pnl = ledger.settle_market('1', '111')
+        summary = ledger.get_summary()
+        if (len(pending) == 1 and abs(pnl - 0.6) < 1e-9 and abs(summary['realized_pnl'] - 0.6) < 1e-9
+                and summary['wins'] == 1 and summary['settled'] == 2 and abs(summary['open_cost']) < 1e-9
+                and not ledger.open_positions()):
+            print(f"✅ 结算盈亏 {pnl:+.2f} USD, 胜率 {summary['win_rate']*100:.0f}%")
+        else:
+            print(f"❌ 结算结果错误: {pnl}, {summary}")
+        ledger.close()
+
+def test_risk_engine():
+    """测试风控引擎的各项限额和并发预留"""
+    print("\n🧪 测试风控引擎...")
+    
+    import os
+    from unittest import mock
+    from src.market_record import MarketRecord
+    from src.risk_engine import RiskEngine
+    
+    btc = MarketRecord('1', 'btc-updown-15m-1700000000', 'BTC', '', 1700000900, '111', '222')
+    btc_next = MarketRecord('2', 'btc-updown-15m-1700000900', 'BTC', '', 1700001800, '333', '444')
+    eth = MarketRecord('3', 'eth-updown-15m-1700000000', 'ETH', '', 1700000900, '555', '666')
+    
+    def engine(**limits):
+        with mock.patch.dict(os.environ, {f'RISK_{name.upper()}': str(value) for name, value in limits.items()}):
+            return RiskEngine(min_order_size=1.0, max_order_size=5.0)
+    
+    cases = []
+    risk = engine()
+    cases.append(('最小订单', risk.check('0xA', btc, 0.5)))
+    cases.append(('最大订单', risk.check('0xA', btc, 6.0)))
+    
+    risk = engine(balance_reserve=1)
+    risk.update_balance('0xA', 3.0)
+    cases.append(('余额', risk.check('0xA', btc, 2.5)))
+    
+    # 预留的额度同样占用敞口：第二笔检查不会与第一笔共同超限
+    risk = engine(max_family_exposure=3)
+    first = risk.check('0xA', btc, 2.0)
+    cases.append(('系列敞口', risk.check('0xA', btc_next, 2.0)))
+    family_ok = first.approved and risk.check('0xA', eth, 2.0).approved
+    
+    risk = engine(max_total_exposure=3)
+    risk.on_fill('0xA', btc, 2.0, reservation_id=risk.check('0xA', btc, 2.0).reservation_id)
+    cases.append(('总敞口', risk.check('0xA', eth, 2.0)))
+    risk.on_settle('1', 0.5)
+    total_ok = risk.check('0xA', eth, 2.0).approved
+    
+    risk = engine(max_daily_loss=1)
+    risk.on_settle('1', -1.0)
+    cases.append(('当日亏损', risk.check('0xA', btc, 1.0)))
+    
+    risk = engine(max_daily_trades=1)
+    pending = risk.check('0xA', btc, 1.0)
+    cases.append(('当日成交笔数', risk.check('0xA', eth, 1.0)))
+    risk.release(pending.reservation_id)
+    trades_ok = risk.check('0xA', eth, 1.0).approved
+    
+    rejected = [name for name, decision in cases if not decision.approved]
+    if len(rejected) == len(cases) and family_ok and total_ok and trades_ok:
+        print(f"✅ {len(cases)}项限额均能拒绝，结算或释放预留后恢复: {', '.join(rejected)}")
+    else:
+        print(f"❌ 限额检查错误: {[(name, decision) for name, decision in cases]}, "
+              f"系列{family_ok}, 总敞口{total_ok}, 笔数{trades_ok}")
+
+def test_config_hot_reload():
+    """测试修改配置文件后无需重启即可生效，无效配置不会被应用"""
+    print("\n🧪 测试配置热更新...")
+    
+    import tempfile
+    from pathlib import Path
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        config_file = Path(tmp) / "scheduler_config.json"
+        scheduler = AutoTraderScheduler(config_file=config_file)
+        
+        config = dict(scheduler.config, max_trades=2)
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        scheduler.config_store.reload(force=True)
+        
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(dict(config, scan_start_minutes=10, scan_end_minutes=5), f)
+        scheduler.config_store.reload(force=True)
+        
+        if scheduler.config['max_trades'] == 2 and scheduler.config['scan_start_minutes'] == config['scan_start_minutes']:
+            print("✅ 新配置已生效，无效配置被拒绝")
+        else:
+            print(f"❌ 配置热更新错误: {dict(scheduler.config)}")
+
+def test_in_process_config_reload():
+    """测试in_process模式每次执行前把热更新的测试模式和最少剩余时间应用到已创建的自动交易器"""
+    print("\n🧪 测试in_process模式配置热更新...")
+    
+    import tempfile
+    from pathlib import Path
+    from types import SimpleNamespace
+    from src.config_store import trading_config_store
+    
+    class InProcessTrader:
+        """只记录每次执行时看到的配置"""
+        
+        def __init__(self, config_file):
+            self.test_only = False
+            self.config_store = trading_config_store(config_file)
+            self.scanner = SimpleNamespace(clear_catalog=lambda: None)
+            self.seen = None
+        
+        def auto_trade_loop(self, **kwargs):
+            self.seen = (self.test_only, self.config_store.snapshot.min_time_remaining)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        config_file = Path(tmp) / "scheduler_config.json"
+        scheduler = AutoTraderScheduler(config_file=config_file)
+        scheduler.auto_trader = InProcessTrader(Path(tmp) / "trading_config.json")
+        scheduler.run_in_process()
+        before = scheduler.auto_trader.seen
+        
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(dict(scheduler.config, test_mode=True, min_time_remaining=3), f)
+        scheduler.config_store.reload(force=True)
+        scheduler.run_in_process()
+        after = scheduler.auto_trader.seen
+        
+        if before == (False, scheduler.default_config['min_time_remaining']) and after == (True, 3):
+            print("✅ 已创建的自动交易器使用了重新加载的测试模式和最少剩余时间")
+        else:
+            print(f"❌ 自动交易器未应用新配置: 重新加载前 {before}, 重新加载后 {after}")
+
+def test_onchain_portfolio():
+    """测试批量链上读取：一次往返取回多个地址的余额、授权和持仓（batch和multicall两种模式）"""
+    print("\n🧪 测试批量链上读取...")
+    
+    import threading
+    from src.mock_polymarket import MockMarketState, MockPolymarketServer
+    try:
+        from src.onchain_reader import OnchainReader, ETH_ABI_AVAILABLE
+    except ImportError as e:
+        print(f"⏭️ 跳过: 缺少依赖 ({e})")
+        return
+    
+    server = MockPolymarketServer(('127.0.0.1', 0), MockMarketState(1, 60, 50, 1000, 5))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        rpc_url = f"http://127.0.0.1:{server.server_address[1]}/rpc"
+        addresses = ["0x7e86A3FC28392CA607Ee519fA41F19C02CF77a1A", "0x0000000000000000000000000000000000000001"]
+        for mode in ('batch', 'multicall'):
+            if mode == 'multicall' and not ETH_ABI_AVAILABLE:
+                print("⏭️ multicall模式跳过: 未安装eth_abi")
+                continue
+            reader = OnchainReader([rpc_url], mode=mode)
+            states = reader.get_portfolio(addresses, ['12345'])
+            if (reader.round_trips == 1 and len(states) == 2 and
+                    all(state.complete and state.usdc_balance == 1000 and state.ctf_approved for state in states.values())):
+                print(f"✅ {mode}模式: 1次往返读取 {len(addresses)} 个地址")
+            else:
+                print(f"❌ {mode}模式读取错误: 往返{reader.round_trips}次, {states}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
 def main():
     """主函数"""
     print("🚀 调度器修复测试")
@@ -78,6 +480,18 @@ def main():
     test_json_serialization()
     test_config()
     test_command_building()
+    test_gamma_stream()
+    test_order_sizing()
+    test_circuit_breaker()
+    test_exchange_clock_alignment()
+    test_execution_journal()
+    test_quote_board()
+    test_quote_board_freshness()
+    test_position_ledger()
+    test_risk_engine()
+    test_config_hot_reload()
+    test_in_process_config_reload()
+    test_onchain_portfolio()
     
     print("\n✅ 所有测试完成")
 